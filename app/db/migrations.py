@@ -0,0 +1,204 @@
+"""
+Версионные миграции схемы базы данных.
+
+Миграции применяются по возрастанию версии, каждая — в одной транзакции
+вместе с отметкой в таблице schema_migrations. Весь запуск держит
+рекомендательную блокировку, поэтому API и обновление, стартующие
+одновременно, не применяют одну миграцию дважды. Миграции запускаются
+при старте приложения и скриптов обновления, а также из командной строки:
+
+    python -m app.db.migrations            # применить новые миграции
+    python -m app.db.migrations status     # список миграций
+    python -m app.db.migrations check      # проверить планы запросов
+
+Проверка планов выполняет EXPLAIN для запросов чтения из crud
+с выключенными последовательным сканированием и сортировкой
+(enable_seqscan = off, enable_sort = off): на маленьких таблицах
+планировщик и так выбрал бы их, а проверить нужно, что для запроса
+есть подходящий индекс и что запросы с ORDER BY читают строки
+в нужном порядке прямо из индекса. Если узел Sort остаётся в плане
+и при enable_sort = off, другого способа упорядочить строки нет.
+"""
+
+import argparse
+import asyncio
+from datetime import date
+from typing import Awaitable, Callable, Optional
+
+import asyncpg  # type: ignore
+
+from app.db.connection import db
+from app.repositories.crud import (ORDER_MAPPING, RANK_HISTORY_QUERY,
+                                   REPO_ACTIVITY_QUERY, SORT_BY_MAPPING,
+                                   SYNC_CURSOR_QUERY, TOP_REPOS_QUERY,
+                                   TOP_SNAPSHOT_QUERY,
+                                   add_repository_activity_settings,
+                                   create_activity_table,
+                                   create_backfill_progress_table,
+                                   create_commit_store_tables,
+                                   create_http_cache_table,
+                                   create_refresh_checkpoint_table,
+                                   create_refresh_jobs_table,
+                                   create_refresh_run_tables,
+                                   create_schema_migrations_table,
+                                   create_sync_cursor_table,
+                                   create_top100_sort_indexes,
+                                   create_top100_table,
+                                   create_top_history_table,
+                                   create_top_snapshot_tables,
+                                   explain_query, get_applied_migrations,
+                                   lock_schema_migrations,
+                                   partition_activity_table, record_migration)
+
+Migration = Callable[[asyncpg.Connection], Awaitable[None]]
+
+_INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+_SORTS = {"Sort", "Incremental Sort"}
+
+
+async def _baseline(connection: asyncpg.Connection) -> None:
+    """Все таблицы проекта с первичными и уникальными ключами."""
+    for create in (create_top100_table, create_activity_table,
+                   create_http_cache_table, create_sync_cursor_table,
+                   create_backfill_progress_table, create_refresh_jobs_table,
+                   create_refresh_run_tables, create_refresh_checkpoint_table,
+                   create_commit_store_tables, create_top_history_table):
+        await create(connection)
+
+
+# (версия, имя, функция). Применённые миграции не меняются —
+# изменения схемы добавляются новыми версиями
+MIGRATIONS: list[tuple[int, str, Migration]] = [
+    (1, "baseline", _baseline),
+    (2, "top100_sort_indexes", create_top100_sort_indexes),
+    (3, "activity_monthly_partitions", partition_activity_table),
+    (4, "top_snapshot_versions", create_top_snapshot_tables),
+    (5, "repository_activity_settings", add_repository_activity_settings),
+]
+
+
+async def migrate(connection: Optional[asyncpg.Connection] = None) -> list:
+    """
+    Применяет миграции, которых ещё нет в schema_migrations.
+
+    Параметры:
+        connection (Optional[asyncpg.Connection]): Соединение с БД.
+            По умолчанию берётся из общего пула.
+
+    Возвращает:
+        list[int]: Версии применённых миграций.
+    """
+    if connection is None:
+        async with db.connect_to_pool() as connection:
+            return await migrate(connection)
+
+    applied = []
+    async with connection.transaction():
+        await lock_schema_migrations(connection)
+        await create_schema_migrations_table(connection)
+        done = await get_applied_migrations(connection)
+        for version, name, apply in MIGRATIONS:
+            if version in done:
+                continue
+            async with connection.transaction():
+                await apply(connection)
+                await record_migration(connection, version, name)
+            applied.append(version)
+    return applied
+
+
+async def migration_status(connection: asyncpg.Connection) -> list[dict]:
+    """Список миграций с временем применения (None — не применена)."""
+    await create_schema_migrations_table(connection)
+    done = await get_applied_migrations(connection)
+    return [{"version": version, "name": name,
+             "applied_at": done.get(version)}
+            for version, name, _ in MIGRATIONS]
+
+
+def _plan_checks() -> list[tuple[str, str, tuple, bool]]:
+    """
+    Запросы чтения из crud с примерами параметров и признаком
+    упорядоченного чтения (ORDER BY должен обслуживаться индексом).
+    """
+    since, until = date(2024, 1, 1), date(2024, 1, 31)
+    checks = [
+        ("fetch_repo_activity", REPO_ACTIVITY_QUERY,
+         ("owner", "repo", since, until), True),
+        ("fetch_repo_rank_history", RANK_HISTORY_QUERY,
+         ("owner/repo", since, until), True),
+        ("get_sync_cursor", SYNC_CURSOR_QUERY, ("owner", "repo"), False),
+        ("get_top_snapshot", TOP_SNAPSHOT_QUERY, (None,), True),
+    ]
+    for sort_by, field in SORT_BY_MAPPING.items():
+        for order, direction in ORDER_MAPPING.items():
+            query = TOP_REPOS_QUERY.format(sort_field=field,
+                                           sort_order=direction)
+            checks.append((f"get_top_repos[{sort_by.value} {order.value}]",
+                           query, (100, 0, 1), True))
+    return checks
+
+
+def _scan_nodes(plan: dict) -> set[str]:
+    nodes = {plan["Node Type"]}
+    for child in plan.get("Plans", []):
+        nodes |= _scan_nodes(child)
+    return nodes
+
+
+async def check_query_plans(connection: asyncpg.Connection) -> dict:
+    """
+    Проверяет, что запросы чтения из crud выполняются через индекс,
+    а упорядоченные — ещё и без сортировки.
+
+    Возвращает:
+        dict: {имя запроса: {'ok': bool, 'nodes': list[str]}} — ok, если
+        в плане есть индексное сканирование и нет последовательного,
+        а в плане упорядоченного запроса нет узла Sort.
+    """
+    results = {}
+    async with connection.transaction():
+        await connection.execute("SET LOCAL enable_seqscan = off; "
+                                 "SET LOCAL enable_sort = off")
+        for name, query, args, ordered in _plan_checks():
+            nodes = _scan_nodes(await explain_query(connection, query,
+                                                    *args))
+            results[name] = {
+                "ok": bool(nodes & _INDEX_SCANS)
+                and "Seq Scan" not in nodes
+                and not (ordered and nodes & _SORTS),
+                "nodes": sorted(nodes),
+            }
+    return results
+
+
+async def main(command: str) -> int:
+    """Выполняет команду CLI; возвращает код завершения."""
+    await db.connect()
+    try:
+        async with db.connect_to_pool() as conn:
+            if command == "migrate":
+                applied = await migrate(conn)
+                print(f"Применены миграции: {applied or 'нет новых'}")
+                return 0
+            if command == "status":
+                for item in await migration_status(conn):
+                    print(f"{item['version']:4}  {item['name']:30} "
+                          f"{item['applied_at'] or 'не применена'}")
+                return 0
+            await migrate(conn)
+            failed = 0
+            for name, result in (await check_query_plans(conn)).items():
+                mark = "ok" if result["ok"] else "НЕТ ИНДЕКСА"
+                failed += not result["ok"]
+                print(f"{mark:12} {name}: {', '.join(result['nodes'])}")
+            return 1 if failed else 0
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Миграции схемы БД")
+    parser.add_argument("command", nargs="?", default="migrate",
+                        choices=["migrate", "status", "check"])
+    raise SystemExit(asyncio.run(main(parser.parse_args().command)))
@@ -0,0 +1,135 @@
+"""
+Обслуживание месячных секций таблицы activity.
+
+activity секционирована по месяцам (миграция 3). Обслуживание:
+- заранее создаёт секции текущего и ACTIVITY_PARTITIONS_AHEAD следующих
+  месяцев, чтобы запись новых дней не попадала в секцию по умолчанию;
+- создаёт секции для месяцев, строки которых всё же оказались в секции
+  по умолчанию (например, после исторической загрузки), и переносит их;
+- если задан ACTIVITY_RETENTION_MONTHS, отсоединяет секции старше этого
+  срока (ACTIVITY_RETENTION_MODE=detach) или удаляет их (drop).
+
+Обслуживание выполняется при каждом плановом обновлении, а также
+из командной строки:
+
+    python -m app.db.partitions
+    python -m app.db.partitions --retention-months 36 --mode drop
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import date, datetime, timezone
+from typing import Optional
+
+import asyncpg  # type: ignore
+
+from app.db.connection import db
+from app.repositories.crud import (create_activity_partitions,
+                                   drop_activity_partitions,
+                                   get_activity_partitions,
+                                   get_default_partition_months,
+                                   lock_activity_partitions)
+
+# На сколько месяцев вперёд создавать секции
+ACTIVITY_PARTITIONS_AHEAD = int(os.getenv("ACTIVITY_PARTITIONS_AHEAD", "3"))
+# Сколько полных месяцев хранить (0 — хранить всё)
+ACTIVITY_RETENTION_MONTHS = int(os.getenv("ACTIVITY_RETENTION_MONTHS", "0"))
+# Что делать с секциями старше срока: detach или drop
+ACTIVITY_RETENTION_MODE = os.getenv("ACTIVITY_RETENTION_MODE", "detach")
+
+
+def add_months(month: date, months: int) -> date:
+    """Первый день месяца, отстоящего от month на months месяцев."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+async def maintain_activity_partitions(
+    connection: Optional[asyncpg.Connection] = None,
+    today: Optional[date] = None,
+    ahead: int = ACTIVITY_PARTITIONS_AHEAD,
+    retention_months: int = ACTIVITY_RETENTION_MONTHS,
+    mode: str = ACTIVITY_RETENTION_MODE
+) -> dict:
+    """
+    Создаёт будущие секции activity, разбирает секцию по умолчанию
+    и отсоединяет (или удаляет) устаревшие секции.
+
+    Параметры:
+        connection (Optional[asyncpg.Connection]): Соединение с БД.
+            По умолчанию берётся из общего пула.
+        today (Optional[date]): Текущий день (UTC).
+        ahead (int): На сколько месяцев вперёд создавать секции.
+        retention_months (int): Сколько полных месяцев хранить,
+            0 — хранить всё.
+        mode (str): "detach" или "drop" для устаревших секций.
+
+    Возвращает:
+        dict: {'created': list[str], 'detached': list[str],
+        'dropped': list[str]} — имена секций.
+
+    Исключения:
+        ValueError: При неизвестном mode.
+    """
+    if mode not in ("detach", "drop"):
+        raise ValueError(f"Неизвестный режим хранения секций: {mode}")
+    if connection is None:
+        async with db.connect_to_pool() as connection:
+            return await maintain_activity_partitions(
+                connection, today, ahead, retention_months, mode)
+
+    current = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    report: dict[str, list[str]] = {"created": [], "detached": [],
+                                    "dropped": []}
+    async with connection.transaction():
+        await lock_activity_partitions(connection)
+        report["created"] += await create_activity_partitions(
+            connection, current, add_months(current, ahead))
+        for month in await get_default_partition_months(connection):
+            report["created"] += await create_activity_partitions(
+                connection, month, month)
+        if retention_months > 0:
+            expired = await drop_activity_partitions(
+                connection, add_months(current, -retention_months),
+                drop=mode == "drop")
+            report["dropped" if mode == "drop" else "detached"] = expired
+    return report
+
+
+async def ensure_activity_partitions(since: date, until: date) -> list[str]:
+    """
+    Создаёт секции activity для дней [since, until] перед записью
+    исторического периода, чтобы строки сразу попали в свои секции.
+    """
+    async with db.connect_to_pool() as connection:
+        async with connection.transaction():
+            await lock_activity_partitions(connection)
+            return await create_activity_partitions(connection, since, until)
+
+
+async def main(args: argparse.Namespace) -> dict:
+    """Подключается к БД, обслуживает секции и закрывает соединения."""
+    await db.connect()
+    try:
+        async with db.connect_to_pool() as conn:
+            report = await maintain_activity_partitions(
+                conn, ahead=args.ahead,
+                retention_months=args.retention_months, mode=args.mode)
+            report["partitions"] = len(await get_activity_partitions(conn))
+        return report
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Обслуживание секций таблицы activity")
+    parser.add_argument("--ahead", type=int,
+                        default=ACTIVITY_PARTITIONS_AHEAD)
+    parser.add_argument("--retention-months", type=int,
+                        default=ACTIVITY_RETENTION_MONTHS)
+    parser.add_argument("--mode", choices=["detach", "drop"],
+                        default=ACTIVITY_RETENTION_MODE)
+    for key, value in asyncio.run(main(parser.parse_args())).items():
+        print(f"{key}: {value}")
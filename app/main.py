@@ -2,13 +2,15 @@
 Основной файл приложения FastAPI.
 
 Содержит:
-- Настройку жизненного цикла приложения (подключение и отключение БД).
+- Настройку жизненного цикла приложения (подключение и отключение БД,
+  применение миграций схемы).
 - Подключение маршрутов (эндпоинтов) для работы с API.
 """
 
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.db.connection import db
+from app.db.migrations import migrate
 from app.repositories.routers import router as repos_router
 
 
@@ -18,10 +20,12 @@ async def lifespan(app: FastAPI):
     Настройка жизненного цикла приложения.
 
     Включает:
-    - Подключение к базе данных при старте приложения.
+    - Подключение к базе данных и применение новых миграций
+      при старте приложения.
     - Отключение от базы данных при завершении работы.
     """
     await db.connect()
+    await migrate()
     yield
     await db.disconnect()
 
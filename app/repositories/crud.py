@@ -1,7 +1,9 @@
-from datetime import date
+import json
+import re
+from datetime import date, datetime
 import asyncpg  # type: ignore
 
-from .schemas import TopRepo, SortBy, Order, RepoActivity
+from .schemas import TopRepo, SortBy, Order, RepoActivity, RankSnapshot
 
 
 SORT_BY_MAPPING = {
@@ -16,29 +18,101 @@ ORDER_MAPPING = {
     Order.DESC: "DESC"
 }
 
+# Дата коммита, по которой активность раскладывается по дням
+COMMIT_DATE_MAPPING = {
+    "author": "authored_at",
+    "committer": "committed_at"
+}
+
+# Как различать авторов в activity.authors
+COMMIT_AUTHOR_MAPPING = {
+    "name": "coalesce(c.author_name, 'Unknown')",
+    "email": "coalesce(lower(c.author_email), c.author_name, 'Unknown')"
+}
+
+
+# Наибольший размер топа: поиск GitHub отдаёт не больше 1000 результатов
+TOP_REPOS_MAX = 1000
+
+TOP_REPO_COLUMNS = ["repo", "owner", "position_cur", "position_prev",
+                    "stars", "watchers", "forks", "open_issues", "language"]
+
+
+# position_cur уникальна и делает порядок страниц однозначным при равных
+# значениях поля сортировки. Направление у неё то же, что у поля, —
+# так порядок совпадает с индексом (version, поле, position_cur) при
+# чтении в любую сторону
+TOP_REPOS_QUERY = """
+    SELECT repo, owner, position_cur, position_prev,
+    stars, watchers, forks, open_issues, language
+    FROM top_repos
+    WHERE version = $3
+    ORDER BY {sort_field} {sort_order}, position_cur {sort_order}
+    LIMIT $1 OFFSET $2
+"""
+
+TOP_SNAPSHOT_QUERY = """
+    SELECT version, published_at, repos
+    FROM top_snapshots
+    WHERE $1::bigint IS NULL OR version = $1
+    ORDER BY version DESC
+    LIMIT 1
+"""
+
+
+async def get_top_snapshot(
+    connection: asyncpg.Connection,
+    version: int | None = None
+) -> asyncpg.Record | None:
+    """
+    Возвращает опубликованный снимок топа (version, published_at, repos):
+    заданной версии или, по умолчанию, текущий. None — если снимка
+    такой версии уже (или ещё) нет.
+    """
+    try:
+        return await connection.fetchrow(TOP_SNAPSHOT_QUERY, version)
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in get_top_snapshot: {e}")
+
 
 async def get_top_repos(
     connection: asyncpg.Connection,
     sort_by: SortBy = SortBy.STARS,
-    order: Order = Order.DESC
+    order: Order = Order.DESC,
+    limit: int = 100,
+    offset: int = 0,
+    version: int | None = None
 ) -> list[TopRepo]:
+    """
+    Возвращает страницу снимка топа версии version (по умолчанию
+    текущего, см. get_top_snapshot).
+    """
     sort_field = SORT_BY_MAPPING.get(sort_by)
     sort_order = ORDER_MAPPING.get(order)
 
-    query = f"""
-        SELECT repo, owner, position_cur, position_prev,
-        stars, watchers, forks, open_issues, language
-        FROM top100
-        ORDER BY {sort_field} {sort_order}
-        LIMIT 100
-    """
+    query = TOP_REPOS_QUERY.format(sort_field=sort_field,
+                                   sort_order=sort_order)
     try:
-        rows = await connection.fetch(query)
+        if version is None:
+            snapshot = await get_top_snapshot(connection)
+            if snapshot is None:
+                return []
+            version = snapshot["version"]
+        rows = await connection.fetch(query, limit, offset, version)
         return [TopRepo(**dict(row)) for row in rows]
     except asyncpg.PostgresError as e:
         raise RuntimeError(f"Database error: {str(e)}")
 
 
+REPO_ACTIVITY_QUERY = """
+    SELECT date, commits, authors
+    FROM activity
+    WHERE owner = $1 and repo = $2
+    AND date BETWEEN $3 AND $4
+    ORDER BY date
+"""
+
+
 async def fetch_repo_activity(
     connection: asyncpg.Connection,
     owner: str,
@@ -46,86 +120,467 @@ async def fetch_repo_activity(
     since: date,
     until: date
 ) -> list[RepoActivity]:
-    query = """
-    SELECT date, commits, authors
-    FROM activity
-    WHERE owner = $1 and repo = $2
-    AND date BETWEEN $3 AND $4
-    ORDER BY date
-    """
     try:
-        rows = await connection.fetch(query, owner, repo, since, until)
+        rows = await connection.fetch(REPO_ACTIVITY_QUERY, owner, repo,
+                                      since, until)
         return [RepoActivity(**row) for row in rows]
     except asyncpg.PostgresError as e:
         raise RuntimeError(f"Database error: {str(e)}")
 
 
-async def upsert_top_100_repo(
+async def create_top100_table(connection: asyncpg.Connection) -> None:
+    """
+    Создаёт таблицу top100, если её ещё нет, и уникальный индекс по repo.
+    Миграция 4 превращает её в top_repos (см. create_top_snapshot_tables).
+    """
+    try:
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS top100 (
+                repo TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                position_cur INTEGER NOT NULL,
+                position_prev INTEGER,
+                stars INTEGER NOT NULL,
+                watchers INTEGER NOT NULL,
+                forks INTEGER NOT NULL,
+                open_issues INTEGER NOT NULL,
+                language TEXT
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS top100_repo_idx
+                ON top100 (repo);
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in create_top100_table: {e}")
+
+
+async def create_top100_sort_indexes(
+    connection: asyncpg.Connection
+) -> None:
+    """
+    Создаёт для каждого поля сортировки топа (SortBy) покрывающий индекс
+    (поле, position_cur) с остальными столбцами в INCLUDE: get_top_repos
+    читает страницу топа индексным сканированием без сортировки.
+    """
+    try:
+        for field in SORT_BY_MAPPING.values():
+            include = ", ".join(c for c in TOP_REPO_COLUMNS
+                                if c not in (field, "position_cur"))
+            await connection.execute(
+                f"""
+                CREATE INDEX IF NOT EXISTS top100_{field}_idx
+                ON top100 ({field}, position_cur) INCLUDE ({include})
+                """
+            )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in create_top100_sort_indexes: {e}")
+
+
+async def create_activity_table(connection: asyncpg.Connection) -> None:
+    """
+    Создаёт таблицу activity, если её ещё нет, и уникальный ключ
+    (owner, repo, date): по нему выбирается активность репозитория
+    за период и работает ON CONFLICT при записи.
+
+    В таблице, созданной раньше без ключа, повторы одного дня сначала
+    удаляются (остаётся последняя запись).
+    """
+    try:
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS activity (
+                owner TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                date DATE NOT NULL,
+                commits INTEGER NOT NULL,
+                authors TEXT[] NOT NULL DEFAULT '{}'
+            );
+            DELETE FROM activity a
+            USING activity b
+            WHERE a.owner = b.owner AND a.repo = b.repo
+            AND a.date = b.date AND a.ctid < b.ctid;
+            CREATE UNIQUE INDEX IF NOT EXISTS activity_owner_repo_date_key
+                ON activity (owner, repo, date);
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in create_activity_table: {e}")
+
+
+_PARTITION_FROM = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\)")
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+async def partition_activity_table(connection: asyncpg.Connection) -> None:
+    """
+    Превращает activity в таблицу, секционированную по месяцам
+    (PARTITION BY RANGE (date)), с секцией по умолчанию activity_default
+    для дней без своей секции.
+
+    Данные прежней таблицы переносятся в секции своих месяцев; на время
+    переноса таблица заблокирована. Уже секционированная таблица
+    не меняется.
+    """
+    try:
+        # relkind имеет тип "char", который asyncpg отдаёт как bytes
+        kind = await connection.fetchval(
+            "SELECT relkind::text FROM pg_class "
+            "WHERE oid = 'activity'::regclass")
+        if kind == "p":
+            return
+        await connection.execute(
+            """
+            ALTER TABLE activity RENAME TO activity_unpartitioned;
+            ALTER INDEX IF EXISTS activity_owner_repo_date_key
+                RENAME TO activity_unpartitioned_key;
+            CREATE TABLE activity (
+                owner TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                date DATE NOT NULL,
+                commits INTEGER NOT NULL,
+                authors TEXT[] NOT NULL DEFAULT '{}'
+            ) PARTITION BY RANGE (date);
+            CREATE UNIQUE INDEX activity_owner_repo_date_key
+                ON activity (owner, repo, date);
+            CREATE TABLE activity_default PARTITION OF activity DEFAULT;
+            """
+        )
+        bounds = await connection.fetchrow(
+            "SELECT min(date) AS since, max(date) AS until "
+            "FROM activity_unpartitioned")
+        if bounds["since"] is not None:
+            await create_activity_partitions(connection, bounds["since"],
+                                             bounds["until"])
+        await connection.execute(
+            """
+            INSERT INTO activity (owner, repo, date, commits, authors)
+            SELECT owner, repo, date, commits, authors
+            FROM activity_unpartitioned;
+            DROP TABLE activity_unpartitioned;
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in partition_activity_table: {e}")
+
+
+async def get_activity_partitions(
+    connection: asyncpg.Connection,
+    table: str = "activity"
+) -> dict[date | None, str]:
+    """
+    Возвращает секции таблицы: {первый день месяца: имя секции};
+    секция по умолчанию — под ключом None.
+    """
+    try:
+        rows = await connection.fetch(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = $1::regclass
+            """,
+            table
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in get_activity_partitions: {e}")
+    partitions: dict[date | None, str] = {}
+    for row in rows:
+        match = _PARTITION_FROM.search(row["bound"])
+        month = date.fromisoformat(match.group(1)) if match else None
+        partitions[month] = row["relname"]
+    return partitions
+
+
+async def create_activity_partitions(
+    connection: asyncpg.Connection,
+    since: date,
+    until: date,
+    table: str = "activity"
+) -> list[str]:
+    """
+    Создаёт недостающие месячные секции для дней [since, until].
+
+    Строки этих месяцев, попавшие в секцию по умолчанию, переносятся
+    в новую секцию. Секция присоединяется с CHECK по диапазону,
+    поэтому ATTACH PARTITION не перечитывает её строки.
+
+    Параметры:
+        connection: asyncpg.Connection - активное подключение к БД
+        since: date - первый день периода
+        until: date - последний день периода (включительно)
+        table: str - секционированная таблица
+
+    Возвращает:
+        list[str]: Имена созданных секций.
+    """
+    partitions = await get_activity_partitions(connection, table)
+    default = partitions.get(None)
+    created = []
+    month = _month_start(since)
+    try:
+        while month <= until:
+            end = _next_month(month)
+            name = f"{table}_y{month.year}m{month.month:02}"
+            if month not in partitions:
+                async with connection.transaction():
+                    await connection.execute(
+                        f"""
+                        CREATE TABLE {name}
+                            (LIKE {table} INCLUDING DEFAULTS);
+                        ALTER TABLE {name} ADD CONSTRAINT {name}_range
+                            CHECK (date >= '{month}' AND date < '{end}')
+                        """
+                    )
+                    if default is not None:
+                        await connection.execute(
+                            f"""
+                            WITH moved AS (
+                                DELETE FROM {default}
+                                WHERE date >= $1 AND date < $2
+                                RETURNING owner, repo, date, commits,
+                                          authors
+                            )
+                            INSERT INTO {name}
+                                (owner, repo, date, commits, authors)
+                            SELECT * FROM moved
+                            """,
+                            month, end
+                        )
+                    await connection.execute(
+                        f"""
+                        ALTER TABLE {table} ATTACH PARTITION {name}
+                            FOR VALUES FROM ('{month}') TO ('{end}');
+                        ALTER TABLE {name} DROP CONSTRAINT {name}_range
+                        """
+                    )
+                created.append(name)
+            month = end
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in create_activity_partitions: {e}")
+    return created
+
+
+async def get_default_partition_months(
     connection: asyncpg.Connection,
-    repo_data: dict
+    table: str = "activity"
+) -> list[date]:
+    """Месяцы, строки которых лежат в секции по умолчанию."""
+    default = (await get_activity_partitions(connection, table)).get(None)
+    if default is None:
+        return []
+    try:
+        rows = await connection.fetch(
+            f"SELECT DISTINCT date_trunc('month', date)::date AS month "
+            f"FROM {default} ORDER BY 1")
+        return [row["month"] for row in rows]
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in get_default_partition_months: {e}")
+
+
+async def drop_activity_partitions(
+    connection: asyncpg.Connection,
+    before: date,
+    drop: bool = False,
+    table: str = "activity"
+) -> list[str]:
+    """
+    Отсоединяет месячные секции, целиком лежащие раньше before.
+
+    Отсоединённая секция остаётся отдельной таблицей (её можно
+    выгрузить в архив); при drop=True она удаляется. В отличие от
+    DELETE по диапазону дат, это не оставляет мёртвых строк для VACUUM.
+
+    Возвращает:
+        list[str]: Имена отсоединённых (или удалённых) секций.
+    """
+    partitions = await get_activity_partitions(connection, table)
+    expired = [name for month, name in sorted(
+        (item for item in partitions.items() if item[0] is not None))
+        if _next_month(month) <= before]
+    try:
+        for name in expired:
+            async with connection.transaction():
+                await connection.execute(
+                    f"ALTER TABLE {table} DETACH PARTITION {name}")
+                if drop:
+                    await connection.execute(f"DROP TABLE {name}")
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in drop_activity_partitions: {e}")
+    return expired
+
+
+async def lock_activity_partitions(connection: asyncpg.Connection) -> None:
+    """
+    Берёт транзакционную рекомендательную блокировку обслуживания
+    секций: процессы не создают одну секцию одновременно.
+    """
+    try:
+        await connection.execute(
+            "SELECT pg_advisory_xact_lock(hashtext('activity_partitions'))")
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in lock_activity_partitions: {e}")
+
+
+async def create_top_snapshot_tables(
+    connection: asyncpg.Connection
 ) -> None:
     """
-    Вставляет или обновляет запись в таблицу top100.
-    Если записи нет — вставляет, если есть — обновляет.
+    Переводит топ на версионные снимки.
+
+    Таблица top100 переименовывается в top_repos со столбцом version,
+    каждая публикация топа — строка top_snapshots. Текущий снимок —
+    с наибольшей версией; top100 становится представлением с его
+    строками, поэтому прежние читатели (update_data, backfill, очередь
+    заданий) видят топ целиком из одного снимка.
+
+    Индексы top_repos: уникальный (version, repo) и покрывающий
+    (version, поле, position_cur) на каждое поле сортировки /top.
+    """
+    try:
+        await connection.execute(
+            """
+            ALTER TABLE top100 RENAME TO top_repos;
+            ALTER TABLE top_repos DROP CONSTRAINT IF EXISTS top100_pkey;
+            ALTER TABLE top_repos ADD COLUMN version BIGINT;
+            CREATE TABLE top_snapshots (
+                version BIGSERIAL PRIMARY KEY,
+                published_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                repos INTEGER NOT NULL
+            );
+            WITH snapshot AS (
+                INSERT INTO top_snapshots (repos)
+                SELECT count(*) FROM top_repos
+                RETURNING version
+            )
+            UPDATE top_repos SET version = (SELECT version FROM snapshot);
+            ALTER TABLE top_repos ALTER COLUMN version SET NOT NULL;
+            DROP INDEX IF EXISTS top100_repo_idx;
+            CREATE UNIQUE INDEX top_repos_version_repo_idx
+                ON top_repos (version, repo);
+            """
+        )
+        for field in SORT_BY_MAPPING.values():
+            include = ", ".join(c for c in TOP_REPO_COLUMNS
+                                if c not in (field, "position_cur"))
+            await connection.execute(
+                f"""
+                DROP INDEX IF EXISTS top100_{field}_idx;
+                CREATE INDEX top_repos_{field}_idx ON top_repos
+                    (version, {field}, position_cur) INCLUDE ({include})
+                """
+            )
+        await connection.execute(
+            f"""
+            CREATE VIEW top100 AS
+            SELECT {", ".join(TOP_REPO_COLUMNS)}
+            FROM top_repos
+            WHERE version = (SELECT max(version) FROM top_snapshots)
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in create_top_snapshot_tables: {e}")
+
+
+async def publish_top_snapshot(
+    connection: asyncpg.Connection,
+    repos: list[dict],
+    keep: int = 2
+) -> int:
+    """
+    Публикует новый топ отдельным снимком в одной транзакции: строки
+    записываются с новой версией, которая становится текущей при
+    фиксации. Строки прежних снимков не меняются, поэтому читатели
+    не ждут записи и до фиксации видят прежний снимок целиком.
+
+    position_prev — позиция репозитория в предыдущем снимке,
+    а если его там не было — значение из repo_data (например, последняя
+    позиция из top_history).
 
     Параметры:
         connection: asyncpg.Connection - активное подключение к БД
-        repo_data: dict - словарь с ключами:
+        repos: list[dict] - словари с ключами:
             "repo": str — уникальное имя репозитория (full_name)
             "owner": str — владелец
             "position_cur": int — текущая позиция в топе
             "position_prev": Optional[int] — предыдущая позиция
-            (может быть None)
-            "stars": int — количество звёзд
-            "watchers": int — количество просмотров
-            "forks": int — количество форков
-            "open_issues": int — количество открытых issues
-            "language": Optional[str] — язык (может быть None)
-    """
+            "stars", "watchers", "forks", "open_issues": int — метрики
+            "language": Optional[str] — язык
+        keep: int - сколько последних снимков хранить (не меньше 2,
+            чтобы клиент, листающий страницы прежней версии, успел
+            дочитать их после публикации)
 
+    Возвращает:
+        int: Версия опубликованного снимка.
+    """
     try:
-        update_result = await connection.execute(
-            """
-            UPDATE top100
-            SET position_prev = position_cur,
-                position_cur = $2,
-                stars = $3,
-                watchers = $4,
-                forks = $5,
-                open_issues = $6,
-                language = $7
-            WHERE repo = $1
-            """,
-            repo_data["repo"],
-            repo_data["position_cur"],
-            repo_data["stars"],
-            repo_data["watchers"],
-            repo_data["forks"],
-            repo_data["open_issues"],
-            repo_data["language"]
-        )
-
-        # Проверяем, были ли затронуты строки
-        if update_result == "UPDATE 0":
-            # Если запись не обновлена, значит её нет. Вставляем.
+        async with connection.transaction():
+            version = await connection.fetchval(
+                "INSERT INTO top_snapshots (repos) VALUES ($1) "
+                "RETURNING version",
+                len(repos)
+            )
             await connection.execute(
                 """
-                INSERT INTO top100 (repo, owner, position_cur, position_prev,
-                stars, watchers, forks, open_issues, language)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                INSERT INTO top_repos (version, repo, owner, position_cur,
+                position_prev, stars, watchers, forks, open_issues,
+                language)
+                SELECT $1, r.repo, r.owner, r.position_cur,
+                       coalesce(p.position_cur, r.position_prev),
+                       r.stars, r.watchers, r.forks, r.open_issues,
+                       r.language
+                FROM UNNEST($2::text[], $3::text[], $4::int[], $5::int[],
+                            $6::int[], $7::int[], $8::int[], $9::int[],
+                            $10::text[])
+                     AS r(repo, owner, position_cur, position_prev, stars,
+                          watchers, forks, open_issues, language)
+                LEFT JOIN top_repos p ON p.repo = r.repo
+                AND p.version = (SELECT max(version) FROM top_snapshots
+                                 WHERE version < $1)
+                """,
+                version,
+                [r["repo"] for r in repos],
+                [r["owner"] for r in repos],
+                [r["position_cur"] for r in repos],
+                [r["position_prev"] for r in repos],
+                [r["stars"] for r in repos],
+                [r["watchers"] for r in repos],
+                [r["forks"] for r in repos],
+                [r["open_issues"] for r in repos],
+                [r["language"] for r in repos]
+            )
+            oldest = await connection.fetchval(
+                """
+                SELECT min(version) FROM (
+                    SELECT version FROM top_snapshots
+                    ORDER BY version DESC LIMIT $1
+                ) kept
                 """,
-                repo_data["repo"],
-                repo_data["owner"],
-                repo_data["position_cur"],
-                repo_data["position_prev"],
-                repo_data["stars"],
-                repo_data["watchers"],
-                repo_data["forks"],
-                repo_data["open_issues"],
-                repo_data["language"]
+                max(2, keep)
             )
+            await connection.execute(
+                "DELETE FROM top_snapshots WHERE version < $1", oldest)
+            await connection.execute(
+                "DELETE FROM top_repos WHERE version < $1", oldest)
+        return version
     except asyncpg.PostgresError as e:
-        raise RuntimeError(f"Database error in insert_or_update_top100: {e}")
+        raise RuntimeError(f"Database error in publish_top_snapshot: {e}")
 
 
 async def upsert_repo_activity(
@@ -150,27 +605,1493 @@ async def upsert_repo_activity(
     """
 
     try:
-        update_result = await connection.execute(
+        await connection.execute(
             """
-            UPDATE activity
-            SET commits = $4,
-                authors = $5
-            WHERE owner = $1 AND repo = $2 AND date = $3
+            INSERT INTO activity (owner, repo, date, commits, authors)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (owner, repo, date) DO UPDATE
+            SET commits = EXCLUDED.commits,
+                authors = EXCLUDED.authors
             """,
             owner, repo, date, commits, authors
         )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in insert_or_update_activity: {e}")
+
+
+async def write_activity_batch(
+    connection: asyncpg.Connection,
+    records: list[tuple],
+    replace: bool = True
+) -> None:
+    """
+    Записывает пакет дневных записей в activity: строки загружаются
+    через COPY во временную таблицу activity_staging и сливаются
+    с activity одним запросом.
 
-        if update_result == "UPDATE 0":
+    Параметры:
+        connection: asyncpg.Connection - активное подключение к БД
+        records: list[tuple] - строки (owner, repo, date, commits,
+            authors) без повторов по (owner, repo, date)
+        replace: bool - True — заменить дни (как upsert_repo_activity),
+            False — добавить к ним коммиты и авторов
+            (как merge_repo_activity)
+    """
+    if replace:
+        assignments = """
+            commits = EXCLUDED.commits,
+            authors = EXCLUDED.authors
+        """
+    else:
+        assignments = """
+            commits = activity.commits + EXCLUDED.commits,
+            authors = ARRAY(SELECT DISTINCT unnest(activity.authors
+                                                   || EXCLUDED.authors))
+        """
+    try:
+        async with connection.transaction():
+            # Временная таблица живёт до конца сеанса; очищается перед
+            # каждым пакетом, так как пакет может быть точкой сохранения
+            # внутри внешней транзакции
             await connection.execute(
                 """
+                CREATE TEMP TABLE IF NOT EXISTS activity_staging (
+                    owner TEXT NOT NULL,
+                    repo TEXT NOT NULL,
+                    date DATE NOT NULL,
+                    commits INTEGER NOT NULL,
+                    authors TEXT[] NOT NULL
+                );
+                TRUNCATE activity_staging;
+                """
+            )
+            await connection.copy_records_to_table(
+                "activity_staging", records=records,
+                columns=["owner", "repo", "date", "commits", "authors"]
+            )
+            await connection.execute(
+                f"""
                 INSERT INTO activity (owner, repo, date, commits, authors)
-                VALUES ($1, $2, $3, $4, $5)
-                """,
-                owner,
-                repo,
-                date,
-                commits,
-                authors
+                SELECT owner, repo, date, commits, authors
+                FROM activity_staging
+                ON CONFLICT (owner, repo, date) DO UPDATE
+                SET {assignments}
+                """
             )
     except asyncpg.PostgresError as e:
-        raise RuntimeError(f"Database error in insert_or_update_activity: {e}")
+        raise RuntimeError(f"Database error in write_activity_batch: {e}")
+
+
+async def create_http_cache_table(connection: asyncpg.Connection) -> None:
+    """
+    Создаёт таблицу http_cache, если её ещё нет.
+
+    Таблица хранит валидаторы (ETag/Last-Modified) и тело последнего
+    ответа GitHub API для каждого URL запроса.
+    """
+    try:
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body BYTEA NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in create_http_cache_table: {e}")
+
+
+async def get_http_cache_entry(
+    connection: asyncpg.Connection,
+    url: str
+) -> asyncpg.Record | None:
+    """
+    Возвращает запись кэша (etag, last_modified, body) для URL
+    или None, если её нет.
+    """
+    try:
+        return await connection.fetchrow(
+            "SELECT etag, last_modified, body FROM http_cache WHERE url = $1",
+            url
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in get_http_cache_entry: {e}")
+
+
+async def upsert_http_cache_entry(
+    connection: asyncpg.Connection,
+    url: str,
+    etag: str | None,
+    last_modified: str | None,
+    body: bytes
+) -> None:
+    """
+    Вставляет или обновляет запись кэша для URL.
+
+    Параметры:
+        connection: asyncpg.Connection - активное подключение к БД
+        url: str - путь запроса вместе с параметрами
+        etag: Optional[str] - значение заголовка ETag
+        last_modified: Optional[str] - значение заголовка Last-Modified
+        body: bytes - тело ответа
+    """
+    try:
+        await connection.execute(
+            """
+            INSERT INTO http_cache (url, etag, last_modified, body, updated_at)
+            VALUES ($1, $2, $3, $4, now())
+            ON CONFLICT (url) DO UPDATE
+            SET etag = EXCLUDED.etag,
+                last_modified = EXCLUDED.last_modified,
+                body = EXCLUDED.body,
+                updated_at = EXCLUDED.updated_at
+            """,
+            url, etag, last_modified, body
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in upsert_http_cache_entry: {e}")
+
+
+async def delete_stale_http_cache(
+    connection: asyncpg.Connection,
+    max_age_days: int
+) -> None:
+    """Удаляет записи кэша, не обновлявшиеся дольше max_age_days дней."""
+    try:
+        await connection.execute(
+            """
+            DELETE FROM http_cache
+            WHERE updated_at < now() - make_interval(days => $1)
+            """,
+            max_age_days
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in delete_stale_http_cache: {e}")
+
+
+async def merge_repo_activity(
+    connection: asyncpg.Connection,
+    owner: str,
+    repo: str,
+    date: date,
+    commits: int,
+    authors: list[str]
+) -> None:
+    """
+    Добавляет новые коммиты к записи в таблице activity.
+    Если записи нет — вставляет, если есть — увеличивает число коммитов
+    и объединяет списки авторов без повторов.
+
+    Параметры:
+        connection: asyncpg.Connection - активное подключение к БД
+        owner: str - владелец репозитория
+        repo: str - имя репозитория
+        date: date - дата (формат: YYYY-MM-DD)
+        commits: int - количество новых коммитов за день
+        authors: List[str] - авторы новых коммитов
+    """
+
+    try:
+        await connection.execute(
+            """
+            INSERT INTO activity (owner, repo, date, commits, authors)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (owner, repo, date) DO UPDATE
+            SET commits = activity.commits + EXCLUDED.commits,
+                authors = ARRAY(
+                    SELECT DISTINCT unnest(activity.authors
+                                           || EXCLUDED.authors)
+                )
+            """,
+            owner, repo, date, commits, authors
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in merge_repo_activity: {e}")
+
+
+async def create_sync_cursor_table(connection: asyncpg.Connection) -> None:
+    """
+    Создаёт таблицу sync_cursor, если её ещё нет.
+
+    Таблица хранит для каждого репозитория момент, по который коммиты
+    уже учтены в activity, и SHA последнего обработанного коммита.
+    """
+    try:
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sync_cursor (
+                owner TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                synced_until TIMESTAMPTZ NOT NULL,
+                head_sha TEXT,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (owner, repo)
+            )
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in create_sync_cursor_table: {e}")
+
+
+SYNC_CURSOR_QUERY = """
+    SELECT synced_until, head_sha
+    FROM sync_cursor
+    WHERE owner = $1 AND repo = $2
+"""
+
+
+async def get_sync_cursor(
+    connection: asyncpg.Connection,
+    owner: str,
+    repo: str
+) -> asyncpg.Record | None:
+    """
+    Возвращает курсор синхронизации (synced_until, head_sha)
+    репозитория или None, если репозиторий ещё не синхронизировался.
+    """
+    try:
+        return await connection.fetchrow(SYNC_CURSOR_QUERY, owner, repo)
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in get_sync_cursor: {e}")
+
+
+async def advance_sync_cursor(
+    connection: asyncpg.Connection,
+    owner: str,
+    repo: str,
+    prev_synced_until: datetime | None,
+    synced_until: datetime,
+    head_sha: str | None
+) -> bool:
+    """
+    Передвигает курсор синхронизации репозитория.
+
+    Курсор меняется, только если он всё ещё равен prev_synced_until
+    (None — курсора ещё нет). Так параллельный запуск, успевший
+    передвинуть курсор раньше, не даст учесть коммиты дважды.
+
+    Возвращает:
+        bool: True, если курсор передвинут.
+    """
+    try:
+        if prev_synced_until is None:
+            result = await connection.execute(
+                """
+                INSERT INTO sync_cursor (owner, repo, synced_until, head_sha)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (owner, repo) DO NOTHING
+                """,
+                owner, repo, synced_until, head_sha
+            )
+            return result == "INSERT 0 1"
+
+        result = await connection.execute(
+            """
+            UPDATE sync_cursor
+            SET synced_until = $4,
+                head_sha = $5,
+                updated_at = now()
+            WHERE owner = $1 AND repo = $2 AND synced_until = $3
+            """,
+            owner, repo, prev_synced_until, synced_until, head_sha
+        )
+        return result == "UPDATE 1"
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in advance_sync_cursor: {e}")
+
+
+async def create_backfill_progress_table(
+    connection: asyncpg.Connection
+) -> None:
+    """
+    Создаёт таблицу backfill_progress, если её ещё нет.
+
+    Таблица хранит завершённые окна исторической загрузки, чтобы
+    прерванное задание продолжалось с места остановки.
+    """
+    try:
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS backfill_progress (
+                job TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                window_start DATE NOT NULL,
+                window_end DATE NOT NULL,
+                commits INTEGER NOT NULL,
+                finished_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (job, owner, repo, window_start)
+            )
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in create_backfill_progress_table: {e}")
+
+
+async def get_finished_backfill_windows(
+    connection: asyncpg.Connection,
+    job: str
+) -> set[tuple[str, str, date]]:
+    """
+    Возвращает завершённые окна задания в виде множества
+    (owner, repo, window_start).
+    """
+    try:
+        rows = await connection.fetch(
+            """
+            SELECT owner, repo, window_start
+            FROM backfill_progress
+            WHERE job = $1
+            """,
+            job
+        )
+        return {(r["owner"], r["repo"], r["window_start"]) for r in rows}
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in get_finished_backfill_windows: {e}")
+
+
+async def mark_backfill_window(
+    connection: asyncpg.Connection,
+    job: str,
+    owner: str,
+    repo: str,
+    window_start: date,
+    window_end: date,
+    commits: int
+) -> None:
+    """Отмечает окно исторической загрузки как завершённое."""
+    try:
+        await connection.execute(
+            """
+            INSERT INTO backfill_progress
+                (job, owner, repo, window_start, window_end, commits)
+            VALUES ($1, $2, $3, $4, $5, $6)
+            ON CONFLICT (job, owner, repo, window_start) DO UPDATE
+            SET window_end = EXCLUDED.window_end,
+                commits = EXCLUDED.commits,
+                finished_at = now()
+            """,
+            job, owner, repo, window_start, window_end, commits
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in mark_backfill_window: {e}")
+
+
+async def create_refresh_jobs_table(connection: asyncpg.Connection) -> None:
+    """
+    Создаёт таблицу очереди refresh_jobs, если её ещё нет.
+
+    Каждая строка — задание на обновление активности одного репозитория.
+    Статусы: pending (ждёт), running (взято обработчиком до lease_until),
+    done (выполнено), dead (исчерпаны попытки). Для репозитория может
+    быть не больше одного незавершённого задания.
+    """
+    try:
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS refresh_jobs (
+                id BIGSERIAL PRIMARY KEY,
+                owner TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                locked_by TEXT,
+                lease_until TIMESTAMPTZ,
+                last_error TEXT,
+                commits INTEGER,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                finished_at TIMESTAMPTZ
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS refresh_jobs_active_repo_idx
+                ON refresh_jobs (owner, repo)
+                WHERE status IN ('pending', 'running');
+            CREATE INDEX IF NOT EXISTS refresh_jobs_claim_idx
+                ON refresh_jobs (priority, id)
+                WHERE status IN ('pending', 'running');
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in create_refresh_jobs_table: {e}")
+
+
+async def enqueue_refresh_jobs(
+    connection: asyncpg.Connection,
+    jobs: list[tuple[str, str, int]]
+) -> int:
+    """
+    Ставит в очередь задания (owner, repo, priority).
+
+    Репозитории, у которых уже есть незавершённое задание, пропускаются.
+
+    Возвращает:
+        int: Сколько заданий добавлено.
+    """
+    try:
+        rows = await connection.fetch(
+            """
+            INSERT INTO refresh_jobs (owner, repo, priority)
+            SELECT * FROM UNNEST($1::text[], $2::text[], $3::int[])
+            ON CONFLICT (owner, repo) WHERE status IN ('pending', 'running')
+            DO NOTHING
+            RETURNING id
+            """,
+            [job[0] for job in jobs],
+            [job[1] for job in jobs],
+            [job[2] for job in jobs]
+        )
+        return len(rows)
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in enqueue_refresh_jobs: {e}")
+
+
+async def claim_refresh_jobs(
+    connection: asyncpg.Connection,
+    worker: str,
+    limit: int,
+    lease_seconds: float,
+    max_attempts: int
+) -> list[asyncpg.Record]:
+    """
+    Забирает до `limit` доступных заданий в порядке приоритета.
+
+    Доступны ожидающие задания, чьё время повтора наступило, и задания
+    с истёкшей арендой (обработчик упал или завис). Строки, уже
+    блокированные другим обработчиком, пропускаются (SKIP LOCKED),
+    поэтому одно задание не достанется двум обработчикам. Задания
+    с истёкшей арендой, исчерпавшие попытки, переводятся в dead.
+
+    Возвращает:
+        list[asyncpg.Record]: Задания (id, owner, repo, priority,
+        attempts), взятые в аренду на lease_seconds секунд.
+    """
+    try:
+        async with connection.transaction():
+            await connection.execute(
+                """
+                UPDATE refresh_jobs
+                SET status = 'dead',
+                    locked_by = NULL,
+                    lease_until = NULL,
+                    finished_at = now(),
+                    last_error = coalesce(last_error, 'аренда истекла')
+                WHERE id IN (
+                    SELECT id
+                    FROM refresh_jobs
+                    WHERE status = 'running'
+                      AND lease_until < now()
+                      AND attempts >= $1
+                    FOR UPDATE SKIP LOCKED
+                )
+                """,
+                max_attempts
+            )
+            return await connection.fetch(
+                """
+                UPDATE refresh_jobs AS j
+                SET status = 'running',
+                    locked_by = $1,
+                    lease_until = now() + make_interval(secs => $3),
+                    attempts = j.attempts + 1
+                FROM (
+                    SELECT id
+                    FROM refresh_jobs
+                    WHERE (status = 'pending' AND available_at <= now())
+                       OR (status = 'running' AND lease_until < now())
+                    ORDER BY priority, id
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                ) AS claimed
+                WHERE j.id = claimed.id
+                RETURNING j.id, j.owner, j.repo, j.priority, j.attempts
+                """,
+                worker, limit, float(lease_seconds)
+            )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in claim_refresh_jobs: {e}")
+
+
+async def extend_refresh_job_leases(
+    connection: asyncpg.Connection,
+    worker: str,
+    job_ids: list[int],
+    lease_seconds: float
+) -> set[int]:
+    """
+    Продлевает аренду заданий обработчика (heartbeat).
+
+    Возвращает:
+        set[int]: Задания, аренда которых продлена. Остальные обработчик
+        потерял (аренда истекла и задание взял другой).
+    """
+    try:
+        rows = await connection.fetch(
+            """
+            UPDATE refresh_jobs
+            SET lease_until = now() + make_interval(secs => $3)
+            WHERE id = ANY($2::bigint[])
+              AND locked_by = $1
+              AND status = 'running'
+            RETURNING id
+            """,
+            worker, job_ids, float(lease_seconds)
+        )
+        return {r["id"] for r in rows}
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in extend_refresh_job_leases: {e}")
+
+
+async def complete_refresh_job(
+    connection: asyncpg.Connection,
+    worker: str,
+    job_id: int,
+    commits: int
+) -> bool:
+    """
+    Отмечает задание выполненным.
+
+    Возвращает:
+        bool: False, если обработчик уже потерял аренду задания.
+    """
+    try:
+        result = await connection.execute(
+            """
+            UPDATE refresh_jobs
+            SET status = 'done',
+                commits = $3,
+                locked_by = NULL,
+                lease_until = NULL,
+                last_error = NULL,
+                finished_at = now()
+            WHERE id = $2 AND locked_by = $1 AND status = 'running'
+            """,
+            worker, job_id, commits
+        )
+        return result == "UPDATE 1"
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in complete_refresh_job: {e}")
+
+
+async def fail_refresh_job(
+    connection: asyncpg.Connection,
+    worker: str,
+    job_id: int,
+    error: str,
+    max_attempts: int,
+    backoff_seconds: float,
+    max_backoff_seconds: float
+) -> str | None:
+    """
+    Возвращает задание в очередь после ошибки.
+
+    Повтор откладывается экспоненциально: backoff_seconds * 2^(n-1)
+    после n-й попытки, но не больше max_backoff_seconds. Задание,
+    исчерпавшее max_attempts попыток, переводится в dead.
+
+    Возвращает:
+        Optional[str]: Новый статус ('pending' или 'dead') либо None,
+        если обработчик уже потерял аренду задания.
+    """
+    try:
+        return await connection.fetchval(
+            """
+            UPDATE refresh_jobs
+            SET status = CASE WHEN attempts >= $4 THEN 'dead'
+                              ELSE 'pending' END,
+                available_at = now() + make_interval(
+                    secs => least($6, $5 * power(2, attempts - 1))),
+                finished_at = CASE WHEN attempts >= $4 THEN now() END,
+                last_error = $3,
+                locked_by = NULL,
+                lease_until = NULL
+            WHERE id = $2 AND locked_by = $1 AND status = 'running'
+            RETURNING status
+            """,
+            worker, job_id, error, max_attempts,
+            float(backoff_seconds), float(max_backoff_seconds)
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in fail_refresh_job: {e}")
+
+
+async def delete_finished_refresh_jobs(
+    connection: asyncpg.Connection,
+    days: int
+) -> int:
+    """
+    Удаляет выполненные задания старше `days` дней (задания dead
+    остаются для разбора).
+
+    Возвращает:
+        int: Сколько заданий удалено.
+    """
+    try:
+        result = await connection.execute(
+            """
+            DELETE FROM refresh_jobs
+            WHERE status = 'done'
+              AND finished_at < now() - make_interval(days => $1)
+            """,
+            days
+        )
+        return int(result.split()[-1])
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in delete_finished_refresh_jobs: {e}")
+
+
+async def create_refresh_run_tables(connection: asyncpg.Connection) -> None:
+    """
+    Создаёт таблицы refresh_runs и refresh_run_shards, если их ещё нет.
+
+    refresh_runs — запуски обновления, разделённого на части (шарды);
+    refresh_run_shards — состояние каждой части: pending, running,
+    done или failed.
+    """
+    try:
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS refresh_runs (
+                run_id TEXT PRIMARY KEY,
+                shards INTEGER NOT NULL,
+                repos INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running',
+                commits INTEGER,
+                failed_repos INTEGER,
+                started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                finished_at TIMESTAMPTZ
+            );
+            CREATE TABLE IF NOT EXISTS refresh_run_shards (
+                run_id TEXT NOT NULL
+                    REFERENCES refresh_runs (run_id) ON DELETE CASCADE,
+                shard INTEGER NOT NULL,
+                repos INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                commits INTEGER,
+                failed_repos INTEGER,
+                error TEXT,
+                started_at TIMESTAMPTZ,
+                finished_at TIMESTAMPTZ,
+                PRIMARY KEY (run_id, shard)
+            );
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in create_refresh_run_tables: {e}")
+
+
+async def start_refresh_run(
+    connection: asyncpg.Connection,
+    run_id: str,
+    shard_sizes: list[int]
+) -> None:
+    """Регистрирует запуск и его шарды (shard_sizes — репозиториев в шарде)."""
+    try:
+        async with connection.transaction():
+            await connection.execute(
+                """
+                INSERT INTO refresh_runs (run_id, shards, repos)
+                VALUES ($1, $2, $3)
+                """,
+                run_id, len(shard_sizes), sum(shard_sizes)
+            )
+            await connection.execute(
+                """
+                INSERT INTO refresh_run_shards (run_id, shard, repos)
+                SELECT $1, shard - 1, repos
+                FROM UNNEST($2::int[]) WITH ORDINALITY AS s(repos, shard)
+                """,
+                run_id, shard_sizes
+            )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in start_refresh_run: {e}")
+
+
+async def mark_refresh_shard_running(
+    connection: asyncpg.Connection,
+    run_id: str,
+    shard: int
+) -> None:
+    """Отмечает начало обработки шарда."""
+    try:
+        await connection.execute(
+            """
+            UPDATE refresh_run_shards
+            SET status = 'running', started_at = now()
+            WHERE run_id = $1 AND shard = $2
+            """,
+            run_id, shard
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in mark_refresh_shard_running: {e}")
+
+
+async def finish_refresh_shard(
+    connection: asyncpg.Connection,
+    run_id: str,
+    shard: int,
+    commits: int,
+    failed_repos: int,
+    error: str | None = None
+) -> asyncpg.Record | None:
+    """
+    Записывает итог шарда (status done, или failed, если передан error)
+    и, если это был последний незавершённый шард, завершает запуск:
+    суммирует итоги шардов в refresh_runs и ставит статус done
+    (или partial, если какой-то шард завершился ошибкой).
+
+    Итог уже завершённого шарда не перезаписывается. Строка запуска
+    блокируется на время транзакции, поэтому завершение шардов
+    упорядочено и запуск завершает ровно один из них.
+
+    Возвращает:
+        Optional[asyncpg.Record]: Итог запуска (status, commits,
+        failed_repos, started_at, finished_at), если запуск завершён
+        этим вызовом, иначе None.
+    """
+    try:
+        async with connection.transaction():
+            await connection.execute(
+                "SELECT 1 FROM refresh_runs WHERE run_id = $1 FOR UPDATE",
+                run_id
+            )
+            await connection.execute(
+                """
+                UPDATE refresh_run_shards
+                SET status = CASE WHEN $5::text IS NULL THEN 'done'
+                                  ELSE 'failed' END,
+                    commits = $3,
+                    failed_repos = $4,
+                    error = $5,
+                    finished_at = now()
+                WHERE run_id = $1 AND shard = $2
+                  AND status IN ('pending', 'running')
+                """,
+                run_id, shard, commits, failed_repos, error
+            )
+            return await connection.fetchrow(
+                """
+                UPDATE refresh_runs AS r
+                SET status = CASE WHEN s.failed_shards = 0 THEN 'done'
+                                  ELSE 'partial' END,
+                    commits = s.commits,
+                    failed_repos = s.failed_repos,
+                    finished_at = now()
+                FROM (
+                    SELECT count(*) FILTER (
+                               WHERE status IN ('pending', 'running')
+                           ) AS open_shards,
+                           count(*) FILTER (
+                               WHERE status = 'failed'
+                           ) AS failed_shards,
+                           coalesce(sum(commits), 0) AS commits,
+                           coalesce(sum(failed_repos), 0) AS failed_repos
+                    FROM refresh_run_shards
+                    WHERE run_id = $1
+                ) AS s
+                WHERE r.run_id = $1
+                  AND r.finished_at IS NULL
+                  AND s.open_shards = 0
+                RETURNING r.status, r.commits, r.failed_repos,
+                          r.started_at, r.finished_at
+                """,
+                run_id
+            )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in finish_refresh_shard: {e}")
+
+
+async def get_refresh_run(
+    connection: asyncpg.Connection,
+    run_id: str
+) -> asyncpg.Record | None:
+    """
+    Возвращает запуск (status, shards, repos, commits, failed_repos,
+    started_at, finished_at) или None, если его нет.
+    """
+    try:
+        return await connection.fetchrow(
+            """
+            SELECT status, shards, repos, commits, failed_repos,
+                   started_at, finished_at
+            FROM refresh_runs
+            WHERE run_id = $1
+            """,
+            run_id
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in get_refresh_run: {e}")
+
+
+async def fail_stale_refresh_runs(
+    connection: asyncpg.Connection,
+    timeout: float
+) -> list[str]:
+    """
+    Завершает запуски, которые остаются незавершёнными дольше timeout
+    секунд: их шарды в статусах pending и running отмечаются failed
+    (все репозитории шарда — в failed_repos), а запуск — partial.
+    Шард, отчитавшийся позже, итог уже не меняет.
+
+    Возвращает:
+        list[str]: Идентификаторы завершённых запусков.
+    """
+    try:
+        async with connection.transaction():
+            rows = await connection.fetch(
+                """
+                SELECT run_id FROM refresh_runs
+                WHERE finished_at IS NULL
+                  AND started_at < now() - make_interval(secs => $1)
+                FOR UPDATE SKIP LOCKED
+                """,
+                float(timeout)
+            )
+            run_ids = [row["run_id"] for row in rows]
+            if not run_ids:
+                return []
+            await connection.execute(
+                """
+                UPDATE refresh_run_shards
+                SET status = 'failed',
+                    commits = coalesce(commits, 0),
+                    failed_repos = repos,
+                    error = $2,
+                    finished_at = now()
+                WHERE run_id = ANY($1::text[])
+                  AND status IN ('pending', 'running')
+                """,
+                run_ids, f"Шард не завершился за {timeout:g} с"
+            )
+            await connection.execute(
+                """
+                UPDATE refresh_runs AS r
+                SET status = 'partial',
+                    commits = s.commits,
+                    failed_repos = s.failed_repos,
+                    finished_at = now()
+                FROM (
+                    SELECT run_id,
+                           coalesce(sum(commits), 0) AS commits,
+                           coalesce(sum(failed_repos), 0) AS failed_repos
+                    FROM refresh_run_shards
+                    WHERE run_id = ANY($1::text[])
+                    GROUP BY run_id
+                ) AS s
+                WHERE r.run_id = s.run_id
+                """,
+                run_ids
+            )
+        return run_ids
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in fail_stale_refresh_runs: {e}")
+
+
+async def create_refresh_checkpoint_table(
+    connection: asyncpg.Connection
+) -> None:
+    """
+    Создаёт таблицу refresh_checkpoint, если её ещё нет.
+
+    Таблица хранит репозитории, которые обновление не успело обработать
+    до истечения времени вызова, — следующий вызов продолжит с них.
+    """
+    try:
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS refresh_checkpoint (
+                name TEXT PRIMARY KEY,
+                owners TEXT[] NOT NULL,
+                repos TEXT[] NOT NULL,
+                positions INTEGER[] NOT NULL,
+                run_started_at TIMESTAMPTZ NOT NULL,
+                invocations INTEGER NOT NULL DEFAULT 1,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in create_refresh_checkpoint_table: {e}")
+
+
+async def get_refresh_checkpoint(
+    connection: asyncpg.Connection,
+    name: str
+) -> asyncpg.Record | None:
+    """
+    Возвращает контрольную точку (owners, repos, positions,
+    run_started_at, invocations) или None, если её нет.
+    """
+    try:
+        return await connection.fetchrow(
+            """
+            SELECT owners, repos, positions, run_started_at, invocations
+            FROM refresh_checkpoint
+            WHERE name = $1
+            """,
+            name
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in get_refresh_checkpoint: {e}")
+
+
+async def save_refresh_checkpoint(
+    connection: asyncpg.Connection,
+    name: str,
+    repos: list[tuple[str, str, int]],
+    run_started_at: datetime
+) -> None:
+    """
+    Сохраняет необработанные репозитории (owner, repo, position)
+    и увеличивает счётчик вызовов запуска.
+    """
+    try:
+        await connection.execute(
+            """
+            INSERT INTO refresh_checkpoint
+                (name, owners, repos, positions, run_started_at)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (name) DO UPDATE
+            SET owners = EXCLUDED.owners,
+                repos = EXCLUDED.repos,
+                positions = EXCLUDED.positions,
+                run_started_at = EXCLUDED.run_started_at,
+                invocations = refresh_checkpoint.invocations + 1,
+                updated_at = now()
+            """,
+            name,
+            [r[0] for r in repos],
+            [r[1] for r in repos],
+            [r[2] for r in repos],
+            run_started_at
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in save_refresh_checkpoint: {e}")
+
+
+async def delete_refresh_checkpoint(
+    connection: asyncpg.Connection,
+    name: str
+) -> None:
+    """Удаляет контрольную точку завершённого запуска."""
+    try:
+        await connection.execute(
+            "DELETE FROM refresh_checkpoint WHERE name = $1",
+            name
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in delete_refresh_checkpoint: {e}")
+
+
+async def create_commit_store_tables(connection: asyncpg.Connection) -> None:
+    """
+    Создаёт таблицы хранилища коммитов, если их ещё нет.
+
+    repositories выдаёт репозиториям числовые id, commits хранит по строке
+    на коммит: SHA (20 байт), даты автора и коммиттера и автора. Таблица
+    только пополняется, а activity из неё выводится (rebuild_activity).
+    """
+    try:
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS repositories (
+                id BIGSERIAL PRIMARY KEY,
+                owner TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                UNIQUE (owner, repo)
+            );
+            CREATE TABLE IF NOT EXISTS commits (
+                repo_id BIGINT NOT NULL REFERENCES repositories (id),
+                sha BYTEA NOT NULL,
+                authored_at TIMESTAMPTZ NOT NULL,
+                committed_at TIMESTAMPTZ,
+                author_name TEXT,
+                author_email TEXT,
+                PRIMARY KEY (repo_id, sha)
+            );
+            CREATE INDEX IF NOT EXISTS commits_authored_idx
+                ON commits (repo_id, authored_at);
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in create_commit_store_tables: {e}")
+
+
+async def add_repository_activity_settings(
+    connection: asyncpg.Connection
+) -> None:
+    """
+    Добавляет в repositories правила агрегации activity: часовой пояс
+    дней, дату коммита и ключ автора. Их сохраняет пересчёт
+    (rebuild_activity), а инкрементальная запись (insert_commits)
+    раскладывает по ним новые коммиты.
+    """
+    try:
+        await connection.execute(
+            """
+            ALTER TABLE repositories
+                ADD COLUMN IF NOT EXISTS activity_tz TEXT NOT NULL
+                    DEFAULT 'UTC',
+                ADD COLUMN IF NOT EXISTS activity_date_field TEXT NOT NULL
+                    DEFAULT 'author',
+                ADD COLUMN IF NOT EXISTS activity_author_key TEXT NOT NULL
+                    DEFAULT 'name'
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in add_repository_activity_settings: {e}")
+
+
+async def get_repository(
+    connection: asyncpg.Connection,
+    owner: str,
+    repo: str
+) -> asyncpg.Record:
+    """
+    Возвращает id и правила агрегации репозитория (activity_tz,
+    activity_date_field, activity_author_key), при необходимости
+    регистрируя его.
+
+    DO UPDATE вместо DO NOTHING: так RETURNING отдаёт строку и тогда,
+    когда репозиторий одновременно регистрирует параллельная транзакция.
+    """
+    try:
+        return await connection.fetchrow(
+            """
+            INSERT INTO repositories (owner, repo)
+            VALUES ($1, $2)
+            ON CONFLICT (owner, repo) DO UPDATE SET owner = EXCLUDED.owner
+            RETURNING id, activity_tz, activity_date_field,
+                      activity_author_key
+            """,
+            owner, repo
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in get_repository: {e}")
+
+
+async def get_repository_id(
+    connection: asyncpg.Connection,
+    owner: str,
+    repo: str
+) -> int:
+    """Возвращает id репозитория, при необходимости регистрируя его."""
+    return (await get_repository(connection, owner, repo))["id"]
+
+
+async def insert_commits(
+    connection: asyncpg.Connection,
+    owner: str,
+    repo: str,
+    rows: list[tuple],
+    merge_activity: bool = True
+) -> int:
+    """
+    Добавляет коммиты репозитория в таблицу commits одним запросом.
+
+    Уже сохранённые коммиты (по SHA) пропускаются, поэтому повторная
+    вставка той же страницы ничего не меняет. С merge_activity новые
+    коммиты в том же запросе добавляются к дневным записям activity
+    по правилам агрегации репозитория (часовой пояс, дата и ключ
+    автора, сохранённые rebuild_activity) — как merge_repo_activity,
+    но только для строк, действительно вставленных в commits.
+
+    Параметры:
+        connection: asyncpg.Connection - активное подключение к БД
+        owner: str - владелец репозитория
+        repo: str - имя репозитория
+        rows: list[tuple] - строки (sha, дата автора, дата коммиттера,
+            имя автора, email автора); даты — метки ISO8601 GitHub
+        merge_activity: bool - учесть новые коммиты в activity
+
+    Возвращает:
+        int: Сколько коммитов вставлено.
+    """
+    if not rows:
+        return 0
+    shas, authored, committed, names, emails = (list(c) for c in zip(*rows))
+    insert = """
+        INSERT INTO commits (repo_id, sha, authored_at, committed_at,
+                             author_name, author_email)
+        SELECT $1, decode(t.sha, 'hex'), t.authored::timestamptz,
+               t.committed::timestamptz, t.name, t.email
+        FROM UNNEST($2::text[], $3::text[], $4::text[], $5::text[],
+                    $6::text[]) AS t(sha, authored, committed, name, email)
+        ON CONFLICT (repo_id, sha) DO NOTHING
+    """
+    try:
+        repository = await get_repository(connection, owner, repo)
+        repo_id = repository["id"]
+        if not merge_activity:
+            result = await connection.execute(insert, repo_id, shas,
+                                              authored, committed, names,
+                                              emails)
+            return int(result.split()[-1])
+        column = COMMIT_DATE_MAPPING[repository["activity_date_field"]]
+        author = COMMIT_AUTHOR_MAPPING[repository["activity_author_key"]]
+        return await connection.fetchval(
+            f"""
+            WITH inserted AS (
+                {insert}
+                RETURNING authored_at, committed_at, author_name,
+                          author_email
+            ),
+            days AS (
+                SELECT (c.{column} AT TIME ZONE $9)::date AS date,
+                       count(*) AS commits,
+                       array_agg(DISTINCT {author}) AS authors
+                FROM inserted c
+                WHERE c.{column} IS NOT NULL
+                GROUP BY 1
+            ),
+            merged AS (
+                INSERT INTO activity (owner, repo, date, commits, authors)
+                SELECT $7, $8, date, commits, authors
+                FROM days
+                ON CONFLICT (owner, repo, date) DO UPDATE
+                SET commits = activity.commits + EXCLUDED.commits,
+                    authors = ARRAY(
+                        SELECT DISTINCT unnest(activity.authors
+                                               || EXCLUDED.authors)
+                    )
+            )
+            SELECT count(*) FROM inserted
+            """,
+            repo_id, shas, authored, committed, names, emails, owner, repo,
+            repository["activity_tz"]
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in insert_commits: {e}")
+
+
+async def rebuild_activity(
+    connection: asyncpg.Connection,
+    since: date,
+    until: date,
+    owner: str | None = None,
+    repo: str | None = None,
+    tz: str | None = None,
+    date_field: str | None = None,
+    author_key: str | None = None
+) -> int:
+    """
+    Пересчитывает activity за дни [since, until] из таблицы commits.
+
+    Дни периода удаляются и строятся заново одним INSERT ... SELECT
+    с группировкой, без обращений к GitHub. Затрагиваются только
+    репозитории из хранилища коммитов (все или заданный owner/repo),
+    поэтому период должен быть покрыт хранилищем целиком — иначе
+    пересчитанные дни потеряют коммиты, которых в нём нет.
+
+    Заданные tz, date_field и author_key сохраняются в repositories
+    как правила агрегации репозиториев, и по ним же инкрементальная
+    запись (insert_commits) учитывает новые коммиты. Не заданные
+    берутся из сохранённых правил (по умолчанию UTC, дата автора,
+    имя автора).
+
+    Параметры:
+        connection: asyncpg.Connection - активное подключение к БД
+        since: date - первый день периода
+        until: date - последний день периода (включительно)
+        owner: Optional[str] - владелец репозитория (None — все)
+        repo: Optional[str] - имя репозитория (None — все)
+        tz: Optional[str] - часовой пояс дней (имя IANA, например
+            Europe/Moscow)
+        date_field: Optional[str] - дата автора ("author")
+            или коммиттера ("committer")
+        author_key: Optional[str] - различать авторов по имени ("name")
+            или по email ("email")
+
+    Возвращает:
+        int: Сколько дней записано.
+
+    Исключения:
+        ValueError: При неизвестных date_field или author_key.
+    """
+    if date_field not in (None, *COMMIT_DATE_MAPPING) \
+            or author_key not in (None, *COMMIT_AUTHOR_MAPPING):
+        raise ValueError(
+            f"Неизвестные параметры пересчёта: {date_field}, {author_key}")
+
+    try:
+        async with connection.transaction():
+            await connection.execute(
+                """
+                UPDATE repositories
+                SET activity_tz = coalesce($3, activity_tz),
+                    activity_date_field = coalesce($4, activity_date_field),
+                    activity_author_key = coalesce($5, activity_author_key)
+                WHERE ($1::text IS NULL OR owner = $1)
+                AND ($2::text IS NULL OR repo = $2)
+                AND ($3::text IS NOT NULL OR $4::text IS NOT NULL
+                     OR $5::text IS NOT NULL)
+                """,
+                owner, repo, tz, date_field, author_key
+            )
+            await connection.execute(
+                """
+                DELETE FROM activity a
+                USING repositories r
+                WHERE r.owner = a.owner AND r.repo = a.repo
+                AND ($3::text IS NULL OR r.owner = $3)
+                AND ($4::text IS NULL OR r.repo = $4)
+                AND a.date BETWEEN $1 AND $2
+                """,
+                since, until, owner, repo
+            )
+            # Репозитории с одинаковыми правилами пересчитываются одним
+            # запросом: дата коммита — столбец, а не выражение, и отбор
+            # по ней идёт по индексу commits_authored_idx
+            rules = await connection.fetch(
+                """
+                SELECT DISTINCT activity_tz, activity_date_field,
+                                activity_author_key
+                FROM repositories
+                WHERE ($1::text IS NULL OR owner = $1)
+                AND ($2::text IS NULL OR repo = $2)
+                """,
+                owner, repo
+            )
+            days = 0
+            for tz, date_field, author_key in rules:
+                column = COMMIT_DATE_MAPPING[date_field]
+                author = COMMIT_AUTHOR_MAPPING[author_key]
+                result = await connection.execute(
+                    f"""
+                    INSERT INTO activity (owner, repo, date, commits,
+                                          authors)
+                    SELECT r.owner, r.repo,
+                           (c.{column} AT TIME ZONE $5)::date AS day,
+                           count(*),
+                           array_agg(DISTINCT {author})
+                    FROM commits c
+                    JOIN repositories r ON r.id = c.repo_id
+                    WHERE ($3::text IS NULL OR r.owner = $3)
+                    AND ($4::text IS NULL OR r.repo = $4)
+                    AND r.activity_tz = $5
+                    AND r.activity_date_field = $6
+                    AND r.activity_author_key = $7
+                    AND c.{column} >= $1::date::timestamp AT TIME ZONE $5
+                    AND c.{column} <
+                        ($2::date + 1)::timestamp AT TIME ZONE $5
+                    GROUP BY r.owner, r.repo, day
+                    """,
+                    since, until, owner, repo, tz, date_field, author_key
+                )
+                days += int(result.split()[-1])
+        return days
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in rebuild_activity: {e}")
+
+
+async def create_top_history_table(connection: asyncpg.Connection) -> None:
+    """
+    Создаёт таблицу top_history, если её ещё нет.
+
+    Каждое обновление топа добавляет в неё по строке на репозиторий:
+    позицию и метрики на момент обновления. Первичный ключ
+    (repo, snapshot_at) с включёнными position и stars обслуживает выборку
+    истории одного репозитория за период, сколько бы строк ни накопилось.
+    """
+    try:
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS top_history (
+                repo TEXT NOT NULL,
+                snapshot_at TIMESTAMPTZ NOT NULL,
+                owner TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                stars INTEGER NOT NULL,
+                watchers INTEGER NOT NULL,
+                forks INTEGER NOT NULL,
+                open_issues INTEGER NOT NULL,
+                PRIMARY KEY (repo, snapshot_at) INCLUDE (position, stars)
+            )
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in create_top_history_table: {e}")
+
+
+async def insert_top_history(
+    connection: asyncpg.Connection,
+    snapshot_at: datetime,
+    repos: list[dict]
+) -> int:
+    """
+    Записывает снимок топа в top_history одним запросом.
+
+    Параметры:
+        connection: asyncpg.Connection - активное подключение к БД
+        snapshot_at: datetime - момент обновления топа
+        repos: list[dict] - репозитории в формате publish_top_snapshot
+
+    Возвращает:
+        int: Сколько строк записано (повтор снимка с тем же моментом
+        пропускается).
+    """
+    try:
+        result = await connection.execute(
+            """
+            INSERT INTO top_history (repo, snapshot_at, owner, position,
+                                     stars, watchers, forks, open_issues)
+            SELECT t.repo, $1, t.owner, t.position, t.stars, t.watchers,
+                   t.forks, t.open_issues
+            FROM UNNEST($2::text[], $3::text[], $4::int[], $5::int[],
+                        $6::int[], $7::int[], $8::int[])
+                AS t(repo, owner, position, stars, watchers, forks,
+                     open_issues)
+            ON CONFLICT (repo, snapshot_at) DO NOTHING
+            """,
+            snapshot_at,
+            [r["repo"] for r in repos],
+            [r["owner"] for r in repos],
+            [r["position_cur"] for r in repos],
+            [r["stars"] for r in repos],
+            [r["watchers"] for r in repos],
+            [r["forks"] for r in repos],
+            [r["open_issues"] for r in repos]
+        )
+        return int(result.split()[-1])
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in insert_top_history: {e}")
+
+
+async def get_last_top_positions(
+    connection: asyncpg.Connection,
+    repos: list[str]
+) -> dict[str, int]:
+    """
+    Возвращает последнюю позицию в истории для каждого из репозиториев
+    (full_name), которые в ней есть.
+    """
+    try:
+        rows = await connection.fetch(
+            """
+            SELECT r.repo, h.position
+            FROM UNNEST($1::text[]) AS r(repo)
+            CROSS JOIN LATERAL (
+                SELECT position
+                FROM top_history
+                WHERE repo = r.repo
+                ORDER BY snapshot_at DESC
+                LIMIT 1
+            ) h
+            """,
+            repos
+        )
+        return {row["repo"]: row["position"] for row in rows}
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in get_last_top_positions: {e}")
+
+
+RANK_HISTORY_QUERY = """
+    SELECT snapshot_at, position, stars, watchers, forks, open_issues
+    FROM top_history
+    WHERE repo = $1
+    AND snapshot_at >= $2::date::timestamp AT TIME ZONE 'UTC'
+    AND snapshot_at < ($3::date + 1)::timestamp AT TIME ZONE 'UTC'
+    ORDER BY snapshot_at
+"""
+
+
+async def fetch_repo_rank_history(
+    connection: asyncpg.Connection,
+    repo: str,
+    since: date,
+    until: date
+) -> list[RankSnapshot]:
+    """
+    Возвращает снимки топа для репозитория (full_name) за дни
+    [since, until] (UTC) в хронологическом порядке.
+    """
+    try:
+        rows = await connection.fetch(RANK_HISTORY_QUERY, repo, since, until)
+        return [RankSnapshot(**row) for row in rows]
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in fetch_repo_rank_history: {e}")
+
+
+async def create_schema_migrations_table(
+    connection: asyncpg.Connection
+) -> None:
+    """Создаёт таблицу применённых миграций схемы, если её ещё нет."""
+    try:
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(
+            f"Database error in create_schema_migrations_table: {e}")
+
+
+async def lock_schema_migrations(connection: asyncpg.Connection) -> None:
+    """
+    Берёт транзакционную рекомендательную блокировку миграций: процессы,
+    стартующие одновременно, применяют миграции по очереди.
+    """
+    try:
+        await connection.execute(
+            "SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))")
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in lock_schema_migrations: {e}")
+
+
+async def get_applied_migrations(
+    connection: asyncpg.Connection
+) -> dict[int, datetime]:
+    """Возвращает применённые миграции: {версия: время применения}."""
+    try:
+        rows = await connection.fetch(
+            "SELECT version, applied_at FROM schema_migrations")
+        return {row["version"]: row["applied_at"] for row in rows}
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in get_applied_migrations: {e}")
+
+
+async def record_migration(
+    connection: asyncpg.Connection,
+    version: int,
+    name: str
+) -> None:
+    """Отмечает миграцию применённой."""
+    try:
+        await connection.execute(
+            "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+            version, name
+        )
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in record_migration: {e}")
+
+
+async def explain_query(
+    connection: asyncpg.Connection,
+    query: str,
+    *args
+) -> dict:
+    """Возвращает план запроса (EXPLAIN (FORMAT JSON)) без выполнения."""
+    try:
+        plan = await connection.fetchval(
+            f"EXPLAIN (FORMAT JSON) {query}", *args)
+        return json.loads(plan)[0]["Plan"]
+    except asyncpg.PostgresError as e:
+        raise RuntimeError(f"Database error in explain_query: {e}")
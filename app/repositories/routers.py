@@ -1,22 +1,28 @@
 """
 Маршруты (эндпоинты) для получения информации о публичных репозиториях GitHub.
 
-Содержит два эндпоинта:
-1. /api/repos/top100 - для получения списка топ-100 публичных репозиториев,
-   отсортированных по заданному критерию и порядку.
+Содержит три эндпоинта:
+1. /api/repos/top (и прежний адрес /api/repos/top100) - для получения
+   списка репозиториев из топа, отсортированных по заданному критерию
+   и порядку, постранично (limit/offset). Версия снимка топа
+   возвращается в заголовках X-Top-Version и ETag.
 2. /api/repos/{owner}/{repo}/activity - для получения информации об активности
    (коммитах) конкретного репозитория за указанный промежуток времени.
+3. /api/repos/{owner}/{repo}/ranking - для получения истории позиций
+   и звёзд репозитория в топе за указанный промежуток времени.
 
 Реализация основана на данных, хранящихся в PostgreSQL, которые
 периодически обновляются парсером.
 """
 import asyncpg  # type: ignore
 from datetime import date
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 
 from app.db.connection import get_connection
-from .crud import get_top_repos, fetch_repo_activity
-from .schemas import TopRepo, SortBy, Order, RepoActivity
+from .crud import (TOP_REPOS_MAX, get_top_repos, get_top_snapshot,
+                   fetch_repo_activity, fetch_repo_rank_history)
+from .schemas import TopRepo, SortBy, Order, RepoActivity, RankSnapshot
 
 router = APIRouter(
     prefix="/api/repos",
@@ -24,34 +30,90 @@ router = APIRouter(
 )
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Совпадает ли ETag с заголовком If-None-Match: список ETag через
+    запятую или "*". Сравнение слабое (RFC 9110), префикс W/ не важен.
+    """
+    if not if_none_match:
+        return False
+    etag = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+@router.get("/top", response_model=list[TopRepo])
 @router.get("/top100", response_model=list[TopRepo])
 async def read_top_100_repos(
+    response: Response,
     sort_by: SortBy = Query(SortBy.STARS, description="Поле для сортировки"),
     order: Order = Query(Order.DESC, description="Порядок сортировки"),
+    limit: int = Query(100, ge=1, le=TOP_REPOS_MAX,
+                       description="Сколько репозиториев вернуть"),
+    offset: int = Query(0, ge=0,
+                        description="Сколько репозиториев пропустить"),
+    version: Optional[int] = Query(
+        None, ge=1, description="Версия снимка топа (по умолчанию текущая)"),
+    if_none_match: Optional[str] = Header(None),
     connection: asyncpg.Connection = Depends(get_connection)
 ):
     """
-    Получить список топ-100 публичных репозиториев,
+    Получить страницу списка публичных репозиториев из топа,
     отсортированных по указанному полю и в указанном порядке.
 
+    Топ публикуется целыми снимками; номер снимка возвращается
+    в заголовке X-Top-Version и в ETag, поэтому кэш может хранить ответ,
+    пока версия не сменилась (If-None-Match — ответ 304). Чтобы
+    страницы не смешивали разные снимки, следующие страницы
+    запрашиваются с параметром version из первой.
+
     Параметры:
         sort_by (SortBy): Поле для сортировки (stars, watchers, forks,
         open_issues).
         order (Order): Порядок сортировки (ASC или DESC).
+        limit (int): Размер страницы (по умолчанию 100, не больше 1000).
+        offset (int): Сколько репозиториев пропустить от начала списка.
+        version (Optional[int]): Версия снимка топа.
+        if_none_match (Optional[str]): ETag ранее полученных ответов
+        (список через запятую, слабые W/"..." или "*").
         connection (asyncpg.Connection): Соединение с базой данных,
             предоставленное через зависимость.
 
     Возвращает:
-        list[Top100]: Список из максимум 100 репозиториев в
+        list[Top100]: Список из максимум limit репозиториев в
         формате схемы Top100.
 
     Исключения:
+        HTTPException(410): Если снимок версии version уже удалён.
         HTTPException(500): При ошибке взаимодействия с базой данных или других
         непредвиденных ошибках.
     """
     try:
-        result = await get_top_repos(connection, sort_by, order)
+        # Версия и страница читаются из одного снимка БД; транзакция
+        # только для чтения не ждёт публикации нового топа
+        async with connection.transaction(isolation="repeatable_read",
+                                          readonly=True):
+            snapshot = await get_top_snapshot(connection, version)
+            if snapshot is None:
+                if version is not None:
+                    raise HTTPException(
+                        status_code=410,
+                        detail=f"Снимок топа {version} больше не хранится")
+                return []
+            current = snapshot["version"]
+            headers = {"ETag": f'"top-{current}"',
+                       "X-Top-Version": str(current)}
+            if _etag_matches(if_none_match, headers["ETag"]):
+                return Response(status_code=304, headers=headers)
+            result = await get_top_repos(connection, sort_by, order,
+                                         limit, offset, current)
+        response.headers.update(headers)
         return result
+    except HTTPException:
+        raise
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=f"{e}")
     except Exception as e:
@@ -106,3 +168,55 @@ async def get_repo_activity(
         raise HTTPException(
             status_code=500, detail=f"Ошибка сервера: {e}"
         )
+
+
+@router.get("/{owner}/{repo}/ranking", response_model=list[RankSnapshot])
+async def get_repo_ranking(
+    owner: str,
+    repo: str,
+    since: date,
+    until: date,
+    connection: asyncpg.Connection = Depends(get_connection)
+) -> list[RankSnapshot]:
+    """
+    Получить историю позиций и метрик репозитория в топе за период.
+
+    Параметры:
+        owner (str): Владелец репозитория.
+        repo (str): Имя репозитория.
+        since (date): Начальная дата периода (включительно, UTC).
+        until (date): Конечная дата периода (включительно, UTC).
+        connection (asyncpg.Connection): Соединение с базой данных.
+
+    Возвращает:
+        list[RankSnapshot]: Снимки топа по времени: позиция, звёзды,
+        просмотры, форки и открытые issues на момент каждого обновления.
+
+    Исключения:
+        HTTPException(400): Если `since` больше `until`.
+        HTTPException(404): Если за указанный период репозиторий
+            не был в топе.
+        HTTPException(500): При ошибке взаимодействия с базой данных
+            или других непредвиденных ошибках.
+    """
+    if since > until:
+        raise HTTPException(status_code=400,
+                            detail="`since` не может быть больше `until`")
+
+    try:
+        data = await fetch_repo_rank_history(connection, f"{owner}/{repo}",
+                                             since, until)
+        if not data:
+            raise HTTPException(
+                status_code=404,
+                detail="No ranking history found for the given period"
+            )
+        return data
+    except HTTPException:
+        raise
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=f"{e}")
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Ошибка сервера: {e}"
+        )
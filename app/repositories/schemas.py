@@ -8,7 +8,7 @@
 
 from pydantic import BaseModel
 from typing import Optional
-from datetime import date
+from datetime import date, datetime
 from enum import Enum
 
 
@@ -72,3 +72,24 @@ class RepoActivity(BaseModel):
     date: date
     commits: int
     authors: list[str]
+
+
+class RankSnapshot(BaseModel):
+    """
+    Модель, описывающая позицию и метрики репозитория в одном
+    обновлении топа.
+
+    Поля:
+        snapshot_at (datetime): Момент обновления топа.
+        position (int): Позиция в топе.
+        stars (int): Количество звёзд.
+        watchers (int): Количество просмотров.
+        forks (int): Количество форков.
+        open_issues (int): Количество открытых issues.
+    """
+    snapshot_at: datetime
+    position: int
+    stars: int
+    watchers: int
+    forks: int
+    open_issues: int
@@ -0,0 +1,110 @@
+"""
+Пакетная запись дневной активности в таблицу activity.
+
+Вместо UPDATE и, возможно, INSERT на каждый день каждого репозитория
+(upsert_repo_activity) ActivityWriter копит строки и записывает их
+пакетами: пакет загружается через COPY во временную таблицу и сливается
+с activity одним запросом (write_activity_batch). Число запросов к БД
+определяется числом пакетов, а не дней.
+"""
+
+import asyncio
+import os
+import time
+from datetime import date
+from typing import Iterable
+
+import asyncpg  # type: ignore
+
+from app.repositories.crud import write_activity_batch
+
+# Сколько дневных записей отправлять в БД одним пакетом
+ACTIVITY_WRITE_BATCH = int(os.getenv("ACTIVITY_WRITE_BATCH", "5000"))
+
+
+class ActivityWriter:
+    """
+    Буферизующий писатель таблицы activity.
+
+    Записи одного дня одного репозитория внутри буфера объединяются:
+    в режиме замены остаётся последняя, в режиме добавления коммиты
+    складываются, а авторы объединяются. Писатель можно использовать
+    как асинхронный контекстный менеджер — при выходе без ошибки
+    остаток буфера записывается.
+
+    Параметры:
+        connection (asyncpg.Connection): Соединение с БД. Если оно
+            внутри транзакции, каждый пакет — точка сохранения в ней.
+        batch_size (int): Размер пакета (число дневных записей).
+        replace (bool): Заменять дни в activity (True) или добавлять
+            к ним коммиты и авторов (False).
+    """
+
+    def __init__(
+        self,
+        connection: asyncpg.Connection,
+        batch_size: int = ACTIVITY_WRITE_BATCH,
+        replace: bool = True
+    ):
+        self.connection = connection
+        self.batch_size = max(1, batch_size)
+        self.replace = replace
+        self.rows = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self._buffer: dict[tuple[str, str, date], list] = {}
+        # Соединение asyncpg выполняет один запрос за раз
+        self._lock = asyncio.Lock()
+
+    async def add(self, owner: str, repo: str, day: date, commits: int,
+                  authors: Iterable[str]) -> None:
+        """Добавляет дневную запись; полный буфер записывается в БД."""
+        key = (owner, repo, day)
+        entry = self._buffer.get(key)
+        if entry is None or self.replace:
+            self._buffer[key] = [commits, set(authors)]
+        else:
+            entry[0] += commits
+            entry[1].update(authors)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def add_days(self, owner: str, repo: str,
+                       days: dict[date, dict]) -> None:
+        """Добавляет дневные счётчики агрегатора (DailyAggregator.days)."""
+        for day, data in days.items():
+            await self.add(owner, repo, day, data['commits'],
+                           data['authors'])
+
+    async def flush(self) -> None:
+        """Записывает накопленные строки одним пакетом."""
+        if not self._buffer:
+            return
+        buffer, self._buffer = self._buffer, {}
+        records = [(owner, repo, day, commits, list(authors))
+                   for (owner, repo, day), (commits, authors)
+                   in buffer.items()]
+        async with self._lock:
+            started = time.perf_counter()
+            await write_activity_batch(self.connection, records,
+                                       self.replace)
+            self.seconds += time.perf_counter() - started
+        self.rows += len(records)
+        self.batches += 1
+
+    def stats(self) -> dict:
+        """Записано строк и пакетов, время записи и строк в секунду."""
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows / self.seconds, 1)
+            if self.seconds else 0.0,
+        }
+
+    async def __aenter__(self) -> "ActivityWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.flush()
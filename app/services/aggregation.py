@@ -0,0 +1,212 @@
+"""
+Агрегация коммитов по периодам.
+
+CommitAggregator накапливает счётчики постранично: каждая страница
+коммитов сворачивается в счётчики и может быть сразу отброшена, поэтому
+расход памяти определяется размером страницы и числом периодов, а не
+длиной истории.
+
+Период коммита определяется без разбора каждой временной метки целиком.
+Метки GitHub имеют вид 'YYYY-MM-DDTHH:MM:SSZ' (в GraphQL — со смещением
+автора, '...+03:00'). При сдвиге часового пояса на целое число часов
+период зависит только от даты, часа и смещения, поэтому результат
+кэшируется по префиксу 'YYYY-MM-DDTHH' и смещению: datetime строится
+один раз на час истории, а не на каждый коммит. Для поясов со сдвигом
+не на целое число часов (+05:30) час делится на две части по минуте.
+
+Если у коммита нет выбранной даты (author или committer равен null),
+используется другая; коммит без обеих дат пропускается и учитывается
+в счётчике skipped.
+
+Для записи в хранилище коммитов (таблица commits) агрегатор может
+дополнительно сохранять компактные строки коммитов (keep_commits) —
+тогда память растёт с числом коммитов, но лишь на несколько коротких
+строк на коммит.
+"""
+
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Iterable, Optional, Union
+
+# Поддерживаемые периоды агрегации
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+HOUR_OF_DAY = "hour"
+GRANULARITIES = (DAY, WEEK, MONTH, HOUR_OF_DAY)
+
+# Какую дату коммита использовать
+AUTHOR_DATE = "author"
+COMMITTER_DATE = "committer"
+
+BucketKey = Union[date, int]
+# (sha, дата автора, дата коммиттера, имя автора, email автора)
+CommitRow = tuple[str, str, Optional[str], str, Optional[str]]
+
+
+class CommitAggregator:
+    """
+    Инкрементальный агрегатор коммитов по периодам.
+
+    Параметры:
+        granularity (str): Период: "day", "week" (ключ — понедельник),
+            "month" (ключ — первое число) или "hour" (час суток 0–23).
+        tz (tzinfo): Часовой пояс, в котором определяется период.
+            По умолчанию UTC.
+        date_field (str): Дата автора ("author") или коммиттера
+            ("committer").
+        keep_commits (bool): Сохранять компактные строки коммитов
+            в rows для записи в таблицу commits.
+
+    Атрибуты:
+        buckets (dict): Счётчики вида
+            {date | int: {'commits': int, 'authors': set[str]}}.
+        commits (int): Сколько коммитов учтено.
+        skipped (int): Сколько коммитов пропущено без даты автора
+            и коммиттера.
+        head_sha (Optional[str]): SHA первого учтённого коммита
+            (GitHub отдаёт коммиты от новых к старым).
+        rows (Optional[list[CommitRow]]): Учтённые коммиты, если
+            задан keep_commits, иначе None.
+    """
+
+    def __init__(
+        self,
+        granularity: str = DAY,
+        tz: tzinfo = timezone.utc,
+        date_field: str = AUTHOR_DATE,
+        keep_commits: bool = False
+    ):
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Неизвестный период агрегации: {granularity}")
+        if date_field not in (AUTHOR_DATE, COMMITTER_DATE):
+            raise ValueError(f"Неизвестное поле даты: {date_field}")
+        self.granularity = granularity
+        self.tz = tz
+        self.date_field = date_field
+        self.buckets: dict[BucketKey, dict] = {}
+        self.commits = 0
+        self.skipped = 0
+        self.head_sha: Optional[str] = None
+        self.rows: Optional[list[CommitRow]] = [] if keep_commits else None
+        # Префикс метки (час + смещение) -> ключ периода
+        self._keys: dict[str, BucketKey] = {}
+        # То же для часов, которые делит граница периода:
+        # префикс -> (минута границы, ключ до неё, ключ после)
+        self._split: dict[str, tuple[str, BucketKey, BucketKey]] = {}
+
+    def bucket_key(self, stamp: str) -> BucketKey:
+        """Возвращает ключ периода для временной метки GitHub."""
+        prefix = stamp[:13] if len(stamp) == 20 else stamp[:13] + stamp[19:]
+        key = self._keys.get(prefix)
+        if key is None:
+            key = self._compute_key(stamp, prefix)
+        return key
+
+    def _key_of(self, moment: datetime) -> BucketKey:
+        local = moment.astimezone(self.tz)
+        if self.granularity == HOUR_OF_DAY:
+            return local.hour
+        day = local.date()
+        if self.granularity == WEEK:
+            return day - timedelta(days=day.weekday())
+        if self.granularity == MONTH:
+            return day.replace(day=1)
+        return day
+
+    def _compute_key(self, stamp: str, prefix: str) -> BucketKey:
+        split = self._split.get(prefix)
+        if split is None:
+            moment = datetime.fromisoformat(
+                stamp[:13] + ":00:00" + stamp[19:].replace("Z", "+00:00"))
+            shift = moment.astimezone(self.tz).utcoffset() \
+                - moment.utcoffset()
+            rest = shift % timedelta(hours=1) // timedelta(minutes=1)
+            if not rest:
+                # Сдвиг кратен часу: период одинаков для всего часа
+                key = self._keys[prefix] = self._key_of(moment)
+                return key
+            # Сдвиг вроде +05:30: внутри часа метки период меняется
+            # на минуте 60 - rest, запоминаем обе половины
+            edge = moment + timedelta(minutes=60 - rest)
+            split = self._split[prefix] = (
+                f"{60 - rest:02d}", self._key_of(moment), self._key_of(edge))
+        threshold, before, after = split
+        return after if stamp[14:16] >= threshold else before
+
+    def add_page(self, commits: Iterable[dict]) -> None:
+        """Учитывает страницу коммитов в формате ответа GitHub REST API."""
+        buckets = self.buckets
+        keys = self._keys
+        by_author = self.date_field == AUTHOR_DATE
+        rows = self.rows
+        added = 0
+        for c in commits:
+            if self.head_sha is None:
+                self.head_sha = c.get('sha')
+
+            commit = c['commit']
+            author = commit.get('author') or {}
+            committer = commit.get('committer') or {}
+            authored = author.get('date')
+            committed = committer.get('date')
+            stamp = (authored or committed) if by_author \
+                else (committed or authored)
+            if not stamp:
+                self.skipped += 1
+                continue
+            prefix = stamp[:13] if len(stamp) == 20 \
+                else stamp[:13] + stamp[19:]
+            key = keys.get(prefix)
+            if key is None:
+                key = self._compute_key(stamp, prefix)
+
+            author_name = author.get('name') or "Unknown"
+
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {'commits': 0, 'authors': set()}
+            bucket['commits'] += 1
+            bucket['authors'].add(author_name)
+            if rows is not None:
+                rows.append((c['sha'], authored or committed, committed,
+                             author_name, author.get('email')))
+            added += 1
+        self.commits += added
+
+
+class DailyAggregator(CommitAggregator):
+    """
+    Агрегатор коммитов по дням (UTC, дата автора) — в этом виде
+    активность хранится в таблице activity.
+
+    Параметры:
+        keep_commits (bool): Сохранять строки коммитов (см. CommitAggregator).
+
+    Атрибуты:
+        days (dict): Счётчики вида
+            {date: {'commits': int, 'authors': set[str]}}.
+    """
+
+    def __init__(self, keep_commits: bool = False):
+        super().__init__(DAY, timezone.utc, AUTHOR_DATE, keep_commits)
+
+    @property
+    def days(self) -> dict[date, dict]:
+        return self.buckets
+
+
+def aggregate_commits(
+    commits: Iterable[dict],
+    granularity: str = DAY,
+    tz: tzinfo = timezone.utc,
+    date_field: str = AUTHOR_DATE
+) -> dict[BucketKey, dict]:
+    """
+    Агрегирует коммиты по периодам (см. CommitAggregator).
+
+    Возвращает:
+        dict: {date | int: {'commits': int, 'authors': set[str]}}.
+    """
+    aggregator = CommitAggregator(granularity, tz, date_field)
+    aggregator.add_page(commits)
+    return aggregator.buckets
@@ -0,0 +1,107 @@
+"""
+Вызов экземпляров облачной функции для шардированного обновления.
+
+Координатор (update_data.handler в режиме "coordinator") вызывает
+функцию-обработчик по HTTP отдельно для каждого шарда. Вызовы
+асинхронные (integration=async): платформа принимает событие и сразу
+отвечает 202, а шард выполняется отдельным вызовом со своим таймаутом.
+Координатор не ждёт шардов — итог запуска подводит последний
+завершившийся шард. Для асинхронного вызова у функции-обработчика
+должен быть включён асинхронный режим.
+
+Авторизация: IAM-токен сервисного аккаунта из контекста вызова
+(context.token), если он есть, иначе API-ключ REFRESH_WORKER_API_KEY.
+"""
+
+import asyncio
+import json
+import os
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# Адрес функции-обработчика шардов с интеграцией raw (событие — тело
+# запроса), например https://functions.yandexcloud.net/<id>?integration=raw
+REFRESH_WORKER_URL = os.getenv("REFRESH_WORKER_URL", "")
+REFRESH_WORKER_API_KEY = os.getenv("REFRESH_WORKER_API_KEY", "")
+# Ожидание подтверждения, что вызов принят, секунд
+REFRESH_WORKER_TIMEOUT = float(os.getenv("REFRESH_WORKER_TIMEOUT", "10"))
+
+
+def async_invocation_url(url: str) -> str:
+    """Адрес функции с параметром integration=async."""
+    parts = urllib.parse.urlsplit(url)
+    query = [(key, value) for key, value
+             in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+             if key != "integration"]
+    query.append(("integration", "async"))
+    return urllib.parse.urlunsplit(
+        parts._replace(query=urllib.parse.urlencode(query)))
+
+
+def auth_headers(context=None) -> dict[str, str]:
+    """Заголовок авторизации для вызова функции."""
+    token = getattr(context, "token", None)
+    if isinstance(token, dict) and token.get("access_token"):
+        return {"Authorization": f"Bearer {token['access_token']}"}
+    if REFRESH_WORKER_API_KEY:
+        return {"Authorization": f"Api-Key {REFRESH_WORKER_API_KEY}"}
+    return {}
+
+
+def _post(url: str, payload: dict, headers: dict[str, str],
+          timeout: float) -> dict:
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), method="POST",
+        headers={"Content-Type": "application/json", **headers})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(
+            f"Вызов обработчика вернул {e.code}: "
+            f"{e.read()[:500].decode(errors='replace')}") from e
+    return json.loads(body) if body else {}
+
+
+async def invoke_functions(
+    payloads: list[dict],
+    url: Optional[str] = None,
+    headers: Optional[dict[str, str]] = None,
+    timeout: float = REFRESH_WORKER_TIMEOUT
+) -> list:
+    """
+    Асинхронно вызывает функцию-обработчик с каждым событием
+    из `payloads` и ждёт только подтверждения, что вызовы приняты.
+
+    У каждого вызова свой поток: общий пул потоков asyncio на машине
+    с одним ядром выполнял бы одновременно лишь несколько вызовов.
+
+    Параметры:
+        url (Optional[str]): Адрес функции (по умолчанию
+            REFRESH_WORKER_URL); параметр integration заменяется
+            на async.
+        timeout (float): Сколько ждать подтверждения вызова, секунд.
+
+    Возвращает:
+        list: Ответы платформы (dict) в порядке payloads; для
+        непринятых вызовов — исключение.
+
+    Исключения:
+        RuntimeError: Если адрес обработчика не задан.
+    """
+    url = url or REFRESH_WORKER_URL
+    if not url:
+        raise RuntimeError("Не задан REFRESH_WORKER_URL")
+    url = async_invocation_url(url)
+    if not payloads:
+        return []
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=len(payloads)) as executor:
+        return await asyncio.gather(*(
+            loop.run_in_executor(executor, _post, url, payload,
+                                 headers or {}, timeout)
+            for payload in payloads
+        ), return_exceptions=True)
@@ -0,0 +1,463 @@
+"""
+Асинхронный клиент GitHub REST API.
+
+В отличие от GhApi (синхронный urllib), клиент не блокирует цикл событий:
+запросы выполняются через asyncio-потоки и протокол HTTP/1.1 на базе h11.
+Соединения переиспользуются (keep-alive) из пула, а каждый запрос
+ограничен собственным таймаутом.
+
+Покрывает только те эндпоинты, которые нужны парсеру:
+- GET /search/repositories
+- GET /repos/{owner}/{repo}/commits
+- POST /graphql (см. app.services.github_graphql)
+
+Для всего процесса используется один клиент, создаваемый лениво через
+get_github_client(): настройки и токен читаются один раз, а пул соединений
+переживает повторные вызовы функции в «тёплом» экземпляре.
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import re
+import ssl
+from typing import Any, Optional
+from urllib.parse import urlencode, urlsplit
+
+import h11
+
+from app.services.rate_limiter import (TokenPool, resource_for_path,
+                                       tokens_from_env)
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", "30"))
+GITHUB_MAX_CONNECTIONS = int(os.getenv("GITHUB_MAX_CONNECTIONS", "20"))
+# Сколько раз повторять запрос, отклонённый по лимиту (403/429)
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "3"))
+
+READ_CHUNK_SIZE = 65536
+
+# Ссылка на последнюю страницу в заголовке Link
+_LAST_PAGE_RE = re.compile(r'<[^>]*[?&]page=(\d+)[^>]*>;\s*rel="last"')
+
+
+class GitHubAPIError(Exception):
+    """Ошибка ответа GitHub API (код состояния 4xx/5xx)."""
+
+    def __init__(self, status: int, message: str, url: str):
+        super().__init__(f"GitHub API {status} for {url}: {message}")
+        self.status = status
+        self.url = url
+
+
+class GitHubGraphQLError(GitHubAPIError):
+    """Ошибка выполнения GraphQL-запроса (поле errors в ответе)."""
+
+
+class GitHubResponse:
+    """
+    Ответ GitHub API.
+
+    Атрибуты:
+        status (int): HTTP-код ответа.
+        headers (dict[str, str]): Заголовки (имена в нижнем регистре).
+        body (bytes): Тело ответа (уже распакованное).
+        url (str): Путь запроса вместе с параметрами.
+    """
+
+    def __init__(self, status: int, headers: dict[str, str],
+                 body: bytes, url: str):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.url = url
+
+    def json(self) -> Any:
+        """Декодирует тело ответа из JSON."""
+        return json.loads(self.body) if self.body else None
+
+    def last_page(self) -> Optional[int]:
+        """
+        Номер последней страницы из заголовка Link или None, если
+        заголовка нет (результат умещается на одной странице либо ответ
+        взят из кэша).
+        """
+        match = _LAST_PAGE_RE.search(self.headers.get("link", ""))
+        return int(match.group(1)) if match else None
+
+
+class _Connection:
+    """Одно keep-alive соединение с сервером GitHub."""
+
+    def __init__(self, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.protocol = h11.Connection(our_role=h11.CLIENT)
+
+    async def request(self, method: str, target: str,
+                      headers: list[tuple[str, str]],
+                      body: Optional[bytes] = None
+                      ) -> tuple[h11.Response, bytes]:
+        """Отправляет запрос и читает ответ целиком."""
+        if body is not None:
+            headers = headers + [("Content-Type", "application/json"),
+                                 ("Content-Length", str(len(body)))]
+        self.writer.write(self.protocol.send(
+            h11.Request(method=method, target=target, headers=headers)))
+        if body:
+            self.writer.write(self.protocol.send(h11.Data(data=body)))
+        self.writer.write(self.protocol.send(h11.EndOfMessage()))
+        await self.writer.drain()
+
+        response = None
+        body = bytearray()
+        while True:
+            event = self.protocol.next_event()
+            if event is h11.NEED_DATA:
+                self.protocol.receive_data(
+                    await self.reader.read(READ_CHUNK_SIZE))
+            elif isinstance(event, h11.Response):
+                response = event
+            elif isinstance(event, h11.Data):
+                body += event.data
+            elif isinstance(event, h11.EndOfMessage):
+                break
+            elif isinstance(event, h11.ConnectionClosed):
+                raise ConnectionError("Соединение закрыто сервером")
+
+        return response, bytes(body)
+
+    def reusable(self) -> bool:
+        """Можно ли вернуть соединение в пул после ответа."""
+        if (self.protocol.our_state is h11.DONE
+                and self.protocol.their_state is h11.DONE):
+            self.protocol.start_next_cycle()
+            return True
+        return False
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class GitHubClient:
+    """
+    Неблокирующий клиент GitHub REST API с пулом соединений.
+
+    Параметры:
+        tokens (Optional[list[str]]): Токены доступа. По умолчанию
+            берутся из переменных окружения GITHUB_TOKENS/GITHUB_TOKEN
+            (см. TokenPool).
+        base_url (str): Базовый адрес API.
+        timeout (float): Таймаут одного запроса в секундах.
+        max_connections (int): Максимум одновременных соединений.
+
+    Использование:
+        async with GitHubClient() as client:
+            repos = await client.search_repos("stars:>1")
+    """
+
+    def __init__(
+        self,
+        tokens: Optional[list[str]] = None,
+        base_url: str = GITHUB_API_URL,
+        timeout: float = GITHUB_TIMEOUT,
+        max_connections: int = GITHUB_MAX_CONNECTIONS
+    ):
+        url = urlsplit(base_url)
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.base_path = url.path.rstrip("/")
+        self.timeout = timeout
+        self.tokens = TokenPool(tokens if tokens is not None
+                                else tokens_from_env())
+        self._ssl: Optional[ssl.SSLContext] = None
+        self.max_connections = max_connections
+        self._headers = self._build_headers()
+        self._idle: list[_Connection] = []
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Кэш валидаторов ответов (см. app.services.http_cache)
+        self.cache = None
+
+    async def __aenter__(self) -> "GitHubClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Закрывает все простаивающие соединения пула."""
+        while self._idle:
+            self._idle.pop().close()
+
+    def _bind_loop(self) -> None:
+        """
+        Привязывает пул к текущему циклу событий.
+
+        Каждый вызов облачной функции запускает новый цикл через
+        asyncio.run(), а соединения и семафор прежнего цикла в новом
+        непригодны — поэтому при смене цикла пул создаётся заново
+        (соединения старого цикла просто отбрасываются).
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._idle = []
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+            self._loop = loop
+
+    def _build_headers(self) -> list[tuple[str, str]]:
+        host = self.host if self.port in (80, 443) \
+            else f"{self.host}:{self.port}"
+        headers = [
+            ("Host", host),
+            ("User-Agent", "e-Comet-github-parser"),
+            ("Accept", "application/vnd.github+json"),
+            ("Accept-Encoding", "gzip"),
+            ("X-GitHub-Api-Version", "2022-11-28"),
+        ]
+        return headers
+
+    async def _open(self) -> _Connection:
+        if self.scheme == "https" and self._ssl is None:
+            # Загрузка корневых сертификатов — самая дорогая часть
+            # настройки клиента, поэтому выполняется один раз и лениво.
+            self._ssl = ssl.create_default_context()
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, ssl=self._ssl)
+        return _Connection(reader, writer)
+
+    async def _send(self, connection: _Connection, target: str,
+                    headers: list[tuple[str, str]],
+                    body: Optional[bytes]
+                    ) -> tuple[h11.Response, bytes]:
+        method = "GET" if body is None else "POST"
+        async with asyncio.timeout(self.timeout):
+            return await connection.request(method, target, headers, body)
+
+    async def _exchange(self, target: str,
+                        headers: list[tuple[str, str]],
+                        body: Optional[bytes] = None) -> GitHubResponse:
+        """
+        Выполняет один HTTP-обмен через соединение из пула
+        (GET, либо POST, если передано тело).
+        """
+        self._bind_loop()
+        async with self._semaphore:
+            reused = bool(self._idle)
+            connection = self._idle.pop() if reused else await self._open()
+            try:
+                response, data = await self._send(connection, target,
+                                                  headers, body)
+            except (ConnectionError, h11.RemoteProtocolError):
+                connection.close()
+                if not reused:
+                    raise
+                # Соединение из пула могло быть закрыто сервером
+                # во время простоя — повторяем запрос на новом.
+                connection = await self._open()
+                try:
+                    response, data = await self._send(connection, target,
+                                                      headers, body)
+                except BaseException:
+                    connection.close()
+                    raise
+            except BaseException:
+                connection.close()
+                raise
+
+            if connection.reusable():
+                self._idle.append(connection)
+            else:
+                connection.close()
+
+        response_headers = {name.decode().lower(): value.decode()
+                            for name, value in response.headers}
+        if response_headers.get("content-encoding") == "gzip":
+            data = gzip.decompress(data)
+        return GitHubResponse(response.status_code, response_headers,
+                              data, target)
+
+    async def request(self, path: str, params: Optional[dict] = None,
+                      priority: int = 0,
+                      payload: Optional[dict] = None) -> GitHubResponse:
+        """
+        Выполняет GET-запрос к API (или POST с JSON-телом `payload`).
+
+        Каждый запрос получает токен с наибольшим запасом из пула
+        (атрибут `tokens`) и проходит через планировщик лимитов этого
+        токена: при исчерпании лимита запрос ждёт его сброса,
+        а отклонённый по лимиту (403/429) — повторяется.
+
+        Если к клиенту подключён кэш (атрибут `cache`), запрос отправляется
+        условным: с сохранёнными валидаторами ETag/Last-Modified. Ответ 304
+        подменяется сохранённым телом и не расходует лимит запросов: место,
+        занятое им в планировщике, возвращается (RateLimiter.refund).
+        POST-запросы не кэшируются.
+
+        Параметры:
+            path (str): Путь эндпоинта, например "/search/repositories".
+            params (Optional[dict]): Параметры строки запроса.
+            priority (int): Приоритет в очереди планировщика
+                (меньше — раньше).
+            payload (Optional[dict]): JSON-тело POST-запроса.
+
+        Возвращает:
+            GitHubResponse: Ответ сервера с кодом < 400.
+
+        Исключения:
+            GitHubAPIError: Если сервер вернул код 4xx/5xx.
+            TimeoutError: Если запрос не уложился в таймаут.
+        """
+        query = {k: v for k, v in (params or {}).items() if v is not None}
+        target = self.base_path + path
+        if query:
+            target += "?" + urlencode(query)
+
+        body = json.dumps(payload).encode() if payload is not None else None
+        cache = self.cache if body is None else None
+        entry = await cache.lookup(target) if cache is not None else None
+        headers = self._headers
+        if entry is not None:
+            headers = headers + entry.conditional_headers()
+
+        resource = resource_for_path(path)
+        for attempt in range(GITHUB_MAX_RETRIES + 1):
+            token, limiter = self.tokens.choose(resource)
+            await limiter.acquire(resource, priority)
+            auth = [("Authorization", f"Bearer {token}")] if token else []
+            result = await self._exchange(target, headers + auth, body)
+            if result.status == 304:
+                # Ответ 304 на условный запрос не расходует лимит GitHub
+                await limiter.refund(resource)
+            limiter.update(resource, result.headers)
+            if not self._rate_limited(result) or attempt == GITHUB_MAX_RETRIES:
+                break
+            # Повтор уйдёт токену с запасом, а если исчерпаны все —
+            # планировщик дождётся ближайшего сброса или паузы
+            limiter.throttle(resource, result.headers)
+
+        if result.status == 304 and entry is not None:
+            cache.record_hit()
+            result.status = 200
+            result.body = entry.body
+        elif cache is not None:
+            cache.record_miss()
+            if result.status == 200:
+                await cache.store(target, result.headers, result.body)
+
+        if result.status >= 400:
+            try:
+                message = result.json().get("message", "")
+            except (ValueError, AttributeError):
+                message = result.body[:200].decode(errors="replace")
+            raise GitHubAPIError(result.status, message, target)
+        return result
+
+    @staticmethod
+    def _rate_limited(result: GitHubResponse) -> bool:
+        """Отклонён ли запрос из-за первичного или вторичного лимита."""
+        if result.status == 429:
+            return True
+        return result.status == 403 and (
+            "retry-after" in result.headers
+            or result.headers.get("x-ratelimit-remaining") == "0")
+
+    async def graphql(self, query: str, variables: Optional[dict] = None,
+                      priority: int = 0) -> dict:
+        """
+        POST /graphql — выполняет GraphQL-запрос.
+
+        Возвращает:
+            dict: Поле data ответа.
+
+        Исключения:
+            GitHubGraphQLError: Если ответ содержит ошибки и не содержит
+            данных. Частичные ошибки (например, один из запрошенных
+            репозиториев не найден) доступны вызывающему коду через
+            поле data, где соответствующий узел равен None.
+        """
+        response = await self.request("/graphql", priority=priority,
+                                      payload={"query": query,
+                                               "variables": variables or {}})
+        result = response.json() or {}
+        if result.get("errors") and not result.get("data"):
+            message = "; ".join(e.get("message", "")
+                                for e in result["errors"])
+            raise GitHubGraphQLError(response.status, message, response.url)
+        return result.get("data") or {}
+
+    async def search_repos(
+        self,
+        q: str,
+        sort: Optional[str] = None,
+        order: Optional[str] = None,
+        per_page: int = 100,
+        page: int = 1,
+        priority: int = 0
+    ) -> dict:
+        """GET /search/repositories — поиск репозиториев."""
+        response = await self.request("/search/repositories", {
+            "q": q, "sort": sort, "order": order,
+            "per_page": per_page, "page": page
+        }, priority)
+        return response.json()
+
+    async def list_commits(
+        self,
+        owner: str,
+        repo: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        per_page: int = 100,
+        page: int = 1,
+        priority: int = 0
+    ) -> list[dict]:
+        """GET /repos/{owner}/{repo}/commits — список коммитов."""
+        commits, _ = await self.list_commits_page(owner, repo, since, until,
+                                                  per_page, page, priority)
+        return commits
+
+    async def list_commits_page(
+        self,
+        owner: str,
+        repo: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        per_page: int = 100,
+        page: int = 1,
+        priority: int = 0
+    ) -> tuple[list[dict], Optional[int]]:
+        """
+        GET /repos/{owner}/{repo}/commits — страница коммитов вместе
+        с номером последней страницы (см. GitHubResponse.last_page).
+        """
+        response = await self.request(f"/repos/{owner}/{repo}/commits", {
+            "since": since, "until": until,
+            "per_page": per_page, "page": page
+        }, priority)
+        return response.json() or [], response.last_page()
+
+
+_client: Optional[GitHubClient] = None
+
+
+def get_github_client() -> GitHubClient:
+    """
+    Возвращает общий для процесса клиент GitHub API.
+
+    Клиент создаётся при первом обращении и далее переиспользуется
+    всеми парсерами.
+    """
+    global _client
+    if _client is None:
+        _client = GitHubClient()
+    return _client
+
+
+async def close_github_client() -> None:
+    """Закрывает соединения общего клиента, если он был создан."""
+    if _client is not None:
+        await _client.close()
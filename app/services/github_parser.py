@@ -1,24 +1,59 @@
 """
 Модуль парсеров для сбора данных из GitHub API.
 
-Содержит функции для получения данных о топ-100 репозиториях
+Содержит функции для получения данных о топе репозиториев
 и активности по коммитам, их агрегации и записи в базу данных.
 """
 
-from datetime import datetime
-from ghapi.all import GhApi  # type: ignore
-
-from app.repositories.crud import (upsert_top_100_repo,
-                                   upsert_repo_activity)
+import asyncio
+import os
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+
+import asyncpg  # type: ignore
+
+from app.repositories.crud import (TOP_REPOS_MAX,
+                                   publish_top_snapshot,
+                                   insert_top_history,
+                                   get_last_top_positions,
+                                   insert_commits,
+                                   rebuild_activity,
+                                   get_sync_cursor,
+                                   advance_sync_cursor,
+                                   mark_backfill_window)
 from app.db.connection import db
-
-
-async def fetch_top100_repos():
+from app.services.activity_writer import ActivityWriter
+from app.services.aggregation import DailyAggregator
+from app.services.github_client import GitHubClient, get_github_client
+from app.services.github_graphql import HistoryRequest, fetch_commits_graphql
+
+# Сколько страниц коммитов одного репозитория запрашивать одновременно
+GITHUB_PAGE_CONCURRENCY = int(os.getenv("GITHUB_PAGE_CONCURRENCY", "4"))
+# Поиск GitHub отдаёт результаты по 100 на страницу
+SEARCH_PAGE_SIZE = 100
+# Сколько репозиториев отслеживать в топе
+TOP_REPOS_LIMIT = min(int(os.getenv("TOP_REPOS_LIMIT", "100")),
+                      TOP_REPOS_MAX)
+# Сколько последних снимков топа хранить: клиент, листающий страницы
+# по версии, дочитывает прежний снимок после публикации нового
+TOP_SNAPSHOTS_KEEP = max(2, int(os.getenv("TOP_SNAPSHOTS_KEEP", "2")))
+
+
+async def fetch_top100_repos(client: GitHubClient,
+                             limit: int = TOP_REPOS_LIMIT):
     """
-    Получаем топ 100 публичных репозиториев по количеству звёзд.
+    Получаем топ публичных репозиториев по количеству звёзд
+    (по умолчанию TOP_REPOS_LIMIT, не больше 1000 — предел поиска GitHub).
 
-    Использует GitHub API через ghapi для выполнения запроса и формирования
-    списка репозиториев с ключевыми метриками.
+    Страницы поиска по 100 репозиториев запрашиваются параллельно. Если
+    рейтинг сдвинулся между запросами, репозиторий может попасть на две
+    соседние страницы — повтор отбрасывается, а позиции назначаются
+    подряд по порядку выдачи.
+
+    Параметры:
+        client (GitHubClient): Клиент GitHub API.
+        limit (int): Размер топа.
 
     Возвращает:
         list[dict]: Список словарей, где каждый словарь содержит данные
@@ -34,17 +69,25 @@ async def fetch_top100_repos():
         - open_issues (int): Количество открытых issues.
         - language (Optional[str]): Основной язык (None, если неизвестно).
     """
-    api = GhApi()
-    result = api.search.repos(q="stars:>1", sort="stars",
-                              order="desc", per_page=100)
+    limit = max(1, min(limit, TOP_REPOS_MAX))
+    pages = -(-limit // SEARCH_PAGE_SIZE)
+    results = await asyncio.gather(*(
+        client.search_repos(q="stars:>1", sort="stars", order="desc",
+                            per_page=SEARCH_PAGE_SIZE, page=page)
+        for page in range(1, pages + 1)
+    ))
 
     repos = []
-    if 'items' in result:
-        for num, repo in enumerate(result['items'], start=1):
+    seen = set()
+    for result in results:
+        for repo in result.get('items', []):
+            if repo['full_name'] in seen:
+                continue
+            seen.add(repo['full_name'])
             repo_data = {
                 "repo": repo['full_name'],
                 "owner": repo['owner']['login'],
-                "position_cur": num,
+                "position_cur": len(repos) + 1,
                 "position_prev": None,
                 "stars": repo['stargazers_count'],
                 "watchers": repo['watchers_count'],
@@ -54,71 +97,169 @@ async def fetch_top100_repos():
             }
             repos.append(repo_data)
 
-    return repos
+    return repos[:limit]
 
 
-async def update_top100_in_db():
+async def update_top100_in_db(client: Optional[GitHubClient] = None,
+                              limit: int = TOP_REPOS_LIMIT) -> int:
     """
-    Обновляет данные о топ-100 репозиториях в таблице top100.
+    Обновляет данные о топе репозиториев (представление top100;
+    название историческое, размер топа задаёт limit).
 
     Использует функцию fetch_top100_repos для получения списка
-    репозиториев и синхронизирует данные с базой данных.
+    репозиториев и публикует его новым снимком (publish_top_snapshot)
+    в одной транзакции с записью позиций и метрик в таблицу top_history.
+    Репозиторий, вернувшийся в топ, получает предыдущей позицией
+    последнюю из истории.
+
+    Параметры:
+        client (Optional[GitHubClient]): Клиент GitHub API. По умолчанию
+        используется общий клиент процесса.
+        limit (int): Размер топа.
+
+    Возвращает:
+        int: Версия опубликованного снимка топа.
     """
-    repos = await fetch_top100_repos()
+    repos = await fetch_top100_repos(client or get_github_client(), limit)
+    snapshot_at = datetime.now(timezone.utc)
     new_repos = {repo['repo'] for repo in repos}
 
     async with db.connect_to_pool() as connection:
-        await connection.execute(
-            "DELETE FROM top100 WHERE repo NOT IN (SELECT UNNEST($1::text[]))",
-            list(new_repos)
-        )
-
+        last_positions = await get_last_top_positions(connection,
+                                                      list(new_repos))
         for repo_data in repos:
-            await upsert_top_100_repo(connection, repo_data)
+            repo_data["position_prev"] = last_positions.get(repo_data["repo"])
+
+        async with connection.transaction():
+            version = await publish_top_snapshot(connection, repos,
+                                                 TOP_SNAPSHOTS_KEEP)
+            await insert_top_history(connection, snapshot_at, repos)
+    return version
 
 
-async def fetch_commits(owner: str, repo: str, since: str, until: str):
+async def iter_commit_pages(
+    client: GitHubClient, owner: str, repo: str,
+    since: str, until: str, priority: int = 0
+) -> AsyncIterator[list[dict]]:
     """
-    Получает список коммитов для указанного репозитория и периода.
+    Асинхронный генератор страниц коммитов репозитория за период.
+
+    Первая страница сообщает (заголовком Link) номер последней, после
+    чего следующие страницы запрашиваются заранее — не более
+    GITHUB_PAGE_CONCURRENCY впереди текущей. Страницы отдаются по порядку,
+    а коммиты, сместившиеся со страницы на следующую во время загрузки,
+    отбрасываются по SHA. В памяти одновременно находится лишь несколько
+    страниц, независимо от длины истории.
 
     Параметры:
+        client (GitHubClient): Клиент GitHub API.
         owner (str): Владелец репозитория.
         repo (str): Полное имя репозитория.
         since (str): Дата начала в формате ISO8601
         until (str): Дата окончания в формате ISO8601.
+        priority (int): Приоритет запросов в планировщике лимитов.
 
     Возвращает:
-        list[dict]: Список коммитов, полученных через GitHub API.
-    """
-    try:
-        api = GhApi()
-        commits = []
-        page = 1
-        per_page = 100
-        while True:
-            result = api.repos.list_commits(
-                owner, repo, since=since, until=until,
-                per_page=per_page, page=page
-                )
-            if not result:
-                break
-            commits.extend(result)
-            if len(result) < per_page:
-                break
-            page += 1
+        AsyncIterator[list[dict]]: Страницы коммитов GitHub API.
 
+    Исключения:
+        Ошибки GitHub API пробрасываются вызывающему коду, чтобы сбой
+        отдельного репозитория был виден в сводке обновления.
+    """
+    per_page = 100
+    prev_shas: set[str] = set()
+
+    async def fetch_page(page: int) -> list[dict]:
+        result, _ = await client.list_commits_page(
+            owner, repo, since=since, until=until,
+            per_page=per_page, page=page, priority=priority
+            )
+        return result
+
+    def fresh(result: list[dict]) -> list[dict]:
+        # Сдвиг возможен только между соседними страницами, поэтому
+        # достаточно помнить SHA предыдущей
+        nonlocal prev_shas
+        commits = [c for c in result if c["sha"] not in prev_shas]
+        prev_shas = {c["sha"] for c in result}
         return commits
-    except Exception as e:
-        print(f"Ошибка при запросе коммитов для {owner}/{repo}: {e}")
-        return []
+
+    last, last_page = await client.list_commits_page(
+        owner, repo, since=since, until=until,
+        per_page=per_page, page=1, priority=priority
+        )
+    page = 1
+    yield fresh(last)
+
+    if last_page and last_page > 1:
+        ahead: deque[asyncio.Task] = deque()
+        next_page = 2
+        try:
+            while ahead or next_page <= last_page:
+                while next_page <= last_page \
+                        and len(ahead) < GITHUB_PAGE_CONCURRENCY:
+                    ahead.append(asyncio.create_task(fetch_page(next_page)))
+                    next_page += 1
+                last = await ahead.popleft()
+                page += 1
+                yield fresh(last)
+        finally:
+            for task in ahead:
+                task.cancel()
+            await asyncio.gather(*ahead, return_exceptions=True)
+
+    # Если во время загрузки появились новые коммиты, хвост мог сдвинуться
+    # за последнюю страницу — дочитываем его последовательно. Сюда же
+    # попадаем, если номер последней страницы неизвестен (ответ из кэша).
+    while len(last) == per_page:
+        page += 1
+        last = await fetch_page(page)
+        yield fresh(last)
+
+
+async def fetch_commits(client: GitHubClient, owner: str, repo: str,
+                        since: str, until: str, priority: int = 0):
+    """
+    Получает список коммитов для указанного репозитория и периода
+    (все страницы iter_commit_pages разом).
+
+    Держит в памяти всю историю периода — для длинных периодов
+    используйте iter_commit_pages вместе с DailyAggregator.
+
+    Возвращает:
+        list[dict]: Список коммитов, полученных через GitHub API.
+    """
+    commits = []
+    async for result in iter_commit_pages(client, owner, repo,
+                                          since, until, priority):
+        commits.extend(result)
+    return commits
+
+
+async def aggregate_commit_pages(
+    client: GitHubClient, owner: str, repo: str,
+    since: str, until: str, priority: int = 0,
+    keep_commits: bool = False
+) -> DailyAggregator:
+    """
+    Загружает коммиты периода постранично и сворачивает каждую страницу
+    в дневные счётчики, не накапливая сами коммиты. С keep_commits
+    сохраняет компактные строки коммитов для таблицы commits.
+    """
+    aggregator = DailyAggregator(keep_commits)
+    async for result in iter_commit_pages(client, owner, repo,
+                                          since, until, priority):
+        aggregator.add_page(result)
+    return aggregator
 
 
 def aggregate_commits_by_day(commits):
     """
-    Агрегирует список коммитов по датам.
+    Агрегирует список коммитов по датам (UTC, дата автора).
 
     Преобразует список коммитов в словарь, где ключи — даты, а значения —
     количество коммитов и список авторов за соответствующий день.
+    Другие периоды и часовые пояса — см. aggregation.aggregate_commits.
 
     Параметры:
         commits (list[dict]): Список коммитов от GitHub API.
@@ -126,37 +267,23 @@ def aggregate_commits_by_day(commits):
     Возвращает:
         dict: Словарь вида:
         {
-            'YYYY-MM-DD': {
+            date: {
                 'commits': int,
                 'authors': set[str]
             }
         }
     """
-    daily_stats = {}
+    aggregator = DailyAggregator()
+    aggregator.add_page(commits)
+    return aggregator.days
 
-    for c in commits:
-        commit_date_str = c['commit']['author']['date']
-        commit_date = datetime.fromisoformat(
-            commit_date_str.replace('Z', '+00:00'))
-        day_str = commit_date.date().isoformat()
-
-        author_name = "Unknown"
-        if c['commit']['author'] and 'name' in c['commit']['author']:
-            author_name = c['commit']['author']['name']
-
-        if day_str not in daily_stats:
-            daily_stats[day_str] = {
-                'commits': 0,
-                'authors': set()
-            }
 
-        daily_stats[day_str]['commits'] += 1
-        daily_stats[day_str]['authors'].add(author_name)
-
-    return daily_stats
-
-
-async def update_activity_in_db(owner: str, repo: str, since: str, until: str):
+async def update_activity_in_db(
+    owner: str, repo: str, since: str, until: str,
+    client: Optional[GitHubClient] = None,
+    priority: int = 0,
+    writer: Optional[ActivityWriter] = None
+) -> dict:
     """
     Обновляет данные об активности репозитория за указанный период.
 
@@ -165,19 +292,288 @@ async def update_activity_in_db(owner: str, repo: str, since: str, until: str):
         repo (str): Полное имя репозитория.
         since (str): Дата начала в формате ISO8601.
         until (str): Дата окончания в формате ISO8601.
+        client (Optional[GitHubClient]): Клиент GitHub API. По умолчанию
+        используется общий клиент процесса.
+        priority (int): Приоритет запросов в планировщике лимитов
+        (например, позиция репозитория в топе).
+        writer (Optional[ActivityWriter]): Общий писатель activity
+        (режим замены) для пакетной записи многих репозиториев — его
+        flush выполняет вызывающий код. По умолчанию дни записываются
+        отдельным писателем сразу.
+
+    Возвращает:
+        dict: {'days': int, 'commits': int, 'write': dict} — количество
+        записанных дней, обработанных коммитов и статистика записи
+        (ActivityWriter.stats).
 
     Логика:
-        - Получает коммиты через fetch_commits.
-        - Агрегирует данные по дням через aggregate_commits_by_day.
-        - Записывает данные в таблицу activity через insert_or_update_activity.
+        - Постранично получает коммиты и сворачивает их по дням
+          через aggregate_commit_pages.
+        - Записывает данные в таблицу activity пакетами через
+          ActivityWriter, а сами коммиты — в таблицу commits.
+    """
+    aggregator = await aggregate_commit_pages(client or get_github_client(),
+                                              owner, repo, since, until,
+                                              priority, keep_commits=True)
+    daily_stats = aggregator.days
+
+    async with db.connect_to_pool() as connection:
+        await insert_commits(connection, owner, repo, aggregator.rows,
+                             merge_activity=False)
+        if writer is None:
+            async with ActivityWriter(connection) as own_writer:
+                await own_writer.add_days(owner, repo, daily_stats)
+            stats = own_writer.stats()
+        else:
+            await writer.add_days(owner, repo, daily_stats)
+            stats = writer.stats()
+
+    return {"days": len(daily_stats), "commits": aggregator.commits,
+            "write": stats}
+
+
+def _iso(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+async def sync_activity_in_db(
+    owner: str, repo: str, default_since: datetime, until: datetime,
+    client: Optional[GitHubClient] = None,
+    priority: int = 0
+) -> dict:
+    """
+    Инкрементально синхронизирует активность репозитория по курсору.
+
+    Запрашивает только коммиты, появившиеся после курсора sync_cursor
+    (по `until` включительно), добавляет их к дневным записям activity
+    и передвигает курсор в той же транзакции. Если запуск прервётся,
+    курсор не сдвинется и следующий запуск заберёт те же коммиты;
+    повторный запуск ничего не учтёт дважды.
+
+    Параметры:
+        owner (str): Владелец репозитория.
+        repo (str): Имя репозитория.
+        default_since (datetime): Начало периода для репозитория,
+        у которого ещё нет курсора (UTC).
+        until (datetime): Конец периода (UTC), новое значение курсора.
+        client (Optional[GitHubClient]): Клиент GitHub API. По умолчанию
+        используется общий клиент процесса.
+        priority (int): Приоритет запросов в планировщике лимитов.
+
+    Возвращает:
+        dict: {'days': int, 'commits': int} — количество затронутых дней
+        и новых коммитов.
+
+    Исключения:
+        RuntimeError: Если курсор был передвинут параллельным запуском
+        (изменения этого запуска откатываются).
+    """
+    until = until.replace(microsecond=0)
+    cursor, since = await load_sync_window(owner, repo, default_since, until)
+    if since is None:
+        return {"days": 0, "commits": 0}
+
+    aggregator = await aggregate_commit_pages(client or get_github_client(),
+                                              owner, repo, _iso(since),
+                                              _iso(until), priority,
+                                              keep_commits=True)
+    return await apply_synced_commits(owner, repo, cursor, until, aggregator)
+
+
+async def load_sync_window(
+    owner: str, repo: str, default_since: datetime, until: datetime
+) -> tuple[Optional[asyncpg.Record], Optional[datetime]]:
+    """
+    Читает курсор репозитория и вычисляет начало периода синхронизации.
+
+    Возвращает:
+        tuple: (курсор или None, начало периода или None, если
+        синхронизировать нечего).
+    """
+    async with db.connect_to_pool() as connection:
+        cursor = await get_sync_cursor(connection, owner, repo)
+
+    prev_until = cursor["synced_until"] if cursor else None
+    # Временные метки GitHub имеют точность до секунды, а границы
+    # since/until включительные — поэтому окна запусков не пересекаются
+    since = prev_until + timedelta(seconds=1) if prev_until \
+        else default_since
+    return cursor, (since if since <= until else None)
+
+
+async def apply_synced_commits(
+    owner: str, repo: str, cursor: Optional[asyncpg.Record],
+    until: datetime, aggregator: DailyAggregator
+) -> dict:
+    """
+    Добавляет новые коммиты к activity и передвигает курсор
+    в одной транзакции (см. sync_activity_in_db).
+
+    Параметры:
+        owner (str): Владелец репозитория.
+        repo (str): Имя репозитория.
+        cursor (Optional[asyncpg.Record]): Курсор, прочитанный
+        load_sync_window.
+        until (datetime): Новое значение курсора.
+        aggregator (DailyAggregator): Дневные счётчики и строки
+        (keep_commits) новых коммитов.
+
+    Возвращает:
+        dict: {'days': int, 'commits': int}.
+    """
+    async with db.connect_to_pool() as connection:
+        return await write_synced_commits(connection, owner, repo, cursor,
+                                          until, aggregator)
+
+
+async def write_synced_commits(
+    connection: asyncpg.Connection, owner: str, repo: str,
+    cursor: Optional[asyncpg.Record], until: datetime,
+    aggregator: DailyAggregator
+) -> dict:
+    """
+    То же, что apply_synced_commits, но на переданном соединении.
+
+    Если агрегатор сохранил строки коммитов (keep_commits), они
+    записываются в таблицу commits, а в activity добавляются только
+    действительно новые из них (insert_commits) — даже повторная запись
+    тех же коммитов не учтёт их дважды.
+
+    Если соединение уже внутри транзакции, запись выполняется в точке
+    сохранения: сбой одного репозитория не откатывает остальные.
+    """
+    prev_until = cursor["synced_until"] if cursor else None
+    daily_stats = aggregator.days
+    head_sha = aggregator.head_sha \
+        or (cursor["head_sha"] if cursor else None)
+
+    async with connection.transaction():
+        if aggregator.rows is not None:
+            await insert_commits(connection, owner, repo, aggregator.rows)
+        else:
+            async with ActivityWriter(connection, replace=False) as writer:
+                await writer.add_days(owner, repo, daily_stats)
+        advanced = await advance_sync_cursor(connection, owner, repo,
+                                             prev_until, until, head_sha)
+        if not advanced:
+            raise RuntimeError(
+                f"Курсор {owner}/{repo} изменён параллельным запуском")
+
+    return {"days": len(daily_stats), "commits": aggregator.commits}
+
+
+async def sync_activity_graphql(
+    repos: list[tuple[str, str]], default_since: datetime, until: datetime,
+    client: Optional[GitHubClient] = None,
+    concurrency: int = 10
+) -> dict[tuple[str, str], dict]:
+    """
+    Инкрементально синхронизирует активность многих репозиториев,
+    загружая историю через GraphQL пакетами (см. github_graphql).
+
+    Семантика курсоров и записи та же, что у sync_activity_in_db;
+    отличается только способ загрузки коммитов.
+
+    Параметры:
+        repos (list[tuple[str, str]]): Пары (owner, repo) в порядке
+        приоритета.
+        default_since (datetime): Начало периода для репозиториев
+        без курсора (UTC).
+        until (datetime): Конец периода (UTC), новое значение курсоров.
+        client (Optional[GitHubClient]): Клиент GitHub API. По умолчанию
+        используется общий клиент процесса.
+        concurrency (int): Сколько репозиториев записывать в БД
+        одновременно.
+
+    Возвращает:
+        dict: Для каждой пары (owner, repo) — {'days', 'commits'}
+        либо {'error': str} при сбое.
+    """
+    until = until.replace(microsecond=0)
+    windows = await asyncio.gather(*(
+        load_sync_window(owner, repo, default_since, until)
+        for owner, repo in repos
+    ))
+
+    results: dict[tuple[str, str], dict] = {}
+    requests = []
+    cursors = {}
+    for (owner, repo), (cursor, since) in zip(repos, windows):
+        if since is None:
+            results[(owner, repo)] = {"days": 0, "commits": 0}
+            continue
+        cursors[(owner, repo)] = cursor
+        requests.append(HistoryRequest(owner, repo, _iso(since), _iso(until)))
+
+    await fetch_commits_graphql(client or get_github_client(), requests)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def write(item: HistoryRequest) -> None:
+        key = (item.owner, item.repo)
+        if item.error:
+            results[key] = {"error": item.error}
+            return
+        async with semaphore:
+            try:
+                results[key] = await apply_synced_commits(
+                    item.owner, item.repo, cursors[key], until,
+                    item.aggregator)
+            except Exception as e:
+                results[key] = {"error": f"{type(e).__name__}: {e}"}
+
+    await asyncio.gather(*(write(item) for item in requests))
+    return results
+
+
+async def backfill_window_in_db(
+    job: str, owner: str, repo: str, window_start: date, window_end: date,
+    client: Optional[GitHubClient] = None,
+    priority: int = 0
+) -> dict:
+    """
+    Загружает историю активности репозитория за окно дней
+    [window_start, window_end] и отмечает окно завершённым.
+
+    Коммиты окна сохраняются в таблицу commits, после чего дни окна
+    пересчитываются из неё (rebuild_activity); отметка в backfill_progress
+    ставится в той же транзакции, поэтому повтор окна безопасен.
+    GitHub отбирает коммиты по дате коммита, а агрегируем мы по правилам
+    репозитория (по умолчанию — по дате автора): коммиты, чей день
+    выходит за окно, сохраняются, но учитываются при пересчёте своего
+    окна.
+
+    Параметры:
+        job (str): Имя задания загрузки.
+        owner (str): Владелец репозитория.
+        repo (str): Имя репозитория.
+        window_start (date): Первый день окна.
+        window_end (date): Последний день окна (включительно).
+        client (Optional[GitHubClient]): Клиент GitHub API. По умолчанию
+        используется общий клиент процесса.
+        priority (int): Приоритет запросов в планировщике лимитов.
+
+    Возвращает:
+        dict: {'days': int, 'commits': int} — количество записанных дней
+        и загруженных за окно коммитов.
     """
-    commits = await fetch_commits(owner, repo, since, until)
-    daily_stats = aggregate_commits_by_day(commits)
+    since = f"{window_start.isoformat()}T00:00:00Z"
+    until = f"{window_end.isoformat()}T23:59:59Z"
+    aggregator = await aggregate_commit_pages(client or get_github_client(),
+                                              owner, repo, since, until,
+                                              priority, keep_commits=True)
+    # Дни activity строятся по правилам репозитория, а не по дням
+    # агрегатора (UTC, дата автора), поэтому учитываются сами коммиты
+    # окна
+    written = len(aggregator.rows)
 
     async with db.connect_to_pool() as connection:
-        for date_str, data in daily_stats.items():
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-            commits_count = data['commits']
-            authors_list = list(data['authors'])
-            await upsert_repo_activity(connection, owner, repo, date_obj,
-                                       commits_count, authors_list)
+        async with connection.transaction():
+            await insert_commits(connection, owner, repo, aggregator.rows,
+                                 merge_activity=False)
+            days = await rebuild_activity(connection, window_start,
+                                          window_end, owner, repo)
+            await mark_backfill_window(connection, job, owner, repo,
+                                       window_start, window_end, written)
+
+    return {"days": days, "commits": written}
@@ -0,0 +1,103 @@
+"""
+Кэш валидаторов ответов GitHub API, хранящийся в PostgreSQL.
+
+Для каждого URL запроса запоминаются ETag/Last-Modified и тело ответа.
+Клиент отправляет их в заголовках If-None-Match/If-Modified-Since, и если
+данные не изменились, GitHub отвечает 304 — такой ответ не расходует лимит
+запросов, а тело берётся из кэша.
+"""
+
+import os
+from typing import Optional
+
+from app.db.connection import db
+from app.repositories.crud import (delete_stale_http_cache,
+                                   get_http_cache_entry,
+                                   upsert_http_cache_entry)
+
+# Записи, не обновлявшиеся дольше этого срока, удаляются при подготовке кэша
+HTTP_CACHE_MAX_AGE_DAYS = int(os.getenv("HTTP_CACHE_MAX_AGE_DAYS", "30"))
+
+
+class CacheEntry:
+    """Сохранённый ответ: валидаторы и тело."""
+
+    def __init__(self, etag: Optional[str], last_modified: Optional[str],
+                 body: bytes):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body = body
+
+    def conditional_headers(self) -> list[tuple[str, str]]:
+        """Заголовки условного запроса для этой записи."""
+        headers = []
+        if self.etag:
+            headers.append(("If-None-Match", self.etag))
+        if self.last_modified:
+            headers.append(("If-Modified-Since", self.last_modified))
+        return headers
+
+
+class ResponseCache:
+    """
+    Кэш ответов GitHub API в таблице http_cache.
+
+    Подключается к клиенту через атрибут `GitHubClient.cache`.
+    Счётчики `hits`/`misses` отражают число ответов 304 и полных
+    ответов с момента создания кэша (или вызова reset_stats).
+    Ошибки базы данных не прерывают запросы: кэш просто не используется.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def setup(self) -> None:
+        """Удаляет устаревшие записи кэша."""
+        async with db.connect_to_pool() as connection:
+            await delete_stale_http_cache(connection, HTTP_CACHE_MAX_AGE_DAYS)
+
+    async def lookup(self, url: str) -> Optional[CacheEntry]:
+        try:
+            async with db.connect_to_pool() as connection:
+                row = await get_http_cache_entry(connection, url)
+        except RuntimeError:
+            self.errors += 1
+            return None
+        if row is None:
+            return None
+        return CacheEntry(row["etag"], row["last_modified"], row["body"])
+
+    async def store(self, url: str, headers: dict[str, str],
+                    body: bytes) -> None:
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if not etag and not last_modified:
+            return
+        try:
+            async with db.connect_to_pool() as connection:
+                await upsert_http_cache_entry(connection, url, etag,
+                                              last_modified, body)
+        except RuntimeError:
+            self.errors += 1
+
+    def record_hit(self) -> None:
+        self.hits += 1
+
+    def record_miss(self) -> None:
+        self.misses += 1
+
+    def reset_stats(self) -> None:
+        self.hits = self.misses = self.errors = 0
+
+    def stats(self) -> dict:
+        """Счётчики кэша и доля ответов 304."""
+        total = self.hits + self.misses
+        return {
+            "requests": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
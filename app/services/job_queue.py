@@ -0,0 +1,265 @@
+"""
+Очередь заданий обновления активности в Postgres (таблица refresh_jobs).
+
+Обновление топа разбивается на задания по репозиториям, которые
+выполняет любое число обработчиков (процессов или экземпляров функции):
+
+- enqueue_top_repos ставит в очередь по заданию на репозиторий из top100;
+- RefreshWorker забирает задания через FOR UPDATE SKIP LOCKED, так что
+  обработчики не мешают друг другу и не получают одно задание дважды;
+- взятое задание арендуется на REFRESH_JOB_LEASE секунд, а обработчик
+  продлевает аренду, пока работает. Если он упал, аренда истекает
+  и задание забирает другой обработчик. Если продлить аренду не удаётся
+  (например, БД недоступна), обработчик повторяет попытки и прерывает
+  задание до истечения аренды, чтобы не выполнять его одновременно
+  с другим обработчиком;
+- после ошибки задание повторяется с экспоненциальной задержкой,
+  а исчерпавшее попытки переводится в dead и остаётся для разбора.
+
+Повторная обработка репозитория безопасна: sync_activity_in_db
+передвигает курсор синхронизации только из ожидаемого положения.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import asyncpg  # type: ignore
+
+from app.db.connection import db
+from app.repositories.crud import (claim_refresh_jobs, complete_refresh_job,
+                                   delete_finished_refresh_jobs,
+                                   enqueue_refresh_jobs,
+                                   extend_refresh_job_leases,
+                                   fail_refresh_job)
+from app.services.github_client import GitHubClient, get_github_client
+from app.services.github_parser import sync_activity_in_db
+
+logger = logging.getLogger(__name__)
+
+# Срок аренды задания, секунд; продлевается каждую треть срока
+REFRESH_JOB_LEASE = float(os.getenv("REFRESH_JOB_LEASE", "120"))
+# Сколько раз пробовать задание, прежде чем перевести его в dead
+REFRESH_JOB_MAX_ATTEMPTS = int(os.getenv("REFRESH_JOB_MAX_ATTEMPTS", "5"))
+# Задержка первого повтора и её предел, секунд
+REFRESH_JOB_BACKOFF = float(os.getenv("REFRESH_JOB_BACKOFF", "30"))
+REFRESH_JOB_MAX_BACKOFF = float(os.getenv("REFRESH_JOB_MAX_BACKOFF", "3600"))
+# Сколько дней хранить выполненные задания
+REFRESH_JOB_RETENTION_DAYS = int(os.getenv("REFRESH_JOB_RETENTION_DAYS", "7"))
+
+
+async def enqueue_top_repos(
+    retention_days: int = REFRESH_JOB_RETENTION_DAYS
+) -> dict:
+    """
+    Ставит в очередь задания для всех репозиториев из top100
+    (приоритет — позиция в топе) и удаляет старые выполненные задания.
+
+    Возвращает:
+        dict: {'repos': int, 'enqueued': int, 'purged': int}.
+    """
+    async with db.connect_to_pool() as conn:
+        records = await conn.fetch(
+            "SELECT owner, repo, position_cur FROM top100 "
+            "ORDER BY position_cur"
+        )
+        jobs = [(r["owner"], r["repo"].split("/", 1)[1], r["position_cur"])
+                for r in records]
+        enqueued = await enqueue_refresh_jobs(conn, jobs)
+        purged = await delete_finished_refresh_jobs(conn, retention_days)
+    return {"repos": len(jobs), "enqueued": enqueued, "purged": purged}
+
+
+class RefreshWorker:
+    """
+    Обработчик очереди refresh_jobs.
+
+    Параметры:
+        concurrency (int): Сколько заданий выполнять одновременно.
+        worker_id (Optional[str]): Имя обработчика в locked_by.
+            По умолчанию — хост, PID и случайный суффикс.
+        lease (float): Срок аренды задания, секунд.
+        max_attempts (int): Число попыток до перевода в dead.
+        backoff (float): Задержка первого повтора, секунд.
+        max_backoff (float): Предел задержки повтора, секунд.
+        client (Optional[GitHubClient]): Клиент GitHub API. По умолчанию
+            используется общий клиент процесса.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 10,
+        worker_id: Optional[str] = None,
+        lease: float = REFRESH_JOB_LEASE,
+        max_attempts: int = REFRESH_JOB_MAX_ATTEMPTS,
+        backoff: float = REFRESH_JOB_BACKOFF,
+        max_backoff: float = REFRESH_JOB_MAX_BACKOFF,
+        client: Optional[GitHubClient] = None
+    ):
+        self.concurrency = max(1, concurrency)
+        self.worker_id = worker_id or (
+            f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.client = client or get_github_client()
+        self._in_flight: dict[int, asyncio.Task] = {}
+        # До какого момента (time.monotonic) арендовано задание — оценка
+        # снизу: отсчёт от отправки запроса, а не от его выполнения в БД
+        self._leased_until: dict[int, float] = {}
+        self.stats = {"claimed": 0, "done": 0, "retried": 0, "dead": 0,
+                      "lost": 0, "commits": 0}
+
+    async def run(
+        self,
+        default_since: datetime,
+        idle_exit: bool = True,
+        poll_interval: float = 5.0
+    ) -> dict:
+        """
+        Выполняет задания, пока они есть в очереди.
+
+        Параметры:
+            default_since (datetime): Начало периода для репозиториев
+            без курсора синхронизации (UTC).
+            idle_exit (bool): Завершиться, когда доступных заданий нет
+            и выполняемых не осталось (режим облачной функции). Иначе
+            опрашивать очередь каждые poll_interval секунд.
+            poll_interval (float): Пауза между опросами пустой очереди.
+
+        Возвращает:
+            dict: Счётчики обработчика: взято, выполнено, отложено
+            на повтор, переведено в dead, потеряно (аренду перехватил
+            другой обработчик), новых коммитов и время работы.
+        """
+        started = time.monotonic()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while True:
+                capacity = self.concurrency - len(self._in_flight)
+                if capacity > 0:
+                    for job in await self._claim(capacity):
+                        self._in_flight[job["id"]] = asyncio.create_task(
+                            self._process(job, default_since))
+                if self._in_flight:
+                    await asyncio.wait(self._in_flight.values(),
+                                       return_when=asyncio.FIRST_COMPLETED)
+                elif idle_exit:
+                    break
+                else:
+                    await asyncio.sleep(poll_interval)
+        finally:
+            heartbeat.cancel()
+            for task in self._in_flight.values():
+                task.cancel()
+            await asyncio.gather(heartbeat, *self._in_flight.values(),
+                                 return_exceptions=True)
+        return {"worker": self.worker_id, **self.stats,
+                "seconds": round(time.monotonic() - started, 3)}
+
+    async def _claim(self, limit: int) -> list[asyncpg.Record]:
+        requested = time.monotonic()
+        async with db.connect_to_pool() as conn:
+            jobs = await claim_refresh_jobs(conn, self.worker_id, limit,
+                                            self.lease, self.max_attempts)
+        for job in jobs:
+            self._leased_until[job["id"]] = requested + self.lease
+        self.stats["claimed"] += len(jobs)
+        return jobs
+
+    async def _process(self, job: asyncpg.Record,
+                       default_since: datetime) -> None:
+        until = datetime.now(timezone.utc).replace(microsecond=0)
+        try:
+            try:
+                result = await sync_activity_in_db(
+                    job["owner"], job["repo"], default_since, until,
+                    client=self.client, priority=job["priority"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                try:
+                    async with db.connect_to_pool() as conn:
+                        status = await fail_refresh_job(
+                            conn, self.worker_id, job["id"],
+                            f"{type(e).__name__}: {e}", self.max_attempts,
+                            self.backoff, self.max_backoff)
+                except Exception as error:
+                    # Задание вернётся в очередь по истечении аренды
+                    logger.warning("Не удалось записать ошибку задания "
+                                   "%s: %s", job["id"], error)
+                    status = None
+                key = {"pending": "retried", "dead": "dead"}.get(status,
+                                                                  "lost")
+                self.stats[key] += 1
+                return
+
+            try:
+                async with db.connect_to_pool() as conn:
+                    completed = await complete_refresh_job(
+                        conn, self.worker_id, job["id"], result["commits"])
+            except Exception as error:
+                # Коммиты уже записаны, курсор продвинут: повтор задания
+                # после истечения аренды ничего не задвоит
+                logger.warning("Не удалось завершить задание %s: %s",
+                               job["id"], error)
+                completed = False
+            self.stats["done" if completed else "lost"] += 1
+            self.stats["commits"] += result["commits"]
+        finally:
+            self._in_flight.pop(job["id"], None)
+            self._leased_until.pop(job["id"], None)
+
+    def _drop(self, job_id: int) -> None:
+        """Прерывает задание, аренду которого обработчик потерял."""
+        task = self._in_flight.pop(job_id, None)
+        self._leased_until.pop(job_id, None)
+        if task is not None:
+            task.cancel()
+            self.stats["lost"] += 1
+
+    async def _heartbeat(self) -> None:
+        """
+        Продлевает аренду выполняемых заданий каждую треть срока.
+
+        При ошибке продления попытка повторяется через десятую часть
+        срока, а задания, аренда которых истечёт раньше следующей
+        попытки, прерываются.
+        """
+        interval = self.lease / 3
+        while True:
+            await asyncio.sleep(interval)
+            interval = self.lease / 3
+            job_ids = list(self._in_flight)
+            if not job_ids:
+                continue
+            requested = time.monotonic()
+            try:
+                async with db.connect_to_pool() as conn:
+                    kept = await extend_refresh_job_leases(
+                        conn, self.worker_id, job_ids, self.lease)
+            except Exception as e:
+                interval = self.lease / 10
+                logger.warning("Не удалось продлить аренду заданий %s: %s",
+                               job_ids, e)
+                retry_at = time.monotonic() + interval
+                for job_id in job_ids:
+                    if self._leased_until.get(job_id, 0.0) <= retry_at:
+                        logger.warning(
+                            "Аренда задания %s истекает, задание прервано",
+                            job_id)
+                        self._drop(job_id)
+                continue
+            for job_id in job_ids:
+                if job_id in kept:
+                    if job_id in self._in_flight:
+                        self._leased_until[job_id] = requested + self.lease
+                else:
+                    # Задание уже выполняет другой обработчик
+                    self._drop(job_id)
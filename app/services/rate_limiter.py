@@ -0,0 +1,310 @@
+"""
+Планировщик запросов к GitHub API с учётом лимитов.
+
+Все запросы клиента проходят через RateLimiter. Для каждого ресурса
+лимита GitHub ("core", "search", ...) ведётся отдельное ведро токенов,
+состояние которого уточняется по заголовкам X-RateLimit-* каждого ответа:
+
+- пока запас запросов выше резерва, запросы идут без задержек;
+- когда запас опускается до резерва, запросы равномерно распределяются
+  по оставшемуся до сброса лимита времени;
+- когда лимит исчерпан, запросы ждут его сброса вместо ошибки.
+
+Ожидающие запросы обслуживаются по приоритету (меньше — раньше), поэтому
+при нехватке лимита первыми обрабатываются более важные репозитории.
+
+TokenPool объединяет несколько токенов: у каждого свой RateLimiter,
+а запрос направляется токену с наибольшим запасом, так что суммарная
+пропускная способность растёт пропорционально числу токенов.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Optional
+
+# Доля лимита, после исчерпания которой запросы начинают распределяться
+# равномерно до момента сброса
+GITHUB_RATE_RESERVE = float(os.getenv("GITHUB_RATE_RESERVE", "0.1"))
+
+# Лимиты по умолчанию до первого ответа: (с токеном, без токена, окно в сек.)
+DEFAULT_LIMITS = {
+    "core": (5000, 60, 3600),
+    "search": (30, 10, 60),
+    "graphql": (5000, 0, 3600),
+}
+
+
+def resource_for_path(path: str) -> str:
+    """Определяет ресурс лимита GitHub по пути запроса."""
+    if path.startswith("/search/"):
+        return "search"
+    if path.startswith("/graphql"):
+        return "graphql"
+    return "core"
+
+
+class _Bucket:
+    """Состояние лимита одного ресурса."""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.remaining = limit
+        self.window = window
+        self.reset_at = time.time() + window
+        self.last_sent = 0.0
+        # До этого момента запросы приостановлены (отказ 403/429)
+        self.blocked_until = 0.0
+        self.waiters: list[tuple[int, int]] = []
+        self.condition = asyncio.Condition()
+        # Счётчики
+        self.requests = 0
+        self.waited = 0.0
+        self.throttled = 0
+
+    def delay(self, reserve: float) -> float:
+        """Сколько секунд ждать до отправки следующего запроса."""
+        now = time.time()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if now >= self.reset_at:
+            # Окно сброшено, а свежих заголовков ещё нет
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+        if self.remaining <= 0:
+            return self.reset_at - now + 1
+        if self.remaining > self.limit * reserve:
+            return 0.0
+        interval = (self.reset_at - now) / self.remaining
+        return max(0.0, self.last_sent + interval - now)
+
+    def take(self) -> None:
+        self.remaining -= 1
+        self.requests += 1
+        self.last_sent = time.time()
+
+
+class RateLimiter:
+    """
+    Центральный планировщик запросов к GitHub API.
+
+    Параметры:
+        authenticated (bool): Используется ли токен (влияет на лимиты
+            по умолчанию до получения первых заголовков).
+        reserve (float): Доля лимита, при которой включается
+            равномерное распределение запросов.
+    """
+
+    def __init__(self, authenticated: bool = True,
+                 reserve: float = GITHUB_RATE_RESERVE):
+        self.authenticated = authenticated
+        self.reserve = reserve
+        self._buckets: dict[str, _Bucket] = {}
+        self._sequence = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bucket(self, resource: str) -> _Bucket:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Условия ожидания привязаны к циклу событий — при новом
+            # вызове функции состояние лимитов сохраняем, а их пересоздаём
+            for bucket in self._buckets.values():
+                bucket.condition = asyncio.Condition()
+                bucket.waiters = []
+            self._loop = loop
+        bucket = self._buckets.get(resource)
+        if bucket is None:
+            authed, anonymous, window = DEFAULT_LIMITS.get(
+                resource, DEFAULT_LIMITS["core"])
+            limit = authed if self.authenticated else anonymous
+            bucket = self._buckets[resource] = _Bucket(limit, window)
+        return bucket
+
+    async def acquire(self, resource: str = "core",
+                      priority: int = 0) -> None:
+        """
+        Ожидает разрешения на отправку запроса.
+
+        Параметры:
+            resource (str): Ресурс лимита GitHub.
+            priority (int): Приоритет запроса; меньшее значение
+                обслуживается раньше.
+        """
+        bucket = self._bucket(resource)
+        entry = (priority, next(self._sequence))
+        started = time.monotonic()
+        async with bucket.condition:
+            heapq.heappush(bucket.waiters, entry)
+            try:
+                while True:
+                    if bucket.waiters[0] != entry:
+                        await bucket.condition.wait()
+                        continue
+                    delay = bucket.delay(self.reserve)
+                    if delay <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(bucket.condition.wait(), delay)
+                    except TimeoutError:
+                        pass
+            finally:
+                bucket.waiters.remove(entry)
+                heapq.heapify(bucket.waiters)
+                bucket.condition.notify_all()
+            bucket.take()
+        bucket.waited += time.monotonic() - started
+
+    async def refund(self, resource: str = "core") -> None:
+        """
+        Возвращает в запас запрос, который GitHub не учёл в лимите
+        (условный запрос с ответом 304), и будит ожидающих.
+        """
+        bucket = self._bucket(resource)
+        async with bucket.condition:
+            bucket.remaining = min(bucket.limit, bucket.remaining + 1)
+            bucket.condition.notify_all()
+
+    def update(self, resource: str, headers: dict[str, str]) -> None:
+        """Уточняет состояние лимита по заголовкам ответа GitHub."""
+        resource = headers.get("x-ratelimit-resource", resource)
+        try:
+            limit = int(headers["x-ratelimit-limit"])
+            remaining = int(headers["x-ratelimit-remaining"])
+            reset_at = float(headers["x-ratelimit-reset"])
+        except (KeyError, ValueError):
+            return
+        bucket = self._bucket(resource)
+        if reset_at > bucket.reset_at + 1:
+            # Началось новое окно лимита
+            bucket.remaining = remaining
+        else:
+            # Ответы могут приходить не по порядку — берём меньший остаток
+            bucket.remaining = min(bucket.remaining, remaining)
+        bucket.limit = limit
+        bucket.reset_at = reset_at
+
+    def throttle(self, resource: str, headers: dict[str, str]) -> None:
+        """
+        Приостанавливает ресурс после отказа по лимиту (403/429).
+
+        Учитывает Retry-After вторичных лимитов; последующие acquire()
+        дождутся окончания паузы.
+        """
+        bucket = self._bucket(headers.get("x-ratelimit-resource", resource))
+        bucket.throttled += 1
+        if headers.get("x-ratelimit-remaining") == "0":
+            bucket.remaining = 0
+        try:
+            delay = float(headers["retry-after"])
+        except (KeyError, ValueError):
+            # Вторичный лимит без подсказок: GitHub рекомендует
+            # подождать не меньше минуты
+            delay = 0.0 if bucket.remaining <= 0 else 60.0
+        bucket.blocked_until = max(bucket.blocked_until, time.time() + delay)
+
+    def headroom(self, resource: str = "core") -> int:
+        """Запас запросов с учётом уже ожидающих в очереди."""
+        bucket = self._buckets.get(resource)
+        if bucket is None:
+            return self.remaining(resource)
+        if time.time() < bucket.blocked_until:
+            return 0
+        if time.time() >= bucket.reset_at:
+            return bucket.limit - len(bucket.waiters)
+        return bucket.remaining - len(bucket.waiters)
+
+    def reset_at(self, resource: str = "core") -> float:
+        """Момент (unix time), когда ресурс снова станет доступен."""
+        bucket = self._buckets.get(resource)
+        if bucket is None:
+            return 0.0
+        if bucket.blocked_until > time.time():
+            return bucket.blocked_until
+        return bucket.reset_at
+
+    def remaining(self, resource: str = "core") -> int:
+        """Оставшийся запас запросов ресурса в текущем окне."""
+        bucket = self._buckets.get(resource)
+        if bucket is None:
+            authed, anonymous, _ = DEFAULT_LIMITS.get(
+                resource, DEFAULT_LIMITS["core"])
+            return authed if self.authenticated else anonymous
+        return bucket.remaining
+
+    def stats(self) -> dict:
+        """Счётчики по каждому ресурсу лимита."""
+        now = time.time()
+        return {
+            resource: {
+                "limit": bucket.limit,
+                "remaining": bucket.remaining,
+                "reset_in": max(0, round(bucket.reset_at - now)),
+                "requests": bucket.requests,
+                "waited_seconds": round(bucket.waited, 3),
+                "throttled": bucket.throttled,
+            }
+            for resource, bucket in self._buckets.items()
+        }
+
+
+def tokens_from_env() -> list[str]:
+    """
+    Читает токены GitHub из окружения: GITHUB_TOKENS (через запятую)
+    и/или GITHUB_TOKEN. Повторы отбрасываются.
+    """
+    tokens = [t.strip() for t in os.getenv("GITHUB_TOKENS", "").split(",")]
+    tokens.append(os.getenv("GITHUB_TOKEN", "").strip())
+    return list(dict.fromkeys(t for t in tokens if t))
+
+
+class TokenPool:
+    """
+    Пул токенов GitHub с автоматической ротацией.
+
+    Для каждого токена ведётся собственный RateLimiter. Запрос получает
+    токен с наибольшим запасом по нужному ресурсу; исчерпанные токены
+    пропускаются до сброса их лимита. Если исчерпаны все, выбирается
+    токен с самым ранним сбросом — запрос дождётся его в планировщике.
+
+    Параметры:
+        tokens (list[str]): Токены доступа. Пустой список означает
+            анонимный доступ.
+    """
+
+    def __init__(self, tokens: list[str]):
+        self.tokens: list[Optional[str]] = list(tokens) or [None]
+        self.limiters = [RateLimiter(authenticated=token is not None)
+                         for token in self.tokens]
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def choose(self, resource: str = "core"
+               ) -> tuple[Optional[str], RateLimiter]:
+        """Выбирает токен (и его планировщик) для очередного запроса."""
+        best = max(range(len(self.tokens)),
+                   key=lambda i: self.limiters[i].headroom(resource))
+        if self.limiters[best].headroom(resource) <= 0:
+            best = min(range(len(self.tokens)),
+                       key=lambda i: self.limiters[i].reset_at(resource))
+        return self.tokens[best], self.limiters[best]
+
+    def remaining(self, resource: str = "core") -> int:
+        """Суммарный запас запросов ресурса по всем токенам."""
+        return sum(limiter.remaining(resource) for limiter in self.limiters)
+
+    def stats(self) -> dict:
+        """
+        Счётчики по каждому токену (токены обозначаются порядковым
+        номером, а не значением) и суммарный запас по ресурсам.
+        """
+        per_token = {f"token_{num}": limiter.stats()
+                     for num, limiter in enumerate(self.limiters, start=1)}
+        resources = {r for stats in per_token.values() for r in stats}
+        return {
+            "tokens": len(self.tokens),
+            "remaining": {r: self.remaining(r) for r in sorted(resources)},
+            "per_token": per_token,
+        }
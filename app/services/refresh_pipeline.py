@@ -0,0 +1,364 @@
+"""
+Конвейер обновления активности: загрузка → агрегация → запись в БД.
+
+Стадии работают одновременно и связаны ограниченными очередями asyncio:
+
+- N загрузчиков читают курсор репозитория и постранично запрашивают
+  новые коммиты (iter_commit_pages), складывая страницы в очередь;
+- агрегатор сворачивает страницы в дневные счётчики (DailyAggregator),
+  сохраняя строки коммитов для таблицы commits, и передаёт готовые
+  репозитории писателю;
+- писатель собирает репозитории в пакеты и записывает каждый пакет
+  одной транзакцией (репозиторий — точка сохранения внутри неё).
+
+Заполненная очередь приостанавливает предыдущую стадию (backpressure),
+поэтому память ограничена размерами очередей. По каждой стадии ведётся
+статистика: число элементов, время работы, пропускная способность
+и глубина входной очереди — по ней видно, какая стадия узкое место.
+
+Конвейеру можно задать срок (deadline): загрузчики не берут новые
+репозитории, когда до срока остаётся меньше, чем нужно на обработку
+репозитория, а к самому сроку незавершённая работа отменяется.
+Необработанные репозитории возвращаются в skipped — их курсоры
+не сдвигались, и следующий запуск обработает их без потерь.
+
+Ошибка обработки страницы записывается в результат репозитория,
+не останавливая конвейер. Если же стадия всё-таки упала, остальные
+стадии отменяются (ожидание очередей иначе длилось бы вечно), ошибка
+попадает в отчёт (report), а незавершённые репозитории — в skipped.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+from app.db.connection import db
+from app.services.aggregation import DailyAggregator
+from app.services.github_client import GitHubClient, get_github_client
+from app.services.github_parser import (_iso, iter_commit_pages,
+                                        load_sync_window,
+                                        write_synced_commits)
+
+# Ёмкость очередей между стадиями (страниц и готовых репозиториев)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "50"))
+# Сколько репозиториев записывать одной транзакцией
+PIPELINE_WRITE_BATCH = int(os.getenv("PIPELINE_WRITE_BATCH", "10"))
+# Не начинать новый репозиторий, если до срока осталось меньше стольких
+# секунд (или меньше, чем занял самый долгий репозиторий запуска)
+REFRESH_REPO_RESERVE = float(os.getenv("REFRESH_REPO_RESERVE", "20"))
+
+
+class StageStats:
+    """Статистика одной стадии конвейера."""
+
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.max_depth = 0
+        self._depth_total = 0
+        self._samples = 0
+
+    def sample(self, queue: asyncio.Queue) -> None:
+        """Запоминает текущую глубину входной очереди стадии."""
+        depth = queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_total += depth
+        self._samples += 1
+
+    def as_dict(self, elapsed: float) -> dict:
+        capacity = elapsed * self.workers
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_seconds": round(self.busy, 3),
+            "items_per_second": round(self.items / self.busy, 1)
+            if self.busy else 0.0,
+            "utilization": round(self.busy / capacity, 3)
+            if capacity else 0.0,
+            "queue_max": self.max_depth,
+            "queue_avg": round(self._depth_total / self._samples, 2)
+            if self._samples else 0.0,
+        }
+
+
+class RefreshPipeline:
+    """
+    Конвейер инкрементальной синхронизации активности (REST-путь).
+
+    Семантика курсоров и записи та же, что у sync_activity_in_db.
+
+    Параметры:
+        fetch_workers (int): Число параллельных загрузчиков.
+        queue_size (int): Ёмкость очередей между стадиями.
+        write_batch (int): Сколько репозиториев писать одной транзакцией.
+        client (Optional[GitHubClient]): Клиент GitHub API. По умолчанию
+            используется общий клиент процесса.
+        deadline (Optional[float]): Срок по часам time.monotonic(),
+            к которому конвейер должен завершиться. None — без срока.
+        reserve (float): Минимальный запас времени для начала обработки
+            нового репозитория, секунд.
+
+    Атрибуты:
+        skipped (list[tuple[str, str, int]]): Репозитории, которые
+            не успели обработать до срока: сначала не начатые в исходном
+            порядке, затем прерванные сроком на середине загрузки или
+            записи. Так репозиторий, не укладывающийся в один вызов,
+            не задерживает остальные в следующем.
+        failure (Optional[str]): Ошибка упавшей стадии последнего
+            запуска или None.
+    """
+
+    def __init__(
+        self,
+        fetch_workers: int,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        write_batch: int = PIPELINE_WRITE_BATCH,
+        client: Optional[GitHubClient] = None,
+        deadline: Optional[float] = None,
+        reserve: float = REFRESH_REPO_RESERVE
+    ):
+        self.fetch_workers = max(1, fetch_workers)
+        self.deadline = deadline
+        self.reserve = reserve
+        self.skipped: list[tuple[str, str, int]] = []
+        self.failure: Optional[str] = None
+        # Репозитории, загрузка которых начата в текущем запуске
+        self._started: set[tuple[str, str]] = set()
+        # Самое долгое время загрузки одного репозитория в этом запуске
+        self._slowest = 0.0
+        self.queue_size = queue_size
+        self.write_batch = max(1, write_batch)
+        self.client = client or get_github_client()
+        self.stats = {
+            "fetch": StageStats("fetch", self.fetch_workers),
+            "aggregate": StageStats("aggregate"),
+            "write": StageStats("write"),
+        }
+        self.elapsed = 0.0
+
+    async def run(
+        self,
+        repos: list[tuple[str, str, int]],
+        default_since: datetime,
+        until: datetime
+    ) -> dict[tuple[str, str], dict]:
+        """
+        Синхронизирует активность репозиториев.
+
+        Параметры:
+            repos (list[tuple[str, str, int]]): Тройки (owner, repo,
+            priority) в порядке обработки.
+            default_since (datetime): Начало периода для репозиториев
+            без курсора (UTC).
+            until (datetime): Конец периода (UTC), новое значение курсоров.
+
+        Возвращает:
+            dict: Для каждой пары (owner, repo) — {'days', 'commits'}
+            либо {'error': str} при сбое. Репозиториев из skipped
+            в нём нет.
+        """
+        until = until.replace(microsecond=0)
+        self.results: dict[tuple[str, str], dict] = {}
+        self.failure = None
+        self._started = set()
+        repo_queue: asyncio.Queue = asyncio.Queue()
+        for item in repos:
+            repo_queue.put_nowait(item)
+        page_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        started = time.monotonic()
+        fetchers = [
+            asyncio.create_task(self._fetch(repo_queue, page_queue,
+                                            default_since, until))
+            for _ in range(self.fetch_workers)
+        ]
+        closer = asyncio.create_task(self._close(fetchers, page_queue))
+        aggregator = asyncio.create_task(
+            self._aggregate(page_queue, write_queue))
+        writer = asyncio.create_task(self._write(write_queue, until))
+        stages = [*fetchers, closer, aggregator, writer]
+        try:
+            async with asyncio.timeout_at(self._loop_deadline()):
+                done, _ = await asyncio.wait(
+                    stages, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    e = task.exception()
+                    self.failure = f"{type(e).__name__}: {e}"
+                    break
+        except TimeoutError:
+            # Срок истёк: незаписанные репозитории пропускаются,
+            # записанные пакеты уже зафиксированы
+            pass
+        finally:
+            for task in stages:
+                task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+        unfinished = [item for item in repos
+                      if (item[0], item[1]) not in self.results]
+        self.skipped = [item for item in unfinished
+                        if (item[0], item[1]) not in self._started] \
+            + [item for item in unfinished
+               if (item[0], item[1]) in self._started]
+        self.elapsed = time.monotonic() - started
+        return self.results
+
+    @staticmethod
+    async def _close(fetchers: list[asyncio.Task],
+                     page_queue: asyncio.Queue) -> None:
+        """Закрывает очередь страниц, когда все загрузчики завершились."""
+        await asyncio.gather(*fetchers)
+        await page_queue.put(None)
+
+    def _loop_deadline(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        loop = asyncio.get_running_loop()
+        return loop.time() + (self.deadline - time.monotonic())
+
+    def _out_of_time(self) -> bool:
+        """Не хватает времени, чтобы начать ещё один репозиторий."""
+        if self.deadline is None:
+            return False
+        left = self.deadline - time.monotonic()
+        return left < max(self.reserve, self._slowest)
+
+    async def _fetch(self, repo_queue: asyncio.Queue,
+                     page_queue: asyncio.Queue,
+                     default_since: datetime, until: datetime) -> None:
+        stats = self.stats["fetch"]
+        while not self._out_of_time():
+            try:
+                owner, repo, priority = repo_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            stats.sample(repo_queue)
+            key = (owner, repo)
+            self._started.add(key)
+            repo_started = time.monotonic()
+            try:
+                mark = time.monotonic()
+                cursor, since = await load_sync_window(owner, repo,
+                                                       default_since, until)
+                stats.busy += time.monotonic() - mark
+                if since is not None:
+                    pages = iter_commit_pages(self.client, owner, repo,
+                                              _iso(since), _iso(until),
+                                              priority)
+                    mark = time.monotonic()
+                    async for page in pages:
+                        stats.busy += time.monotonic() - mark
+                        # Ожидание места в очереди — это backpressure,
+                        # а не работа стадии
+                        await page_queue.put(("page", key, page))
+                        mark = time.monotonic()
+                    stats.busy += time.monotonic() - mark
+                await page_queue.put(("done", key, (cursor, since)))
+            except Exception as e:
+                await page_queue.put(("error", key,
+                                      f"{type(e).__name__}: {e}"))
+            stats.items += 1
+            self._slowest = max(self._slowest,
+                                time.monotonic() - repo_started)
+
+    async def _aggregate(self, page_queue: asyncio.Queue,
+                         write_queue: asyncio.Queue) -> None:
+        stats = self.stats["aggregate"]
+        aggregators: dict[tuple[str, str], DailyAggregator] = {}
+        # Ошибки агрегации: остальные страницы репозитория пропускаются,
+        # а курсор не сдвигается
+        failed: dict[tuple[str, str], str] = {}
+        while True:
+            message = await page_queue.get()
+            stats.sample(page_queue)
+            if message is None:
+                await write_queue.put(None)
+                return
+            kind, key, payload = message
+            mark = time.monotonic()
+            if kind == "page":
+                if key not in failed:
+                    aggregator = aggregators.get(key)
+                    if aggregator is None:
+                        aggregator = aggregators[key] = DailyAggregator(
+                            keep_commits=True)
+                    try:
+                        aggregator.add_page(payload)
+                    except Exception as e:
+                        failed[key] = f"{type(e).__name__}: {e}"
+                        aggregators.pop(key, None)
+                stats.items += 1
+                stats.busy += time.monotonic() - mark
+                continue
+            aggregator = aggregators.pop(key, None) \
+                or DailyAggregator(keep_commits=True)
+            stats.busy += time.monotonic() - mark
+            if key in failed:
+                self.results[key] = {"error": failed.pop(key)}
+                continue
+            if kind == "error":
+                self.results[key] = {"error": payload}
+                continue
+            cursor, since = payload
+            if since is None:
+                self.results[key] = {"days": 0, "commits": 0}
+                continue
+            await write_queue.put((key, cursor, aggregator))
+
+    async def _write(self, write_queue: asyncio.Queue,
+                     until: datetime) -> None:
+        stats = self.stats["write"]
+        finished = False
+        while not finished:
+            item = await write_queue.get()
+            stats.sample(write_queue)
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.write_batch or write_queue.empty():
+                    break
+                item = write_queue.get_nowait()
+            finished = item is None
+            if batch:
+                mark = time.monotonic()
+                await self._write_batch(batch, until)
+                stats.busy += time.monotonic() - mark
+                stats.items += len(batch)
+
+    async def _write_batch(self, batch: list, until: datetime) -> None:
+        """Записывает пакет репозиториев одной транзакцией."""
+        written = {}
+        try:
+            async with db.connect_to_pool() as connection:
+                async with connection.transaction():
+                    for (owner, repo), cursor, aggregator in batch:
+                        try:
+                            written[(owner, repo)] = \
+                                await write_synced_commits(
+                                    connection, owner, repo, cursor,
+                                    until, aggregator)
+                        except Exception as e:
+                            written[(owner, repo)] = {
+                                "error": f"{type(e).__name__}: {e}"}
+        except Exception as e:
+            written = {(owner, repo): {"error": f"{type(e).__name__}: {e}"}
+                       for (owner, repo), _, _ in batch}
+        # Итоги публикуются только после фиксации транзакции: если запись
+        # прервана сроком, репозитории пакета попадут в skipped
+        self.results.update(written)
+
+    def report(self) -> dict:
+        """Статистика стадий за последний запуск."""
+        report = {
+            "seconds": round(self.elapsed, 3),
+            "stages": {name: stage.as_dict(self.elapsed)
+                       for name, stage in self.stats.items()},
+        }
+        if self.failure is not None:
+            report["failure"] = self.failure
+        return report
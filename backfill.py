@@ -0,0 +1,205 @@
+"""
+Скрипт исторической загрузки активности репозиториев.
+
+Заполняет таблицу activity за произвольный период [since, until] для
+выбранных репозиториев (по умолчанию — для всех из top100):
+- период делится на окна по несколько дней;
+- окна загружаются конкурентно, а запросы к GitHub проходят через общий
+  планировщик лимитов;
+- каждое завершённое окно фиксируется в таблице backfill_progress, поэтому
+  прерванное задание (например, по таймауту функции) при повторном запуске
+  с тем же именем продолжается с места остановки.
+
+Пример:
+    python backfill.py --since 2024-01-01 --until 2024-06-30 \
+        --repos facebook/react torvalds/linux --job react-linux-2024h1
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import date, timedelta
+
+from app.db.connection import db
+from app.db.migrations import migrate
+from app.db.partitions import ensure_activity_partitions
+from app.repositories.crud import get_finished_backfill_windows
+from app.services.github_client import close_github_client
+from app.services.github_parser import backfill_window_in_db
+
+BACKFILL_WINDOW_DAYS = int(os.getenv("BACKFILL_WINDOW_DAYS", "7"))
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "10"))
+
+
+def split_windows(since: date, until: date,
+                  window_days: int) -> list[tuple[date, date]]:
+    """Делит период [since, until] на окна не длиннее window_days дней."""
+    windows = []
+    start = since
+    while start <= until:
+        end = min(start + timedelta(days=window_days - 1), until)
+        windows.append((start, end))
+        start = end + timedelta(days=1)
+    return windows
+
+
+async def load_windows(
+    job: str,
+    repos: list[tuple[str, str]],
+    since: date,
+    until: date,
+    window_days: int
+) -> tuple[list[tuple[str, str, date, date]], int]:
+    """
+    Формирует список незавершённых окон задания.
+
+    Возвращает:
+        tuple: (окна к загрузке в виде (owner, repo, start, end),
+        число окон, завершённых ранее).
+    """
+    async with db.connect_to_pool() as conn:
+        finished = await get_finished_backfill_windows(conn, job)
+
+    pending = []
+    for owner, repo in repos:
+        for start, end in split_windows(since, until, window_days):
+            if (owner, repo, start) not in finished:
+                pending.append((owner, repo, start, end))
+    total = len(repos) * len(split_windows(since, until, window_days))
+    return pending, total - len(pending)
+
+
+async def run_backfill(
+    job: str,
+    since: date,
+    until: date,
+    repos: list[tuple[str, str]] | None = None,
+    window_days: int = BACKFILL_WINDOW_DAYS,
+    concurrency: int = BACKFILL_CONCURRENCY
+) -> dict:
+    """
+    Выполняет (или продолжает) задание исторической загрузки.
+
+    Параметры:
+        job (str): Имя задания; по нему ищутся завершённые окна.
+        since (date): Первый день периода.
+        until (date): Последний день периода (включительно).
+        repos (Optional[list[tuple[str, str]]]): Пары (owner, repo).
+        По умолчанию — все репозитории из top100.
+        window_days (int): Длина окна в днях.
+        concurrency (int): Сколько окон загружается одновременно.
+
+    Возвращает:
+        dict: Отчёт о загрузке: число окон (всего, пропущенных как
+        завершённые, загруженных, с ошибкой), число коммитов, время
+        и пропускная способность в коммитах в секунду.
+    """
+    if repos is None:
+        async with db.connect_to_pool() as conn:
+            records = await conn.fetch(
+                "SELECT owner, repo FROM top100 ORDER BY position_cur")
+        repos = [(r["owner"], r["repo"].split("/", 1)[1]) for r in records]
+
+    await ensure_activity_partitions(since, until)
+    pending, skipped = await load_windows(job, repos, since, until,
+                                          window_days)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    errors: dict[str, str] = {}
+
+    async def run_window(priority: int, owner: str, repo: str,
+                         start: date, end: date) -> int:
+        async with semaphore:
+            try:
+                stats = await backfill_window_in_db(job, owner, repo,
+                                                    start, end,
+                                                    priority=priority)
+                return stats["commits"]
+            except Exception as e:
+                errors[f"{owner}/{repo}@{start.isoformat()}"] = \
+                    f"{type(e).__name__}: {e}"
+                return 0
+
+    started = time.monotonic()
+    commits = await asyncio.gather(*(
+        run_window(priority, *window)
+        for priority, window in enumerate(pending)
+    ))
+    elapsed = time.monotonic() - started
+    total_commits = sum(commits)
+
+    return {
+        "job": job,
+        "windows": skipped + len(pending),
+        "skipped": skipped,
+        "done": len(pending) - len(errors),
+        "failed": len(errors),
+        "commits": total_commits,
+        "seconds": round(elapsed, 3),
+        "commits_per_second": round(total_commits / elapsed, 1)
+        if elapsed else 0.0,
+        "errors": errors,
+    }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    """Подключается к БД, выполняет загрузку и закрывает соединения."""
+    repos = [tuple(name.split("/", 1)) for name in args.repos] \
+        if args.repos else None
+    await db.connect()
+    try:
+        await migrate()
+        return await run_backfill(args.job, args.since, args.until, repos,
+                                  args.window_days, args.concurrency)
+    finally:
+        await close_github_client()
+        await db.disconnect()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Историческая загрузка активности репозиториев")
+    parser.add_argument("--since", type=date.fromisoformat, required=True,
+                        help="Первый день периода (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, required=True,
+                        help="Последний день периода (YYYY-MM-DD)")
+    parser.add_argument("--repos", nargs="*",
+                        help="Репозитории owner/repo (по умолчанию top100)")
+    parser.add_argument("--job",
+                        help="Имя задания для продолжения после прерывания "
+                             "(по умолчанию backfill-<since>-<until>)")
+    parser.add_argument("--window-days", type=int,
+                        default=BACKFILL_WINDOW_DAYS)
+    parser.add_argument("--concurrency", type=int,
+                        default=BACKFILL_CONCURRENCY)
+    args = parser.parse_args()
+    if args.since > args.until:
+        parser.error("--since не может быть больше --until")
+    if args.job is None:
+        args.job = f"backfill-{args.since}-{args.until}"
+    return args
+
+
+def handler(event, context):
+    """
+    Хэндлер для Яндекс.Функции.
+
+    Ожидает в event поля since, until (YYYY-MM-DD) и, необязательно,
+    repos (список owner/repo), job, window_days, concurrency. При таймауте
+    функции достаточно повторить вызов с тем же job.
+    """
+    args = argparse.Namespace(
+        since=date.fromisoformat(event["since"]),
+        until=date.fromisoformat(event["until"]),
+        repos=event.get("repos"),
+        job=event.get("job") or f"backfill-{event['since']}-{event['until']}",
+        window_days=int(event.get("window_days", BACKFILL_WINDOW_DAYS)),
+        concurrency=int(event.get("concurrency", BACKFILL_CONCURRENCY)),
+    )
+    report = asyncio.run(main(args))
+    return {"status": "ok", "report": report}
+
+
+if __name__ == "__main__":
+    report = asyncio.run(main(parse_args()))
+    for key, value in report.items():
+        print(f"{key}: {value}")
@@ -0,0 +1,215 @@
+"""
+Замер секционирования таблицы activity на большом объёме.
+
+В отдельной схеме bench_partitions строятся две таблицы с одинаковыми
+синтетическими данными (по умолчанию 50 000 репозиториев × 2000 дней =
+100 млн строк), записанными по дням, как при ежедневном обновлении:
+- activity_flat — обычная таблица с уникальным индексом
+  (owner, repo, date);
+- activity — секционированная по месяцам, как после миграции 3
+  (секции создаются create_activity_partitions).
+
+Для случайных репозиториев и периодов выполняется запрос
+fetch_repo_activity (REPO_ACTIVITY_QUERY). По EXPLAIN (ANALYZE, BUFFERS)
+выводятся медианы времени выполнения и прочитанных буферов и число
+просмотренных секций, отдельно — медиана времени самого запроса через
+подготовленный оператор. Затем в откатываемой транзакции сравнивается
+удаление старейшего месяца: DELETE из activity_flat против
+отсоединения и удаления секции.
+
+Таблицы заполняются один раз и переиспользуются при следующих запусках
+с теми же --repos и --days; --drop удаляет схему после замера.
+Замер не трогает рабочие таблицы, но занимает место в БД (DB_*) —
+около 15 ГБ на 100 млн строк для обеих таблиц.
+
+Запуск:
+    python -m benchmarks.activity_partitions --repos 50000 --days 2000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+import asyncpg  # type: ignore
+
+from app.db.connection import DATABASE_URL
+from app.db.partitions import add_months
+from app.repositories.crud import (REPO_ACTIVITY_QUERY,
+                                   create_activity_partitions,
+                                   drop_activity_partitions)
+
+SCHEMA = "bench_partitions"
+START = date(2019, 1, 1)
+
+_COLUMNS = """
+    owner TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    date DATE NOT NULL,
+    commits INTEGER NOT NULL,
+    authors TEXT[] NOT NULL DEFAULT '{}'
+"""
+
+
+async def _step(title: str, action) -> None:
+    started = time.perf_counter()
+    print(f"{title}...", end=" ", flush=True)
+    await action
+    print(f"{time.perf_counter() - started:.1f} с", flush=True)
+
+
+async def _prepare(connection: asyncpg.Connection, repos: int,
+                   days: int) -> None:
+    """Заполняет обе таблицы, если они ещё не построены для repos×days."""
+    built = await connection.fetchval(
+        "SELECT to_regclass('bench_meta') IS NOT NULL")
+    if built and await connection.fetchval(
+            "SELECT count(*) FROM bench_meta WHERE repos = $1 AND days = $2",
+            repos, days):
+        return
+
+    await connection.execute(
+        f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+    await connection.execute(f"CREATE TABLE activity_flat ({_COLUMNS})")
+    # Дни во внешнем цикле: строки лежат в порядке ежедневной записи
+    await _step(f"Заполнение activity_flat ({repos * days:,} строк)",
+                connection.execute(
+                    """
+                    INSERT INTO activity_flat
+                    SELECT 'owner' || r, 'repo' || r, $1::date + d,
+                           (r * 7 + d) % 20 + 1,
+                           ARRAY['author' || (r + d) % 5]
+                    FROM generate_series(0, $3 - 1) d,
+                         LATERAL generate_series(0, $2 - 1) r
+                    """,
+                    START, repos, days))
+    await _step("Индекс activity_flat", connection.execute(
+        "CREATE UNIQUE INDEX activity_flat_key "
+        "ON activity_flat (owner, repo, date)"))
+
+    await connection.execute(
+        f"""
+        CREATE TABLE activity ({_COLUMNS}) PARTITION BY RANGE (date);
+        CREATE TABLE activity_default PARTITION OF activity DEFAULT;
+        """
+    )
+    await create_activity_partitions(connection, START,
+                                     START + timedelta(days=days - 1))
+    await _step("Заполнение activity", connection.execute(
+        "INSERT INTO activity SELECT * FROM activity_flat"))
+    await _step("Индекс activity", connection.execute(
+        "CREATE UNIQUE INDEX activity_key ON activity (owner, repo, date)"))
+    await _step("ANALYZE", connection.execute(
+        "ANALYZE activity_flat; ANALYZE activity"))
+    await connection.execute(
+        "CREATE TABLE bench_meta (repos INTEGER, days INTEGER)")
+    await connection.execute("INSERT INTO bench_meta VALUES ($1, $2)",
+                             repos, days)
+
+
+def _relations(plan: dict) -> set[str]:
+    names = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= _relations(child)
+    return names
+
+
+async def _measure(connection: asyncpg.Connection, table: str,
+                   cases: list[tuple]) -> dict:
+    query = REPO_ACTIVITY_QUERY.replace("FROM activity", f"FROM {table}")
+    executions, buffers, scanned, fetches = [], [], [], []
+    for args in cases:
+        result = json.loads(await connection.fetchval(
+            f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", *args))[0]
+        plan = result["Plan"]
+        executions.append(result["Execution Time"])
+        buffers.append(plan["Shared Hit Blocks"] + plan["Shared Read Blocks"])
+        scanned.append(len(_relations(plan)))
+    for args in cases:
+        started = time.perf_counter()
+        await connection.fetch(query, *args)
+        fetches.append((time.perf_counter() - started) * 1000)
+    return {
+        "execution_ms": round(statistics.median(executions), 3),
+        "fetch_ms": round(statistics.median(fetches), 3),
+        "buffers": statistics.median(buffers),
+        "relations": max(scanned),
+    }
+
+
+async def _retention(connection: asyncpg.Connection) -> dict:
+    """Удаление старейшего месяца в откатываемых транзакциях, мс."""
+    results = {}
+    for name in ("activity_flat", "activity"):
+        transaction = connection.transaction()
+        await transaction.start()
+        try:
+            started = time.perf_counter()
+            if name == "activity":
+                await drop_activity_partitions(
+                    connection, add_months(START, 1), drop=True)
+            else:
+                await connection.execute(
+                    "DELETE FROM activity_flat WHERE date < $1",
+                    add_months(START, 1))
+            results[name] = round((time.perf_counter() - started) * 1000, 1)
+        finally:
+            await transaction.rollback()
+    return results
+
+
+async def run(repos: int, days: int, queries: int, window_days: int,
+              drop: bool) -> dict:
+    connection = await asyncpg.connect(
+        DATABASE_URL, server_settings={"search_path": SCHEMA})
+    try:
+        await connection.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+        await _prepare(connection, repos, days)
+        rng = random.Random(0)
+        cases = []
+        for _ in range(queries):
+            num = rng.randrange(repos)
+            since = START + timedelta(
+                days=rng.randrange(max(1, days - window_days)))
+            cases.append((f"owner{num}", f"repo{num}", since,
+                          since + timedelta(days=window_days - 1)))
+        report = {table: await _measure(connection, table, cases)
+                  for table in ("activity_flat", "activity")}
+        report["retention_ms"] = await _retention(connection)
+        return report
+    finally:
+        if drop:
+            await connection.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+        await connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repos", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--window-days", type=int, default=30)
+    parser.add_argument("--drop", action="store_true",
+                        help="Удалить схему замера после запуска")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.repos, args.days, args.queries,
+                             args.window_days, args.drop))
+    print(f"Строк: {args.repos * args.days:,}, запросов: {args.queries}, "
+          f"период: {args.window_days} дн.")
+    for table in ("activity_flat", "activity"):
+        result = report[table]
+        print(f"{table:14} выполнение: {result['execution_ms']:8.3f} мс  "
+              f"запрос: {result['fetch_ms']:8.3f} мс  "
+              f"буферов: {result['buffers']:6}  "
+              f"таблиц в плане: {result['relations']}")
+    retention = report["retention_ms"]
+    print(f"Удаление месяца: DELETE {retention['activity_flat']} мс, "
+          f"секция {retention['activity']} мс")
+
+
+if __name__ == "__main__":
+    main()
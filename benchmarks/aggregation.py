@@ -0,0 +1,117 @@
+"""
+Микробенчмарк агрегации коммитов.
+
+Сравнивается прежний способ (datetime.fromisoformat на каждый коммит,
+ключ-строка 'YYYY-MM-DD' и обратный разбор strptime при записи в БД)
+с CommitAggregator для всех периодов агрегации и для часового пояса,
+отличного от UTC.
+
+Синтетические коммиты берутся из пула и подаются страницами по 100,
+как при загрузке из GitHub, — так миллионы коммитов не занимают память.
+
+Запуск:
+    python -m benchmarks.aggregation --commits 2000000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app.services.aggregation import (COMMITTER_DATE, DAY, GRANULARITIES,
+                                      CommitAggregator)
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+PAGE_SIZE = 100
+POOL_SIZE = 100_000
+
+
+def _make_pool(size: int) -> list[dict]:
+    """Коммиты раз в 7 минут (~16 месяцев истории), 50 авторов."""
+    pool = []
+    for num in range(size):
+        moment = (START + timedelta(minutes=7 * num)).strftime(
+            "%Y-%m-%dT%H:%M:%SZ")
+        pool.append({
+            "sha": f"{num:040x}",
+            "commit": {
+                "author": {"name": f"author{num % 50}", "date": moment},
+                "committer": {"name": "GitHub", "date": moment},
+            },
+        })
+    return pool
+
+
+def _pages(pool: list[dict], total: int):
+    sent = 0
+    while sent < total:
+        for start in range(0, len(pool), PAGE_SIZE):
+            size = min(PAGE_SIZE, total - sent)
+            if size <= 0:
+                return
+            yield pool[start:start + size]
+            sent += size
+
+
+def _legacy(pages) -> int:
+    """Прежний путь: aggregate_commits_by_day + strptime при записи."""
+    days: dict[str, dict] = {}
+    for page in pages:
+        for c in page:
+            commit_date_str = c['commit']['author']['date']
+            commit_date = datetime.fromisoformat(
+                commit_date_str.replace('Z', '+00:00'))
+            day_str = commit_date.date().isoformat()
+
+            author_name = "Unknown"
+            if c['commit']['author'] and 'name' in c['commit']['author']:
+                author_name = c['commit']['author']['name']
+
+            if day_str not in days:
+                days[day_str] = {'commits': 0, 'authors': set()}
+            days[day_str]['commits'] += 1
+            days[day_str]['authors'].add(author_name)
+    for day_str in days:
+        datetime.strptime(day_str, "%Y-%m-%d").date()
+    return len(days)
+
+
+def _engine(**options):
+    def run(pages) -> int:
+        aggregator = CommitAggregator(**options)
+        for page in pages:
+            aggregator.add_page(page)
+        return len(aggregator.buckets)
+    return run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--commits", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    pool = _make_pool(min(POOL_SIZE, args.commits))
+    cases = [("прежний (день, UTC)", _legacy)]
+    cases += [(f"{name}, UTC", _engine(granularity=name))
+              for name in GRANULARITIES]
+    cases.append(("day, Europe/Moscow", _engine(
+        granularity=DAY, tz=ZoneInfo("Europe/Moscow"))))
+    cases.append(("day, Asia/Kolkata", _engine(
+        granularity=DAY, tz=ZoneInfo("Asia/Kolkata"))))
+    cases.append(("day, дата коммиттера", _engine(
+        granularity=DAY, date_field=COMMITTER_DATE)))
+
+    print(f"Коммитов: {args.commits}")
+    baseline = None
+    for name, func in cases:
+        started = time.perf_counter()
+        buckets = func(_pages(pool, args.commits))
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        rate = args.commits / elapsed / 1e6
+        print(f"{name:24} периодов: {buckets:5}  {elapsed:6.2f} с  "
+              f"{rate:5.2f} млн/с  x{baseline / elapsed:4.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Замер накладных расходов клиента GitHub API: до и после перехода
+с GhApi на общий асинхронный клиент.
+
+Измеряется:
+- стоимость создания клиента (GhApi() на каждый fetch_commits против
+  get_github_client(), который строит клиент один раз);
+- накладные расходы одного вызова list_commits против локального
+  HTTP-сервера, т.е. без сетевой задержки GitHub.
+
+Запуск:
+    PYTHONPATH=dependencies python -m benchmarks.client_overhead
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services import github_client
+from app.services.github_client import GitHubClient, get_github_client
+
+try:
+    from ghapi.all import GhApi  # type: ignore
+except ImportError:
+    GhApi = None
+
+PAYLOAD = json.dumps([]).encode()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело уходят одним пакетом, иначе замер искажает
+    # задержка подтверждения TCP (~40 мс на вызов)
+    wbufsize = 65536
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+def _per_op_us(total: float, count: int) -> str:
+    return f"{total / count * 1e6:10.1f} мкс"
+
+
+def bench_construction(count: int) -> None:
+    if GhApi is not None:
+        start = time.perf_counter()
+        for _ in range(count):
+            GhApi()
+        elapsed = time.perf_counter() - start
+        print(f"GhApi()                 {_per_op_us(elapsed, count)}")
+
+    start = time.perf_counter()
+    for _ in range(count):
+        GitHubClient()
+    elapsed = time.perf_counter() - start
+    print(f"GitHubClient()          {_per_op_us(elapsed, count)}")
+
+    github_client._client = None
+    start = time.perf_counter()
+    for _ in range(count):
+        get_github_client()
+    elapsed = time.perf_counter() - start
+    print(f"get_github_client()     {_per_op_us(elapsed, count)}")
+
+
+def bench_calls(base_url: str, count: int) -> None:
+    if GhApi is not None:
+        # Прежнее поведение: новый GhApi на каждый репозиторий
+        start = time.perf_counter()
+        for _ in range(count):
+            GhApi(gh_host=base_url).repos.list_commits("o", "r", per_page=100)
+        elapsed = time.perf_counter() - start
+        print(f"GhApi per call          {_per_op_us(elapsed, count)}")
+
+    async def run() -> float:
+        client = GitHubClient(base_url=base_url)
+        start = time.perf_counter()
+        for _ in range(count):
+            await client.list_commits("o", "r", per_page=100)
+        elapsed = time.perf_counter() - start
+        await client.close()
+        return elapsed
+
+    print(f"GitHubClient per call   {_per_op_us(asyncio.run(run()), count)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--constructions", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    if GhApi is None:
+        print("ghapi не установлен — замеры «до» пропущены")
+    print("Создание клиента:")
+    bench_construction(args.constructions)
+    print("Вызов list_commits:")
+    bench_calls(base_url, args.calls)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
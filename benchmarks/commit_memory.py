@@ -0,0 +1,141 @@
+"""
+Замер пикового расхода памяти при загрузке и агрегации коммитов.
+
+Сравниваются два способа для одного «большого» репозитория:
+- fetch_commits + aggregate_commits_by_day — все страницы собираются
+  в один список, затем агрегируются;
+- aggregate_commit_pages — страницы сворачиваются в дневные счётчики
+  по мере загрузки и сразу отбрасываются;
+- aggregate_commit_pages с keep_commits — то же, но со строками коммитов
+  для таблицы commits (так загружают обновления).
+
+Заглушка GitHub API запускается в отдельном процессе, чтобы её память
+не попадала в замер (tracemalloc).
+
+Запуск:
+    PYTHONPATH=dependencies python -m benchmarks.commit_memory --commits 50000
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from app.services.github_client import GitHubClient
+from app.services.github_parser import (aggregate_commit_pages,
+                                        aggregate_commits_by_day,
+                                        fetch_commits)
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _make_commit(num: int) -> dict:
+    """Синтетический коммит, по объёму близкий к ответу GitHub."""
+    moment = (START + timedelta(minutes=7 * num)).strftime(
+        "%Y-%m-%dT%H:%M:%SZ")
+    person = {"name": f"author{num % 50}",
+              "email": f"author{num % 50}@example.com", "date": moment}
+    return {
+        "sha": f"{num:040x}",
+        "node_id": "C_" + "x" * 60,
+        "commit": {"author": person, "committer": person,
+                   "message": "Commit message " * 20,
+                   "tree": {"sha": "0" * 40, "url": "https://x" * 10}},
+        "url": "https://api.github.com/repos/o/r/commits/" + "0" * 40,
+        "html_url": "https://github.com/o/r/commit/" + "0" * 40,
+        "author": {"login": f"author{num % 50}", "id": num,
+                   "avatar_url": "https://avatars.example.com/" + "a" * 40},
+        "parents": [{"sha": "0" * 40, "url": "https://x" * 10}],
+    }
+
+
+def _serve(total: int, port_queue: multiprocessing.Queue) -> None:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        wbufsize = 65536
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            query = parse_qs(urlsplit(self.path).query)
+            page = int(query["page"][0])
+            per_page = int(query["per_page"][0])
+            last = max(1, -(-total // per_page))
+            start = (page - 1) * per_page
+            body = json.dumps([_make_commit(n) for n in range(
+                start, min(start + per_page, total))]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header(
+                "Link", f'<{self.path.split("?")[0]}?per_page={per_page}'
+                        f'&page={last}>; rel="last"')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+async def _collect(client: GitHubClient) -> int:
+    commits = await fetch_commits(client, "o", "r", "a", "b")
+    return len(aggregate_commits_by_day(commits))
+
+
+async def _stream(client: GitHubClient) -> int:
+    aggregator = await aggregate_commit_pages(client, "o", "r", "a", "b")
+    return len(aggregator.days)
+
+
+async def _stream_rows(client: GitHubClient) -> int:
+    aggregator = await aggregate_commit_pages(client, "o", "r", "a", "b",
+                                              keep_commits=True)
+    return len(aggregator.days)
+
+
+def _measure(base_url: str, func) -> tuple[int, float]:
+    async def run() -> int:
+        # Фиктивный токен: лимит анонимного доступа исказил бы замер
+        client = GitHubClient(base_url=base_url, tokens=["benchmark"])
+        try:
+            return await func(client)
+        finally:
+            await client.close()
+
+    tracemalloc.start()
+    days = asyncio.run(run())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return days, peak / 2 ** 20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--commits", type=int, default=20000)
+    args = parser.parse_args()
+
+    port_queue: multiprocessing.Queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve,
+                                     args=(args.commits, port_queue),
+                                     daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port_queue.get()}"
+
+    print(f"Коммитов: {args.commits}")
+    for name, func in (("список + агрегация", _collect),
+                       ("потоковая агрегация", _stream),
+                       ("потоковая + строки", _stream_rows)):
+        days, peak = _measure(base_url, func)
+        print(f"{name:22} дней: {days:5}  пик памяти: {peak:8.1f} МБ")
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,520 @@
+"""
+Локальная замена GitHub API для замеров и регрессионных проверок.
+
+Обслуживает эндпоинты, которыми пользуется update_data:
+- GET /search/repositories — синтетический топ по звёздам;
+- GET /repos/{owner}/{repo}/commits — история коммитов с фильтром
+  since/until (включительно) и постраничной выдачей;
+- POST /graphql — история ветки по умолчанию в запросах вида
+  github_graphql.build_history_query: repository(owner, name) под
+  псевдонимами, history(since, until, first, after) с курсорами.
+
+Данные детерминированы: репозиторий с номером N и его коммиты зависят
+только от seed. Коммиты идут с постоянным для репозитория интервалом,
+поэтому выдача любого периода вычисляется без хранения истории.
+
+Ответы, как у GitHub, содержат заголовки Link (next/last), ETag
+(с ответом 304 на If-None-Match, не расходующим лимит) и X-RateLimit-*
+с отдельным лимитом на каждый токен и ресурс (core/search/graphql;
+GraphQL-запрос расходует одно очко независимо от числа репозиториев,
+ETag у него нет). Можно задать
+задержку ответа и долю ответов с ошибкой 502 или вторичным лимитом 403.
+
+Служебные эндпоинты: GET /_fake/stats — счётчики запросов,
+POST /_fake/reset — сброс счётчиков и лимитов.
+
+Запуск отдельно (например, для ручной проверки update_data):
+    python -m benchmarks.fake_github --port 8081 --latency-ms 50
+    GITHUB_API_URL=http://127.0.0.1:8081 GITHUB_TOKEN=fake \
+        python update_data.py
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlencode, urlsplit
+from urllib.request import Request, urlopen
+
+# Начало синтетической истории: коммиты есть с этого момента и до
+# любого запрошенного until
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc).timestamp()
+OWNERS = 40
+
+# Строковый литерал GraphQL (в запросах клиента — JSON-строка)
+_STRING = r'"(?:[^"\\]|\\.)*"'
+# Фрагмент истории одного репозитория в GraphQL-запросе
+_HISTORY_RE = re.compile(
+    rf"(\w+): repository\(owner: ({_STRING}), name: ({_STRING})\)"
+    rf".*?history\(since: ({_STRING}), until: ({_STRING}), first: (\d+)"
+    rf"(?:, after: ({_STRING}))?\)",
+    re.DOTALL)
+
+
+@dataclass
+class FakeGitHubConfig:
+    """
+    Параметры заглушки.
+
+    Атрибуты:
+        repos (int): Сколько репозиториев отдаёт поиск.
+        seed (int): Зерно генерации данных.
+        min_commits_per_day (float): Наименьшая частота коммитов.
+        max_commits_per_day (float): Наибольшая частота коммитов
+            (частота репозитория выбирается между ними).
+        authors (int): Число авторов в репозитории.
+        latency_ms (float): Задержка каждого ответа.
+        jitter_ms (float): Случайная добавка к задержке (0..jitter_ms).
+        error_rate (float): Доля ответов 502.
+        secondary_limit_rate (float): Доля ответов 403 (вторичный лимит).
+        retry_after (float): Retry-After ответа 403, секунд.
+        core_limit (int): Лимит ресурса core на токен за окно.
+        search_limit (int): Лимит ресурса search на токен за окно.
+        graphql_limit (int): Лимит ресурса graphql (очков) на токен
+            за окно.
+        window (int): Длина окна лимитов, секунд.
+    """
+
+    repos: int = 100
+    seed: int = 1
+    min_commits_per_day: float = 2.0
+    max_commits_per_day: float = 400.0
+    authors: int = 30
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    secondary_limit_rate: float = 0.0
+    retry_after: float = 0.0
+    core_limit: int = 5000
+    search_limit: int = 30
+    graphql_limit: int = 5000
+    window: int = 3600
+
+
+class FakeRepo:
+    """Синтетический репозиторий с равномерной историей коммитов."""
+
+    def __init__(self, config: FakeGitHubConfig, num: int):
+        rng = random.Random(f"{config.seed}:{num}")
+        self.num = num
+        self.owner = f"owner{num % OWNERS}"
+        self.name = f"repo{num}"
+        self.full_name = f"{self.owner}/{self.name}"
+        # Топ отсортирован по звёздам: чем больше номер, тем меньше звёзд
+        self.stars = 500_000 - num * 1000 + rng.randrange(1000)
+        self.watchers = self.stars
+        self.forks = rng.randrange(1000, 100_000)
+        self.open_issues = rng.randrange(0, 5000)
+        self.language = rng.choice(["Python", "Go", "Rust", "TypeScript",
+                                    "C++", None])
+        per_day = rng.uniform(config.min_commits_per_day,
+                              config.max_commits_per_day)
+        self.interval = 86400 / per_day
+        self.phase = rng.uniform(0, self.interval)
+        self.authors = config.authors
+
+    def item(self) -> dict:
+        """Элемент выдачи /search/repositories."""
+        return {
+            "id": self.num + 1,
+            "name": self.name,
+            "full_name": self.full_name,
+            "owner": {"login": self.owner},
+            "stargazers_count": self.stars,
+            "watchers_count": self.watchers,
+            "forks_count": self.forks,
+            "open_issues_count": self.open_issues,
+            "language": self.language,
+        }
+
+    def commit_range(self, since: Optional[str],
+                     until: Optional[str]) -> tuple[int, int]:
+        """Номера коммитов [first, last] периода (по возрастанию времени)."""
+        low = _parse_time(since) if since else EPOCH
+        high = _parse_time(until) if until else time.time()
+        first = max(0, int(-(-(low - EPOCH - self.phase) // self.interval)))
+        last = int((high - EPOCH - self.phase) // self.interval)
+        return first, last
+
+    def commit(self, index: int) -> dict:
+        """Коммит с номером index в форме ответа GitHub REST API."""
+        moment = EPOCH + self.phase + index * self.interval
+        stamp = datetime.fromtimestamp(int(moment), timezone.utc).strftime(
+            "%Y-%m-%dT%H:%M:%SZ")
+        sha = hashlib.sha1(f"{self.full_name}:{index}".encode()).hexdigest()
+        author = f"dev{(index * 7919) % self.authors}"
+        person = {"name": author, "email": f"{author}@example.com",
+                  "date": stamp}
+        return {
+            "sha": sha,
+            "commit": {"author": person, "committer": person,
+                       "message": f"Change {index}"},
+            "author": {"login": author},
+            "parents": [],
+        }
+
+    def commit_node(self, index: int) -> dict:
+        """Коммит с номером index в форме узла Commit GraphQL API."""
+        commit = self.commit(index)
+        person = commit["commit"]["author"]
+        return {"oid": commit["sha"], "committedDate": person["date"],
+                "author": person}
+
+
+def _parse_time(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class FakeGitHub:
+    """
+    Состояние заглушки: репозитории, лимиты токенов и счётчики.
+
+    Методы handle_* вызываются из потоков HTTP-сервера, поэтому общее
+    состояние защищено блокировкой.
+    """
+
+    def __init__(self, config: FakeGitHubConfig):
+        self.config = config
+        self.repos = [FakeRepo(config, num) for num in range(config.repos)]
+        self.by_name = {repo.full_name: repo for repo in self.repos}
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests: Counter = Counter()
+            self.statuses: Counter = Counter()
+            self._used: dict[tuple[str, str], tuple[float, int]] = {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": dict(self.requests),
+                    "statuses": dict(self.statuses),
+                    "total": sum(self.requests.values())}
+
+    def _roll(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < rate
+
+    def _rate_headers(self, token: str, resource: str,
+                      charge: bool) -> tuple[dict, bool]:
+        """Заголовки X-RateLimit-* и признак исчерпания лимита."""
+        limit = {"search": self.config.search_limit,
+                 "graphql": self.config.graphql_limit}.get(
+                     resource, self.config.core_limit)
+        now = time.time()
+        with self._lock:
+            reset_at, used = self._used.get((token, resource), (0.0, 0))
+            if now >= reset_at:
+                reset_at, used = now + self.config.window, 0
+            exhausted = used >= limit
+            if charge and not exhausted:
+                used += 1
+            self._used[(token, resource)] = (reset_at, used)
+        return {
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(max(0, limit - used)),
+            "X-RateLimit-Reset": str(int(reset_at)),
+            "X-RateLimit-Used": str(used),
+            "X-RateLimit-Resource": resource,
+        }, exhausted
+
+    def handle(self, path: str, query: dict, headers,
+               body: Optional[bytes] = None) -> tuple[int, dict, bytes]:
+        """
+        Обрабатывает запрос: (код, заголовки, тело). body передаётся
+        только для POST /graphql.
+        """
+        config = self.config
+        delay = config.latency_ms + (self._rng.uniform(0, config.jitter_ms)
+                                     if config.jitter_ms else 0.0)
+        if delay:
+            time.sleep(delay / 1000)
+
+        if path.startswith("/search/"):
+            resource, kind = "search", "search"
+        elif path.startswith("/repos/") and path.endswith("/commits"):
+            resource, kind = "core", "commits"
+        elif path == "/graphql" and body is not None:
+            resource, kind = "graphql", "graphql"
+        else:
+            resource, kind = "core", "other"
+        with self._lock:
+            self.requests[kind] += 1
+
+        auth = headers.get("Authorization", "")
+        token = auth.split(" ", 1)[1] if " " in auth else "anonymous"
+
+        if self._roll(config.error_rate):
+            return self._finish(502, {}, {"message": "Server Error"})
+        if self._roll(config.secondary_limit_rate):
+            rate, _ = self._rate_headers(token, resource, charge=False)
+            rate["Retry-After"] = f"{config.retry_after:g}"
+            return self._finish(403, rate, {
+                "message": "You have exceeded a secondary rate limit."})
+
+        if kind == "search":
+            status, body, link = self._search(path, query)
+        elif kind == "commits":
+            status, body, link = self._commits(path, query)
+        elif kind == "graphql":
+            status, body, link = self._graphql(body)
+        else:
+            status, body, link = 404, {"message": "Not Found"}, None
+
+        payload = json.dumps(body).encode()
+        etag = f'W/"{hashlib.sha1(payload).hexdigest()}"'
+        # Условный запрос с совпавшим ETag не расходует лимит
+        not_modified = status == 200 and kind != "graphql" \
+            and headers.get("If-None-Match") == etag
+        rate, exhausted = self._rate_headers(token, resource,
+                                             charge=not not_modified)
+        if exhausted and not not_modified:
+            return self._finish(403, rate, {
+                "message": "API rate limit exceeded"})
+        extra = dict(rate)
+        if status == 200 and kind != "graphql":
+            extra["ETag"] = etag
+        if link:
+            extra["Link"] = link
+        if not_modified:
+            return self._finish(304, extra, None)
+        return self._finish(status, extra, payload)
+
+    def _finish(self, status: int, headers: dict,
+                body) -> tuple[int, dict, bytes]:
+        with self._lock:
+            self.statuses[str(status)] += 1
+        if body is None:
+            return status, headers, b""
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        return status, headers, body
+
+    def _search(self, path: str, query: dict):
+        per_page = min(100, int(query.get("per_page", 30)))
+        page = int(query.get("page", 1))
+        start = (page - 1) * per_page
+        # Как и GitHub, поиск отдаёт не больше 1000 результатов
+        total = min(len(self.repos), 1000)
+        items = [repo.item() for repo in self.repos[start:min(start + per_page,
+                                                              total)]]
+        body = {"total_count": len(self.repos), "incomplete_results": False,
+                "items": items}
+        return 200, body, _link(path, query, page, -(-total // per_page))
+
+    def _commits(self, path: str, query: dict):
+        full_name = path[len("/repos/"):-len("/commits")]
+        repo = self.by_name.get(full_name)
+        if repo is None:
+            return 404, {"message": "Not Found"}, None
+        per_page = min(100, int(query.get("per_page", 30)))
+        page = int(query.get("page", 1))
+        first, last = repo.commit_range(query.get("since"),
+                                        query.get("until"))
+        count = max(0, last - first + 1)
+        # От новых к старым
+        top = last - (page - 1) * per_page
+        bottom = max(first, top - per_page + 1)
+        commits = [repo.commit(index) for index in range(top, bottom - 1, -1)]
+        return 200, commits, _link(path, query, page, -(-count // per_page))
+
+
+    def _graphql(self, body: bytes):
+        """
+        Отвечает на запрос истории: по странице истории (от новых
+        коммитов к старым) для каждого репозитория запроса. Курсор —
+        номер коммита, с которого начинается следующая страница.
+        """
+        try:
+            query = json.loads(body)["query"]
+        except (ValueError, KeyError, TypeError):
+            return 400, {"message": "Problems parsing JSON"}, None
+        data: dict = {}
+        errors = []
+        for match in _HISTORY_RE.finditer(query):
+            alias, owner, name, since, until, first, after = match.groups()
+            full_name = f"{json.loads(owner)}/{json.loads(name)}"
+            repo = self.by_name.get(full_name)
+            if repo is None:
+                data[alias] = None
+                errors.append({
+                    "type": "NOT_FOUND", "path": [alias],
+                    "message": "Could not resolve to a Repository with "
+                               f"the name '{full_name}'."})
+                continue
+            low, top = repo.commit_range(json.loads(since),
+                                         json.loads(until))
+            if after is not None:
+                top = min(top, int(json.loads(after)))
+            bottom = max(low, top - min(100, int(first)) + 1)
+            nodes = [repo.commit_node(index)
+                     for index in range(top, bottom - 1, -1)]
+            data[alias] = {"defaultBranchRef": {"target": {"history": {
+                "pageInfo": {"hasNextPage": bottom > low,
+                             "endCursor": str(bottom - 1)},
+                "nodes": nodes,
+            }}}}
+        if not data:
+            return 200, {"errors": [{"message": "Unsupported query"}]}, None
+        result: dict = {"data": data}
+        if errors:
+            result["errors"] = errors
+        return 200, result, None
+
+
+def _link(path: str, query: dict, page: int, last: int) -> Optional[str]:
+    if last <= 1:
+        return None
+    links = []
+    for rel, num in (("next", page + 1), ("last", last)):
+        if rel == "next" and page >= last:
+            continue
+        params = dict(query, page=num)
+        links.append(f'<{path}?{urlencode(params)}>; rel="{rel}"')
+    return ", ".join(links) or None
+
+
+def make_server(config: FakeGitHubConfig,
+                port: int = 0) -> ThreadingHTTPServer:
+    """Создаёт HTTP-сервер заглушки на 127.0.0.1 (порт 0 — любой свободный)."""
+    fake = FakeGitHub(config)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Заголовки и тело уходят одним пакетом, иначе замер искажает
+        # задержка подтверждения TCP (~40 мс на вызов)
+        wbufsize = 65536
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/_fake/stats":
+                self._reply(200, {}, json.dumps(fake.stats()).encode())
+                return
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            self._reply(*fake.handle(url.path, query, self.headers))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            if self.path == "/_fake/reset":
+                fake.reset()
+                self._reply(200, {}, b"{}")
+            elif self.path == "/graphql":
+                self._reply(*fake.handle(self.path, {}, self.headers, body))
+            else:
+                self._reply(404, {}, b'{"message": "Not Found"}')
+
+        def _reply(self, status: int, headers: dict, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer(("127.0.0.1", port), Handler)
+
+
+def _serve(config: FakeGitHubConfig, port: int,
+           port_queue: multiprocessing.Queue) -> None:
+    server = make_server(config, port)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+class FakeGitHubProcess:
+    """
+    Заглушка в отдельном процессе, чтобы её работа не отнимала GIL
+    у замеряемого кода.
+
+    Использование:
+        with FakeGitHubProcess(FakeGitHubConfig(latency_ms=20)) as fake:
+            client = GitHubClient(base_url=fake.url, tokens=["t"])
+            ...
+            print(fake.stats())
+    """
+
+    def __init__(self, config: FakeGitHubConfig, port: int = 0):
+        self.config = config
+        self.port = port
+        self.url = ""
+        self._process: Optional[multiprocessing.Process] = None
+
+    def start(self) -> str:
+        port_queue: multiprocessing.Queue = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(self.config, self.port, port_queue),
+            daemon=True)
+        self._process.start()
+        self.url = f"http://127.0.0.1:{port_queue.get(timeout=30)}"
+        return self.url
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def stats(self) -> dict:
+        """Счётчики запросов, принятых заглушкой."""
+        with urlopen(f"{self.url}/_fake/stats") as response:
+            return json.load(response)
+
+    def reset(self) -> None:
+        """Сбрасывает счётчики и лимиты."""
+        urlopen(Request(f"{self.url}/_fake/reset", data=b"",
+                        method="POST")).close()
+
+    def __enter__(self) -> "FakeGitHubProcess":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def config_arguments(parser: argparse.ArgumentParser) -> None:
+    """Добавляет в parser параметры FakeGitHubConfig."""
+    for name, default in asdict(FakeGitHubConfig()).items():
+        parser.add_argument("--" + name.replace("_", "-"),
+                            type=type(default), default=default)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeGitHubConfig:
+    return FakeGitHubConfig(**{name: getattr(args, name)
+                               for name in asdict(FakeGitHubConfig())})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8081)
+    config_arguments(parser)
+    args = parser.parse_args()
+    server = make_server(config_from_args(args), args.port)
+    print(f"Заглушка GitHub API: http://127.0.0.1:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Сквозной замер обновления данных (update_data.refresh_data) против
+локальной заглушки GitHub API (benchmarks.fake_github).
+
+Для каждого запуска выводится:
+- время обновления целиком;
+- число запросов к GitHub (по данным заглушки: по эндпоинтам и кодам
+  ответов) и число отправленных клиентом запросов по ресурсам лимита;
+- число запросов к БД и среди них пишущих (INSERT/UPDATE/DELETE/COPY),
+  подсчитанных логгером запросов asyncpg на каждом соединении пула.
+
+Первый запуск забирает историю за REFRESH_INITIAL_DAYS, последующие —
+только новые коммиты по курсорам, поэтому несколько запусков (--runs)
+показывают и полное, и инкрементальное обновление.
+
+Нужна подготовленная БД (переменные DB_*), как для update_data.py.
+Замер пишет в её таблицы, а --fresh перед первым запуском очищает
+снимки топа (top_repos, top_snapshots), activity, commits, sync_cursor
+и http_cache — используйте отдельную БД.
+
+--backend выбирает способ загрузки коммитов (rest или graphql, как
+GITHUB_BACKEND); заглушка обслуживает оба.
+
+Запуск:
+    python -m benchmarks.refresh --runs 3 --latency-ms 30 --fresh
+    python -m benchmarks.refresh --backend graphql --fresh
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+from collections import Counter
+
+import asyncpg  # type: ignore
+
+from app.db.connection import DATABASE_URL, db
+from app.db.migrations import migrate
+from app.services import github_client
+from app.services.github_client import GitHubClient
+from benchmarks.fake_github import (FakeGitHubProcess, config_arguments,
+                                    config_from_args)
+from update_data import refresh_data
+
+_WRITE_RE = re.compile(r"^\s*(?:WITH\b.*?\)\s*)?(INSERT|UPDATE|DELETE|COPY)\b",
+                       re.IGNORECASE | re.DOTALL)
+_TABLES = ("top_repos", "top_snapshots", "activity", "commits", "sync_cursor",
+           "http_cache")
+
+
+class QueryCounter:
+    """Считает запросы к БД по логгеру запросов asyncpg."""
+
+    def __init__(self):
+        self.queries = 0
+        self.writes: Counter = Counter()
+
+    def __call__(self, record) -> None:
+        self.queries += 1
+        match = _WRITE_RE.match(record.query)
+        if match:
+            self.writes[match.group(1).upper()] += 1
+
+    async def attach(self, connection: asyncpg.Connection) -> None:
+        """Инициализатор соединений пула (параметр init create_pool)."""
+        connection.add_query_logger(self)
+
+    def reset(self) -> dict:
+        """Возвращает счётчики и обнуляет их."""
+        stats = {"queries": self.queries, "writes": sum(self.writes.values()),
+                 "by_kind": dict(self.writes)}
+        self.queries = 0
+        self.writes = Counter()
+        return stats
+
+
+def _client_requests(rate_limit: dict) -> dict:
+    """Сколько запросов клиент отправил по каждому ресурсу лимита."""
+    requests: Counter = Counter()
+    for stats in rate_limit["per_token"].values():
+        for resource, bucket in stats.items():
+            requests[resource] += bucket["requests"]
+    return dict(requests)
+
+
+async def run(args: argparse.Namespace, url: str, fake) -> list[dict]:
+    counter = QueryCounter()
+    # Тот же пул, что у db.connect(), но с подсчётом запросов
+    db.pool = await asyncpg.create_pool(dsn=DATABASE_URL, min_size=1,
+                                        max_size=25, init=counter.attach)
+    github_client._client = GitHubClient(
+        base_url=url, tokens=[f"bench{num}" for num in range(args.tokens)])
+    reports = []
+    try:
+        await migrate()
+        if args.fresh:
+            async with db.connect_to_pool() as conn:
+                for table in _TABLES:
+                    await conn.execute(f"DELETE FROM {table}")
+        for num in range(args.runs):
+            fake.reset()
+            counter.reset()
+            started = time.monotonic()
+            summary = await refresh_data(concurrency=args.concurrency,
+                                         backend=args.backend)
+            elapsed = time.monotonic() - started
+            reports.append({
+                "run": num + 1,
+                "seconds": round(elapsed, 3),
+                "repos_ok": summary["ok"],
+                "repos_failed": summary["failed"],
+                "commits": summary["commits"],
+                "github": fake.stats(),
+                "client": _client_requests(summary["rate_limit"]),
+                "db": counter.reset(),
+                "http_cache": summary["http_cache"],
+            })
+    finally:
+        await github_client.close_github_client()
+        github_client._client = None
+        await db.disconnect()
+    return reports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--tokens", type=int, default=1)
+    parser.add_argument("--backend", choices=["rest", "graphql"],
+                        default="rest")
+    parser.add_argument("--fresh", action="store_true",
+                        help="очистить таблицы перед первым запуском")
+    parser.add_argument("--json", action="store_true",
+                        help="вывести отчёт в JSON")
+    config_arguments(parser)
+    args = parser.parse_args()
+
+    with FakeGitHubProcess(config_from_args(args)) as fake:
+        reports = asyncio.run(run(args, fake.url, fake))
+
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+        return
+    for report in reports:
+        github = report["github"]
+        print(f"Запуск {report['run']} ({args.backend}): "
+              f"{report['seconds']:.2f} с, "
+              f"репозиториев {report['repos_ok']} "
+              f"(ошибок {report['repos_failed']}), "
+              f"коммитов {report['commits']}")
+        print(f"  GitHub: запросов {github['total']} "
+              f"{github['requests']}, коды {github['statuses']}, "
+              f"клиент {report['client']}")
+        print(f"  БД: запросов {report['db']['queries']}, "
+              f"пишущих {report['db']['writes']} {report['db']['by_kind']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Замер публикации топа репозиториев.
+
+Сравниваются два способа записать снимок топа из N репозиториев:
+- построчный: строка top_snapshots и отдельный INSERT в top_repos
+  на каждый репозиторий;
+- publish_top_snapshot: один INSERT из массивов в одной транзакции.
+
+Для каждого способа замеряются первый снимок (в пустые таблицы)
+и следующий (позиции перемешаны, часть репозиториев заменена новыми).
+Пока идёт запись, отдельное соединение в цикле читает страницу топа
+(get_top_repos): максимальная задержка чтения показывает, ждут ли
+читатели пишущую транзакцию. Все замеры выполняются в транзакции,
+которая затем откатывается, поэтому данные БД (переменные DB_*)
+не меняются.
+
+Запуск:
+    python -m benchmarks.top_write --repos 1000 --rounds 5
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.db.connection import db
+from app.db.migrations import migrate
+from app.repositories.crud import get_top_repos, publish_top_snapshot
+
+
+def _make_top(size: int, seed: int, fresh: int = 0) -> list[dict]:
+    """Синтетический топ; fresh — сколько репозиториев заменить новыми."""
+    rng = random.Random(seed)
+    names = [f"owner{num}/repo{num}" for num in range(size)]
+    for num in rng.sample(range(size), fresh):
+        names[num] = f"owner{num}/new{seed}"
+    rng.shuffle(names)
+    return [{
+        "repo": name,
+        "owner": name.split("/", 1)[0],
+        "position_cur": position,
+        "position_prev": None,
+        "stars": rng.randrange(10_000, 500_000),
+        "watchers": rng.randrange(10_000, 500_000),
+        "forks": rng.randrange(1000, 100_000),
+        "open_issues": rng.randrange(0, 5000),
+        "language": rng.choice(["Python", "Go", "Rust", None]),
+    } for position, name in enumerate(names, start=1)]
+
+
+async def _row_by_row(connection, repos: list[dict]) -> None:
+    version = await connection.fetchval(
+        "INSERT INTO top_snapshots (repos) VALUES ($1) RETURNING version",
+        len(repos))
+    for r in repos:
+        await connection.execute(
+            """
+            INSERT INTO top_repos (version, repo, owner, position_cur,
+            position_prev, stars, watchers, forks, open_issues, language)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+            """,
+            version, r["repo"], r["owner"], r["position_cur"],
+            r["position_prev"], r["stars"], r["watchers"], r["forks"],
+            r["open_issues"], r["language"]
+        )
+    await connection.execute(
+        "DELETE FROM top_repos WHERE version < $1 - 1", version)
+
+
+async def _bulk(connection, repos: list[dict]) -> None:
+    await publish_top_snapshot(connection, repos)
+
+
+async def _read_loop(stop: asyncio.Event) -> list[float]:
+    """Читает страницу топа, пока не выставлен stop; задержки, секунд."""
+    latencies = []
+    async with db.connect_to_pool() as connection:
+        while not stop.is_set():
+            started = time.perf_counter()
+            await get_top_repos(connection, limit=100)
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0)
+    return latencies
+
+
+async def _measure(write, size: int, rounds: int) -> dict:
+    """Медианы времени записи и максимум задержки чтения, миллисекунд."""
+    inserts, updates = [], []
+    stop = asyncio.Event()
+    reader = asyncio.create_task(_read_loop(stop))
+    try:
+        async with db.connect_to_pool() as connection:
+            for num in range(rounds):
+                transaction = connection.transaction()
+                await transaction.start()
+                try:
+                    await connection.execute(
+                        "DELETE FROM top_repos; DELETE FROM top_snapshots")
+                    started = time.perf_counter()
+                    await write(connection, _make_top(size, num))
+                    inserts.append(time.perf_counter() - started)
+                    changed = _make_top(size, num + 1, fresh=size // 20)
+                    started = time.perf_counter()
+                    await write(connection, changed)
+                    updates.append(time.perf_counter() - started)
+                finally:
+                    await transaction.rollback()
+    finally:
+        stop.set()
+    reads = await reader
+    return {"insert_ms": round(statistics.median(inserts) * 1000, 1),
+            "update_ms": round(statistics.median(updates) * 1000, 1),
+            "read_max_ms": round(max(reads, default=0) * 1000, 1)}
+
+
+async def run(size: int, rounds: int) -> dict:
+    await db.connect()
+    try:
+        await migrate()
+        return {
+            "построчно": await _measure(_row_by_row, size, rounds),
+            "одним запросом": await _measure(_bulk, size, rounds),
+        }
+    finally:
+        await db.disconnect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repos", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.repos, args.rounds))
+    print(f"Репозиториев: {args.repos}, повторов: {args.rounds}")
+    for name, result in results.items():
+        print(f"{name:16} первый снимок: {result['insert_ms']:8.1f} мс  "
+              f"следующий: {result['update_ms']:8.1f} мс  "
+              f"чтение (макс.): {result['read_max_ms']:6.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Пересчёт таблицы activity из хранилища коммитов (таблица commits).
+
+Все обновления сохраняют загруженные коммиты в таблицу commits, поэтому
+смена правил агрегации — часового пояса дней, даты автора или коммиттера,
+различения авторов по email — не требует повторной загрузки истории
+из GitHub: дни периода пересчитываются запросами к БД.
+
+Заданные правила сохраняются для пересчитанных репозиториев:
+последующие обновления добавляют новые коммиты в activity по ним же,
+а не по правилам по умолчанию (UTC, дата автора, имя автора).
+Не заданные правила берутся из сохранённых.
+
+Пересчитываются только дни, покрытые хранилищем: коммиты, загруженные
+до его появления, в нём отсутствуют — такой период нужно сначала
+загрузить заново через backfill.py.
+
+Пример:
+    python reaggregate.py --since 2024-01-01 --until 2024-06-30 \
+        --tz Europe/Moscow --author-key email
+"""
+import argparse
+import asyncio
+import time
+from datetime import date
+
+from app.db.connection import db
+from app.db.migrations import migrate
+from app.db.partitions import ensure_activity_partitions
+from app.repositories.crud import (COMMIT_AUTHOR_MAPPING,
+                                   COMMIT_DATE_MAPPING, rebuild_activity)
+
+
+async def reaggregate(
+    since: date,
+    until: date,
+    repos: list[tuple[str, str]] | None = None,
+    tz: str | None = None,
+    date_field: str | None = None,
+    author_key: str | None = None
+) -> dict:
+    """
+    Пересчитывает activity за дни [since, until] (см. rebuild_activity).
+
+    Параметры:
+        since (date): Первый день периода.
+        until (date): Последний день периода (включительно).
+        repos (Optional[list[tuple[str, str]]]): Пары (owner, repo).
+        По умолчанию — все репозитории хранилища.
+        tz (Optional[str]): Часовой пояс дней.
+        date_field (Optional[str]): "author" или "committer".
+        author_key (Optional[str]): "name" или "email".
+        Не заданные правила берутся из сохранённых для репозитория.
+
+    Возвращает:
+        dict: Число записанных дней и время пересчёта.
+    """
+    started = time.monotonic()
+    await ensure_activity_partitions(since, until)
+    async with db.connect_to_pool() as conn:
+        if repos is None:
+            days = await rebuild_activity(conn, since, until, tz=tz,
+                                          date_field=date_field,
+                                          author_key=author_key)
+        else:
+            days = 0
+            async with conn.transaction():
+                for owner, repo in repos:
+                    days += await rebuild_activity(
+                        conn, since, until, owner, repo, tz=tz,
+                        date_field=date_field, author_key=author_key)
+    return {"days": days, "seconds": round(time.monotonic() - started, 3)}
+
+
+async def main(args: argparse.Namespace) -> dict:
+    """Подключается к БД, выполняет пересчёт и закрывает соединения."""
+    repos = [tuple(name.split("/", 1)) for name in args.repos] \
+        if args.repos else None
+    await db.connect()
+    try:
+        await migrate()
+        return await reaggregate(args.since, args.until, repos, args.tz,
+                                 args.date_field, args.author_key)
+    finally:
+        await db.disconnect()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Пересчёт активности из хранилища коммитов")
+    parser.add_argument("--since", type=date.fromisoformat, required=True,
+                        help="Первый день периода (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, required=True,
+                        help="Последний день периода (YYYY-MM-DD)")
+    parser.add_argument("--repos", nargs="*",
+                        help="Репозитории owner/repo (по умолчанию все)")
+    parser.add_argument("--tz",
+                        help="Часовой пояс дней (например, Europe/Moscow)")
+    parser.add_argument("--date-field", choices=list(COMMIT_DATE_MAPPING))
+    parser.add_argument("--author-key", choices=list(COMMIT_AUTHOR_MAPPING))
+    args = parser.parse_args()
+    if args.since > args.until:
+        parser.error("--since не может быть больше --until")
+    return args
+
+
+def handler(event, context):
+    """
+    Хэндлер для Яндекс.Функции.
+
+    Ожидает в event поля since, until (YYYY-MM-DD) и, необязательно,
+    repos (список owner/repo), tz, date_field, author_key.
+    """
+    args = argparse.Namespace(
+        since=date.fromisoformat(event["since"]),
+        until=date.fromisoformat(event["until"]),
+        repos=event.get("repos"),
+        tz=event.get("tz"),
+        date_field=event.get("date_field"),
+        author_key=event.get("author_key"),
+    )
+    report = asyncio.run(main(args))
+    return {"status": "ok", "report": report}
+
+
+if __name__ == "__main__":
+    report = asyncio.run(main(parse_args()))
+    for key, value in report.items():
+        print(f"{key}: {value}")
@@ -0,0 +1,96 @@
+"""
+Распределённое обновление активности через очередь заданий в Postgres.
+
+Режимы:
+- enqueue — обновляет топ-100 и ставит в очередь refresh_jobs по заданию
+  на каждый репозиторий (запускается по расписанию вместо update_data.py);
+- work — забирает и выполняет задания, пока очередь не опустеет. Таких
+  обработчиков можно запустить сколько угодно (процессы, машины или
+  экземпляры облачной функции): задания делятся между ними без повторов.
+
+Примеры:
+    python refresh_worker.py enqueue
+    python refresh_worker.py work --concurrency 10
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.db.connection import db
+from app.db.migrations import migrate
+from app.db.partitions import maintain_activity_partitions
+from app.services.github_client import close_github_client, get_github_client
+from app.services.github_parser import update_top100_in_db
+from app.services.http_cache import ResponseCache
+from app.services.job_queue import RefreshWorker, enqueue_top_repos
+from update_data import REFRESH_CONCURRENCY, REFRESH_INITIAL_DAYS
+
+
+async def enqueue() -> dict:
+    """
+    Обслуживает секции activity, обновляет топ-100 и ставит задания
+    в очередь.
+    """
+    await maintain_activity_partitions()
+    await update_top100_in_db()
+    return await enqueue_top_repos()
+
+
+async def work(concurrency: int = REFRESH_CONCURRENCY) -> dict:
+    """Выполняет задания очереди, пока доступные задания не закончатся."""
+    client = get_github_client()
+    cache = ResponseCache()
+    await cache.setup()
+    client.cache = cache
+
+    # Как и в update_data: репозитории без курсора забирают коммиты
+    # за REFRESH_INITIAL_DAYS полных суток
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    default_since = now.replace(hour=0, minute=0, second=0) \
+        - timedelta(days=REFRESH_INITIAL_DAYS)
+
+    report = await RefreshWorker(concurrency, client=client).run(
+        default_since)
+    report["http_cache"] = cache.stats()
+    report["rate_limit"] = client.tokens.stats()
+    return report
+
+
+async def main(mode: str, concurrency: int = REFRESH_CONCURRENCY) -> dict:
+    """Подключается к БД, выполняет режим и закрывает соединения."""
+    await db.connect()
+    try:
+        await migrate()
+        if mode == "enqueue":
+            return await enqueue()
+        return await work(concurrency)
+    finally:
+        await close_github_client()
+        await db.disconnect()
+
+
+def handler(event, context):
+    """
+    Хэндлер для Яндекс.Функции.
+
+    Ожидает в event поле mode ("enqueue" или "work") и, необязательно,
+    concurrency.
+    """
+    mode = event.get("mode", "work")
+    if mode not in ("enqueue", "work"):
+        raise ValueError(f"Неизвестный режим: {mode}")
+    concurrency = int(event.get("concurrency", REFRESH_CONCURRENCY))
+    report = asyncio.run(main(mode, concurrency))
+    return {"status": "ok", "report": report}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Распределённое обновление активности репозиториев")
+    parser.add_argument("mode", choices=["enqueue", "work"])
+    parser.add_argument("--concurrency", type=int,
+                        default=REFRESH_CONCURRENCY)
+    args = parser.parse_args()
+    report = asyncio.run(main(args.mode, args.concurrency))
+    for key, value in report.items():
+        print(f"{key}: {value}")
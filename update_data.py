@@ -3,66 +3,546 @@
 
 Содержит:
 - Обновление топ-100 репозиториев GitHub (с сохранением в базу данных).
-- Обновление данных об активности (коммитах) для каждого репозитория из топ-100
-  за последние 24 часа.
+- Инкрементальное обновление активности (коммитов) для каждого репозитория
+  из топ-100: запрашиваются только коммиты после курсора синхронизации.
 - Управление подключением и отключением базы данных.
 """
 import asyncio
+import os
+import time
+import uuid
 from datetime import datetime, timedelta, timezone
 from app.db.connection import db
+from app.db.migrations import migrate
+from app.db.partitions import maintain_activity_partitions
+from app.services.fanout import (REFRESH_WORKER_TIMEOUT, auth_headers,
+                                 invoke_functions)
+from app.services.github_client import (GitHubClient, close_github_client,
+                                        get_github_client)
+from app.repositories.crud import (delete_refresh_checkpoint,
+                                   fail_stale_refresh_runs,
+                                   finish_refresh_shard,
+                                   get_refresh_checkpoint, get_refresh_run,
+                                   mark_refresh_shard_running,
+                                   save_refresh_checkpoint,
+                                   start_refresh_run)
 from app.services.github_parser import (update_top100_in_db,
-                                        update_activity_in_db)
+                                        sync_activity_graphql)
+from app.services.http_cache import ResponseCache
+from app.services.refresh_pipeline import RefreshPipeline
 
+# Максимальное число репозиториев, загружаемых одновременно
+# (загрузчиков конвейера или GraphQL-запросов одного раунда).
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "10"))
 
-async def refresh_data():
+# За сколько прошедших суток забирать коммиты репозитория, у которого
+# ещё нет курсора синхронизации (например, новичка в топе)
+REFRESH_INITIAL_DAYS = int(os.getenv("REFRESH_INITIAL_DAYS", "1"))
+
+# Способ загрузки коммитов: "rest" (по репозиторию) или "graphql"
+# (пакетами по многу репозиториев в одном запросе)
+GITHUB_BACKEND = os.getenv("GITHUB_BACKEND", "rest")
+
+# На сколько шардов делить топ в режиме координатора
+REFRESH_SHARDS = int(os.getenv("REFRESH_SHARDS", "4"))
+# Через сколько секунд незавершённый шардированный запуск считается
+# прерванным: неотчитавшиеся шарды отмечаются failed
+REFRESH_RUN_TIMEOUT = float(os.getenv("REFRESH_RUN_TIMEOUT", "1800"))
+
+# Бюджет времени одного вызова, секунд, если его нельзя узнать из
+# контекста облачной функции (0 — без ограничения)
+REFRESH_TIME_BUDGET = float(os.getenv("REFRESH_TIME_BUDGET", "0"))
+# Сколько секунд бюджета оставлять на сохранение контрольной точки
+# и закрытие соединений
+REFRESH_SAFETY_MARGIN = float(os.getenv("REFRESH_SAFETY_MARGIN", "15"))
+# Имя контрольной точки обновления в таблице refresh_checkpoint
+CHECKPOINT_NAME = "refresh"
+# Контрольная точка старше стольких секунд (периода расписания)
+# или продолженная столько раз отбрасывается: следующий вызов снова
+# обновляет топ и начинает запуск заново
+REFRESH_CHECKPOINT_MAX_AGE = float(
+    os.getenv("REFRESH_CHECKPOINT_MAX_AGE", "3600"))
+REFRESH_CHECKPOINT_MAX_INVOCATIONS = int(
+    os.getenv("REFRESH_CHECKPOINT_MAX_INVOCATIONS", "5"))
+
+
+def refresh_deadline(context=None) -> float | None:
+    """
+    Срок, к которому обновление должно завершиться, по часам
+    time.monotonic(), или None, если бюджет времени не ограничен.
+
+    Оставшееся время берётся из контекста Яндекс.Функции
+    (get_remaining_time_in_millis), иначе — из REFRESH_TIME_BUDGET.
+    """
+    remaining = None
+    get_remaining = getattr(context, "get_remaining_time_in_millis", None)
+    if callable(get_remaining):
+        remaining = get_remaining() / 1000
+    elif REFRESH_TIME_BUDGET > 0:
+        remaining = REFRESH_TIME_BUDGET
+    if remaining is None:
+        return None
+    return time.monotonic() + remaining - REFRESH_SAFETY_MARGIN
+
+
+async def refresh_data(concurrency: int = REFRESH_CONCURRENCY,
+                       backend: str = GITHUB_BACKEND,
+                       deadline: float | None = None) -> dict:
     """
     Обновляет данные в базе данных:
     1. Получает и сохраняет топ-100 репозиториев GitHub.
-    2. Для каждого репозитория из топ-100 обновляет информацию
-       об активности (коммитах) за последние 24 часа.
+    2. Для каждого репозитория из топ-100 добавляет в activity коммиты,
+       появившиеся после его курсора синхронизации, и передвигает курсор
+       на момент запуска. Пропущенные запуски догоняются автоматически.
+
+    REST-путь выполняется конвейером RefreshPipeline: `concurrency`
+    загрузчиков, агрегатор и пакетный писатель работают одновременно
+    и связаны ограниченными очередями. Все запросы к GitHub идут через
+    общий клиент процесса, так что соединения переиспользуются между
+    репозиториями.
+    Запросы отправляются условными (ETag) через кэш ответов в БД и
+    проходят через планировщик лимитов: при нехватке лимита первыми
+    обслуживаются репозитории с более высокой позицией в топе.
+
+    `backend` выбирает способ загрузки коммитов: "rest" или "graphql".
+    В сводке указываются время обновления и число запросов по ресурсам
+    лимита, что позволяет сравнить оба способа, а для REST-пути —
+    статистика стадий конвейера ("pipeline").
+
+    `deadline` (см. refresh_deadline) ограничивает время REST-пути:
+    репозитории обрабатываются в порядке позиции в топе, новые
+    не начинаются, когда времени остаётся мало, а необработанные
+    сохраняются в контрольной точке. Следующий вызов не обновляет топ,
+    а продолжает с репозиториев из контрольной точки. Репозитории,
+    прерванные сроком на середине, ставятся в конец списка. Контрольная
+    точка старше REFRESH_CHECKPOINT_MAX_AGE секунд или продолженная
+    REFRESH_CHECKPOINT_MAX_INVOCATIONS раз отбрасывается, чтобы
+    репозиторий, не укладывающийся в вызов, не остановил обновление
+    топа навсегда.
+
+    Возвращает:
+        dict: Сводка по итогам обновления (см. summarize_results)
+        с полем checkpoint: продолжен ли прерванный запуск, отброшена ли
+        устаревшая контрольная точка, сколько репозиториев осталось,
+        когда запуск начат и за сколько вызовов.
+    """
+    if backend not in ("rest", "graphql"):
+        raise ValueError(f"Неизвестный способ загрузки: {backend}")
+    started = time.monotonic()
+    client = get_github_client()
+    cache = await prepare_refresh(client)
+    async with db.connect_to_pool() as conn:
+        checkpoint = await get_refresh_checkpoint(conn, CHECKPOINT_NAME)
+        expired = checkpoint is not None and (
+            checkpoint["invocations"] >= REFRESH_CHECKPOINT_MAX_INVOCATIONS
+            or (datetime.now(timezone.utc) - checkpoint["run_started_at"])
+            .total_seconds() > REFRESH_CHECKPOINT_MAX_AGE)
+        if expired:
+            await delete_refresh_checkpoint(conn, CHECKPOINT_NAME)
+            checkpoint = None
+
+    if checkpoint is None:
+        run_started_at = datetime.now(timezone.utc)
+        # Обновляем топ-100 репозиториев
+        await update_top100_in_db()
+        # Получаем список репозиториев из top100
+        records = await load_top_records()
+    else:
+        # Продолжаем прерванный запуск с того же списка репозиториев
+        run_started_at = checkpoint["run_started_at"]
+        records = [{"owner": owner, "repo": repo, "position_cur": position}
+                   for owner, repo, position in zip(checkpoint["owners"],
+                                                    checkpoint["repos"],
+                                                    checkpoint["positions"])]
+
+    summary, remaining = await refresh_records(records, client, cache,
+                                               concurrency, backend,
+                                               started, deadline)
+    async with db.connect_to_pool() as conn:
+        if remaining:
+            await save_refresh_checkpoint(conn, CHECKPOINT_NAME, remaining,
+                                          run_started_at)
+        elif checkpoint is not None:
+            await delete_refresh_checkpoint(conn, CHECKPOINT_NAME)
+    summary["checkpoint"] = {
+        "resumed": checkpoint is not None,
+        "expired": expired,
+        "remaining": len(remaining),
+        "run_started_at": run_started_at.isoformat(),
+        "invocations": checkpoint["invocations"] + 1 if checkpoint else 1,
+    }
+    return summary
+
+
+async def prepare_refresh(client: GitHubClient) -> ResponseCache:
+    """Подключает к клиенту кэш ответов."""
+    cache = ResponseCache()
+    await cache.setup()
+    client.cache = cache
+    return cache
+
+
+async def load_top_records() -> list:
+    """Репозитории из top100 (owner, repo, position_cur) по позиции."""
+    async with db.connect_to_pool() as conn:
+        return await conn.fetch(
+            "SELECT owner, repo, position_cur FROM top100 "
+            "ORDER BY position_cur"
+        )
+
+
+async def refresh_records(
+    records: list,
+    client: GitHubClient,
+    cache: ResponseCache,
+    concurrency: int,
+    backend: str,
+    started: float,
+    deadline: float | None = None
+) -> tuple[dict, list[tuple[str, str, int]]]:
+    """
+    Обновляет активность репозиториев `records` (строки top100 или
+    словари с ключами owner, repo, position_cur) и формирует сводку.
+
+    Возвращает:
+        tuple: (сводка, репозитории (owner, repo, position_cur),
+        не обработанные до срока `deadline`).
+    """
+    # Курсоры сдвигаются на момент запуска; репозитории без курсора
+    # забирают коммиты за REFRESH_INITIAL_DAYS полных суток
+    until_dt = datetime.now(timezone.utc).replace(microsecond=0)
+    default_since = until_dt.replace(hour=0, minute=0, second=0) \
+        - timedelta(days=REFRESH_INITIAL_DAYS)
+
+    # Обновляем активность для каждого репозитория
+    pipeline = None
+    if backend == "graphql":
+        results = await refresh_activity_graphql(records, default_since,
+                                                 until_dt, concurrency)
+    else:
+        pipeline = RefreshPipeline(concurrency, client=client,
+                                   deadline=deadline)
+        results = await refresh_activity_pipeline(pipeline, records,
+                                                  default_since, until_dt)
+    summary = summarize_results(results, cache)
+    summary["backend"] = backend
+    if pipeline is not None:
+        summary["pipeline"] = pipeline.report()
+    summary["seconds"] = round(time.monotonic() - started, 3)
+    summary["rate_limit"] = client.tokens.stats()
+    remaining = [(record["owner"], record["repo"], record["position_cur"])
+                 for record, result in zip(records, results)
+                 if result["status"] == "skipped"]
+    if pipeline is not None:
+        # Порядок конвейера: прерванные на середине — в конце
+        order = {item[:2]: num for num, item in enumerate(pipeline.skipped)}
+        remaining.sort(key=lambda item: order.get(
+            (item[0], item[1].split("/", 1)[1]), len(order)))
+    return summary, remaining
+
+
+def split_shards(records: list, shards: int) -> list[list]:
+    """
+    Делит репозитории на `shards` частей по кругу: первый репозиторий —
+    в шард 0, второй — в шард 1 и т.д. Так самые активные репозитории
+    из начала топа распределяются по шардам равномерно.
+    """
+    parts = [list(records[num::shards]) for num in range(max(1, shards))]
+    return [part for part in parts if part]
+
+
+async def coordinate_refresh(
+    shards: int = REFRESH_SHARDS,
+    concurrency: int = REFRESH_CONCURRENCY,
+    backend: str = GITHUB_BACKEND,
+    context=None,
+    deadline: float | None = None
+) -> dict:
+    """
+    Координатор шардированного обновления.
+
+    Завершает зависшие запуски (fail_stale_refresh_runs), обновляет
+    топ-100, делит его на шарды, регистрирует запуск в refresh_runs
+    и асинхронно вызывает функцию-обработчик (режим "shard") отдельно
+    для каждого шарда, не дожидаясь их выполнения. Каждый шард
+    записывает свой итог, а последний завершившийся — итог всего
+    запуска. Шарды, вызов которых не принят, координатор сразу
+    отмечает как failed. Ожидание подтверждения вызовов ограничено
+    сроком `deadline` (см. refresh_deadline).
+
+    Возвращает:
+        dict: Запуск: run_id, статус (running, пока шарды работают,
+        или done/partial, если все вызовы отклонены), число шардов
+        и репозиториев, ошибки вызова по шардам, завершённые зависшие
+        запуски и время.
     """
-    # Обновляем топ-100 репозиториев
+    if backend not in ("rest", "graphql"):
+        raise ValueError(f"Неизвестный способ загрузки: {backend}")
+    started = time.monotonic()
+    async with db.connect_to_pool() as conn:
+        stale = await fail_stale_refresh_runs(conn, REFRESH_RUN_TIMEOUT)
     await update_top100_in_db()
+    parts = split_shards(await load_top_records(), shards)
+
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") \
+        + "-" + uuid.uuid4().hex[:6]
+    async with db.connect_to_pool() as conn:
+        await start_refresh_run(conn, run_id, [len(p) for p in parts])
+
+    payloads = [
+        {"mode": "shard", "run_id": run_id, "shard": num,
+         "backend": backend, "concurrency": concurrency,
+         "repos": [[r["owner"], r["repo"], r["position_cur"]]
+                   for r in part]}
+        for num, part in enumerate(parts)
+    ]
+    timeout = REFRESH_WORKER_TIMEOUT
+    if deadline is not None:
+        timeout = max(1.0, min(timeout, deadline - time.monotonic()))
+    responses = await invoke_functions(payloads,
+                                       headers=auth_headers(context),
+                                       timeout=timeout)
+
+    errors = {}
+    for num, response in enumerate(responses):
+        if isinstance(response, Exception):
+            errors[num] = f"{type(response).__name__}: {response}"
+            async with db.connect_to_pool() as conn:
+                await finish_refresh_shard(conn, run_id, num, 0,
+                                           len(parts[num]), errors[num])
 
-    # Получаем список репозиториев из top100
     async with db.connect_to_pool() as conn:
-        records = await conn.fetch("SELECT owner, repo FROM top100")
+        run = await get_refresh_run(conn, run_id)
+    return {
+        "run_id": run_id,
+        "status": run["status"],
+        "shards": len(parts),
+        "repos": sum(len(p) for p in parts),
+        "invoke_errors": errors,
+        "stale_runs": stale,
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+async def refresh_shard(
+    run_id: str,
+    shard: int,
+    repos: list[list],
+    concurrency: int = REFRESH_CONCURRENCY,
+    backend: str = GITHUB_BACKEND,
+    deadline: float | None = None
+) -> dict:
+    """
+    Обработчик шарда: обновляет активность репозиториев шарда
+    и записывает итог в refresh_run_shards (см. coordinate_refresh).
+    Репозитории, не обработанные до срока `deadline`, учитываются
+    в failed_repos шарда и догоняются следующим запуском по курсорам.
+
+    Параметры:
+        run_id (str): Идентификатор запуска.
+        shard (int): Номер шарда.
+        repos (list[list]): Тройки [owner, полное имя, позиция в топе].
+
+    Возвращает:
+        dict: Сводка по шарду (см. summarize_results) с полями run_id,
+        shard и run — итогом запуска, если этот шард завершил его.
+    """
+    if backend not in ("rest", "graphql"):
+        raise ValueError(f"Неизвестный способ загрузки: {backend}")
+    started = time.monotonic()
+    client = get_github_client()
+    cache = await prepare_refresh(client)
+    records = [{"owner": owner, "repo": repo, "position_cur": position}
+               for owner, repo, position in repos]
+
+    async with db.connect_to_pool() as conn:
+        await mark_refresh_shard_running(conn, run_id, shard)
+    try:
+        summary, _ = await refresh_records(records, client, cache,
+                                           concurrency, backend, started,
+                                           deadline)
+    except Exception as e:
+        async with db.connect_to_pool() as conn:
+            await finish_refresh_shard(conn, run_id, shard, 0, len(records),
+                                       f"{type(e).__name__}: {e}")
+        raise
+
+    async with db.connect_to_pool() as conn:
+        run = await finish_refresh_shard(conn, run_id, shard,
+                                         summary["commits"],
+                                         summary["failed"]
+                                         + summary["skipped"])
+    summary["run_id"] = run_id
+    summary["shard"] = shard
+    summary["run"] = {"status": run["status"], "commits": run["commits"],
+                      "failed_repos": run["failed_repos"],
+                      "started_at": run["started_at"].isoformat(),
+                      "finished_at": run["finished_at"].isoformat()} \
+        if run else None
+    return summary
+
+
+async def refresh_activity_pipeline(
+    pipeline: RefreshPipeline,
+    records: list,
+    default_since: datetime,
+    until: datetime
+) -> list[dict]:
+    """
+    Обновляет активность репозиториев из топа конвейером REST-пути.
 
-    # Определяем период за последние 24 часа
-    until_dt = datetime.now(timezone.utc).replace(
-        hour=0, minute=0, second=0, microsecond=0)
-    since_dt = until_dt - timedelta(days=1)
+    Позиция в топе задаёт приоритет запросов репозитория в планировщике
+    лимитов GitHub.
+
+    Возвращает:
+        list[dict]: Итоги по репозиториям (см. build_results).
+    """
+    repos = [(record["owner"], record["repo"].split("/", 1)[1],
+              record["position_cur"]) for record in records]
+    synced = await pipeline.run(repos, default_since, until)
+    return build_results(records, [r[:2] for r in repos], synced)
+
+
+async def refresh_activity_graphql(
+    records: list,
+    default_since: datetime,
+    until: datetime,
+    concurrency: int
+) -> list[dict]:
+    """
+    Обновляет активность репозиториев из топа через GraphQL
+    (см. sync_activity_graphql).
+
+    Возвращает:
+        list[dict]: Итоги по репозиториям (см. build_results).
+    """
+    repos = [(record["owner"], record["repo"].split("/", 1)[1])
+             for record in records]
+    synced = await sync_activity_graphql(repos, default_since, until,
+                                         concurrency=concurrency)
+    return build_results(records, repos, synced)
 
-    since_str = since_dt.strftime("%Y-%m-%dT00:00:00Z")
-    until_str = until_dt.strftime("%Y-%m-%dT00:00:00Z")
 
-    # Обновляем активность для каждого репозитория из топ-100
-    for record in records:
-        owner = record["owner"]
-        full_name = record["repo"]
-        # Разделяем полный путь репозитория на owner/repo
-        _, repo_name = full_name.split("/", 1)
-        await update_activity_in_db(owner, repo_name, since_str, until_str)
+def build_results(records: list, repos: list[tuple[str, str]],
+                  synced: dict) -> list[dict]:
+    """
+    Приводит итоги синхронизации к списку в порядке топа.
 
+    Ошибки не пробрасываются наружу: сбой одного репозитория не должен
+    прерывать обновление остальных.
 
-async def main():
+    Возвращает:
+        list[dict]: Итог обработки каждого репозитория:
+        - repo (str): Полное имя репозитория.
+        - status (str): "ok", "error" или "skipped" (не обработан
+          до истечения времени вызова).
+        - days (int): Количество затронутых дней.
+        - commits (int): Количество новых коммитов.
+        - error (Optional[str]): Текст ошибки (None при успехе).
+    """
+    results = []
+    for record, key in zip(records, repos):
+        stats = synced.get(key)
+        if stats is None:
+            status, stats = "skipped", {}
+        else:
+            status = "error" if stats.get("error") else "ok"
+        error = stats.get("error")
+        results.append({
+            "repo": record["repo"],
+            "status": status,
+            "days": stats.get("days", 0),
+            "commits": stats.get("commits", 0),
+            "error": error,
+        })
+    return results
+
+
+def summarize_results(results: list[dict],
+                      cache: ResponseCache | None = None) -> dict:
+    """
+    Формирует сводку по итогам обновления.
+
+    Параметры:
+        results (list[dict]): Итоги по репозиториям
+        (см. build_results).
+        cache (Optional[ResponseCache]): Кэш ответов, использованный
+        при обновлении.
+
+    Возвращает:
+        dict: Количество успешных, неудачных и пропущенных (не успели
+        до истечения времени) репозиториев, общее число коммитов, список
+        ошибок по репозиториям и счётчики кэша ответов. refresh_data
+        дополняет её состоянием лимитов GitHub ("rate_limit").
+    """
+    failed = [r for r in results if r["status"] == "error"]
+    skipped = sum(1 for r in results if r["status"] == "skipped")
+    return {
+        "total": len(results),
+        "ok": len(results) - len(failed) - skipped,
+        "failed": len(failed),
+        "skipped": skipped,
+        "commits": sum(r["commits"] for r in results),
+        "errors": {r["repo"]: r["error"] for r in failed},
+        "http_cache": cache.stats() if cache is not None else None,
+    }
+
+
+async def main(event: dict | None = None, context=None):
     """
     Основная функция скрипта.
 
     Выполняет:
     - Подключение к базе данных.
-    - Вызов функции `refresh_data` для обновления данных.
-    - Отключение от базы данных.
+    - Обновление в режиме из события (см. handler).
+    - Закрытие соединений с GitHub и отключение от базы данных.
+
+    Возвращает:
+        dict: Сводка по итогам обновления.
     """
+    # Срок отсчитывается от начала вызова, до подключения к БД
+    deadline = refresh_deadline(context)
+    event = event or {}
+    mode = event.get("mode", "full")
+    concurrency = int(event.get("concurrency", REFRESH_CONCURRENCY))
+    backend = event.get("backend", GITHUB_BACKEND)
     await db.connect()
-    await refresh_data()
-    await db.disconnect()
+    try:
+        await migrate()
+        if mode != "shard":
+            await maintain_activity_partitions()
+        if mode == "coordinator":
+            return await coordinate_refresh(
+                int(event.get("shards", REFRESH_SHARDS)), concurrency,
+                backend, context, deadline)
+        if mode == "shard":
+            return await refresh_shard(event["run_id"], int(event["shard"]),
+                                       event["repos"], concurrency, backend,
+                                       deadline)
+        return await refresh_data(concurrency, backend, deadline)
+    finally:
+        await close_github_client()
+        await db.disconnect()
 
 
 def handler(event, context):
     """
     Хэндлер для Яндекс.Функции.
     Яндекс.Функция будет вызывать эту функцию при срабатывании триггера.
+
+    Режим задаётся полем mode события:
+    - "full" (по умолчанию, в том числе для событий таймера) — всё
+      обновление в одном вызове;
+    - "coordinator" — обновить топ и вызвать обработчик для каждого
+      из shards шардов (REFRESH_WORKER_URL);
+    - "shard" — обновить только репозитории шарда из события
+      (так координатор вызывает обработчик).
+    Необязательные поля: concurrency, backend, shards.
     """
-    asyncio.run(main())
-    return {"status": "ok", "message": "Data refreshed successfully."}
+    event = event if isinstance(event, dict) else {}
+    mode = event.get("mode", "full")
+    if mode not in ("full", "coordinator", "shard"):
+        raise ValueError(f"Неизвестный режим: {mode}")
+    summary = asyncio.run(main(event, context))
+    return {"status": "ok", "message": "Data refreshed successfully.",
+            "summary": summary}